@@ -3,35 +3,61 @@
 Chatbot con agente LangGraph + RAG para soporte IT
 """
 
+import time
+_IMPORT_START = time.perf_counter()
+
 import gradio as gr
 from src.config import (
     GRADIO_SERVER_NAME, 
     GRADIO_SERVER_PORT, 
     GRADIO_SHARE,
+    GRADIO_CONCURRENCY_LIMIT,
+    WARMUP_ON_START,
+    WARMUP_DUMMY_QUERY,
+    CHAT_API_URL,
+    CHAT_API_TIMEOUT,
+    TICKET_WATCHER_ENABLED,
+    TICKET_WATCH_INTERVAL,
+    require_groq_api_key,
     print_config
 )
 
-# Mostrar configuración al iniciar
-print_config()
+def query_chat_api(message: str, history: list) -> str:
+    """Envía la consulta a la API HTTP del agente y devuelve la respuesta"""
+    import requests
+    response = requests.post(
+        f"{CHAT_API_URL.rstrip('/')}/v1/query",
+        json={"message": message, "history": history},
+        timeout=CHAT_API_TIMEOUT,
+    )
+    response.raise_for_status()
+    return response.json()["answer"]
 
-def chatbot_response(message: str, history: list) -> str:
+def chatbot_response(message: str, history: list, session_id: str = None) -> str:
     """
     Función que procesa el mensaje del usuario y devuelve la respuesta del agente.
     
     Args:
         message: Mensaje del usuario
         history: Historial de conversación en formato Gradio [(user, bot), ...]
+        session_id: Sesión de Gradio (para avisarle de cambios en sus tickets)
     
     Returns:
         Respuesta del agente
     """
     try:
+        # Modo cliente ligero: delegar en la API multi-proceso (src/api/server.py)
+        if CHAT_API_URL:
+            return query_chat_api(message, history)
+        
         # Importación lazy del agente (solo cuando se necesita)
         from src.agent.agent import query_agent
+        from src.tools.ticket_watcher import session_scope
         
         # Convertir historial de Gradio a formato más simple si es necesario
         # Por ahora, solo procesamos el mensaje actual
-        response = query_agent(message, chat_history=history)
+        with session_scope(session_id):
+            response = query_agent(message, chat_history=history)
         return response
     except Exception as e:
         error_msg = f"❌ Error al procesar la consulta: {str(e)}"
@@ -40,6 +66,13 @@ def chatbot_response(message: str, history: list) -> str:
         traceback.print_exc()
         return error_msg
 
+def pending_ticket_notifications(session_id: str) -> list:
+    """Avisos de cambios en los tickets que ha creado o consultado la sesión"""
+    if CHAT_API_URL or not TICKET_WATCHER_ENABLED or session_id is None:
+        return []
+    from src.tools.ticket_watcher import get_ticket_watcher
+    return get_ticket_watcher().drain_notifications(session_id)
+
 # Ejemplos predefinidos para que el usuario pruebe
 examples = [
     ["¿Cómo reseteo mi contraseña?"],
@@ -129,20 +162,34 @@ with gr.Blocks(
     )
     
     # Event handlers
-    def respond(message, chat_history):
+    def respond(message, chat_history, request: gr.Request = None):
         """Maneja la respuesta del chatbot"""
         if not message.strip():
             return "", chat_history
         
+        session_id = request.session_hash if request else None
+        
         # Obtener respuesta del agente
-        bot_response = chatbot_response(message, chat_history)
+        bot_response = chatbot_response(message, chat_history, session_id=session_id)
         
         # Añadir al historial en formato OpenAI-style
         chat_history.append({"role": "user", "content": message})
         chat_history.append({"role": "assistant", "content": bot_response})
+        for notification in pending_ticket_notifications(session_id):
+            chat_history.append({"role": "assistant", "content": notification})
         
         return "", chat_history
     
+    def push_ticket_notifications(chat_history, request: gr.Request = None):
+        """Añade al chat los avisos de tickets pendientes sin esperar a que el usuario escriba"""
+        notifications = pending_ticket_notifications(request.session_hash if request else None)
+        if not notifications:
+            return gr.update()
+        chat_history = list(chat_history or [])
+        for notification in notifications:
+            chat_history.append({"role": "assistant", "content": notification})
+        return chat_history
+    
     def clear_chat():
         """Limpia el historial del chat"""
         return None, []
@@ -156,6 +203,10 @@ with gr.Blocks(
     submit_btn.click(respond, [msg, chatbot], [msg, chatbot])
     clear_btn.click(clear_chat, None, [msg, chatbot])
     
+    # Avisos de tickets: gr.Timer existe desde Gradio 4.40
+    if TICKET_WATCHER_ENABLED and not CHAT_API_URL and hasattr(gr, "Timer"):
+        gr.Timer(TICKET_WATCH_INTERVAL).tick(push_ticket_notifications, [chatbot], [chatbot])
+    
     # Welcome message
     demo.load(
         lambda: [{"role": "assistant", "content": "👋 ¡Hola! Soy tu asistente de soporte IT. ¿En qué puedo ayudarte hoy?"}],
@@ -163,8 +214,37 @@ with gr.Blocks(
         chatbot
     )
 
+_UI_READY = time.perf_counter()
+
+def print_startup_report(phases: dict):
+    """Muestra el tiempo de arranque desglosado por fase"""
+    print("\n" + "="*60)
+    print("⏱️  TIEMPO DE ARRANQUE POR FASE")
+    print("="*60)
+    for name, seconds in phases.items():
+        print(f"   {name:<20}{seconds:>8.2f} s")
+    print("-"*60)
+    print(f"   {'total':<20}{sum(phases.values()):>8.2f} s")
+    print("="*60)
+
 # Configuración de lanzamiento
 if __name__ == "__main__":
+    # Mostrar configuración al iniciar
+    print_config()
+    if not CHAT_API_URL:
+        require_groq_api_key()
+    
+    startup_phases = {"interfaz_gradio": _UI_READY - _IMPORT_START}
+    if WARMUP_ON_START and not CHAT_API_URL:
+        print("🔥 Precargando embeddings, índice y agente...")
+        from src.agent.agent import warmup
+        startup_phases.update(warmup(dummy_query=WARMUP_DUMMY_QUERY))
+    if not CHAT_API_URL:
+        # Reenviar los tickets en diferido que quedaron pendientes (si TICKET_WRITE_BEHIND=true)
+        from src.tools.ticket_spool import get_ticket_writer
+        get_ticket_writer()
+    print_startup_report(startup_phases)
+    
     print("\n" + "="*60)
     print("🚀 Iniciando IT Support Chatbot...")
     print("="*60)
@@ -174,6 +254,7 @@ if __name__ == "__main__":
     print("="*60 + "\n")
     
     # Lanzar la aplicación
+    demo.queue(default_concurrency_limit=GRADIO_CONCURRENCY_LIMIT)
     demo.launch(
         server_name=GRADIO_SERVER_NAME,
         server_port=GRADIO_SERVER_PORT,
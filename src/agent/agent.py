@@ -1,42 +1,116 @@
-import os
-from dotenv import load_dotenv
-from langchain_groq import ChatGroq
-from src.tools.agent_tools import create_support_ticket, get_ticket_status
-from src.tools.system_tools import get_system_performance, check_disk_space, check_network_connection
+import contextvars
+import threading
+from dataclasses import dataclass, field
+from typing import Optional
 from src.rag.rag_retriever import get_relevant_docs
-from src.config import LANGFUSE_ENABLED
-
-load_dotenv()
-
-# Verificar que existe la API key
-if not os.getenv("GROQ_API_KEY"):
-    raise ValueError("❌ GROQ_API_KEY no encontrada en el archivo .env")
-
-# Inicializar Langfuse CallbackHandler si está habilitado
-langfuse_handler = None
-if LANGFUSE_ENABLED:
-    from langfuse.langchain import CallbackHandler
-    langfuse_handler = CallbackHandler()
-    print("✅ Langfuse tracing habilitado para LangChain")
-
-# Configuración del LLM
-llm = ChatGroq(
-    model="llama-3.3-70b-versatile",
-    groq_api_key=os.getenv("GROQ_API_KEY"),
-    temperature=0.3,
-    max_tokens=2048
-)
-
-# Tools disponibles
-tools = [
-    # Tickets
-    create_support_ticket,
-    get_ticket_status,
-    # Sistema Windows
-    get_system_performance,
-    check_disk_space,
-    check_network_connection
-]
+from src.config import LANGFUSE_ENABLED, RAG_TOP_K, require_groq_api_key
+from src.perf.timing import current_timings, timed_stage
+
+# El LLM, las herramientas y el grafo se construyen bajo demanda (ver get_agent_executor)
+# para que importar este módulo sea rápido y no tenga efectos secundarios.
+_init_lock = threading.Lock()
+_llm = None
+_tools = None
+_agent_executor = None
+_dry_run_executor = None
+_langfuse_handler = None
+_langfuse_initialized = False
+
+
+def get_langfuse_handler():
+    """Retorna el CallbackHandler de Langfuse si está habilitado (o None)"""
+    global _langfuse_handler, _langfuse_initialized
+    if not _langfuse_initialized:
+        with _init_lock:
+            if not _langfuse_initialized:
+                if LANGFUSE_ENABLED:
+                    from langfuse.langchain import CallbackHandler
+                    _langfuse_handler = CallbackHandler()
+                    print("✅ Langfuse tracing habilitado para LangChain")
+                _langfuse_initialized = True
+    return _langfuse_handler
+
+
+def get_llm():
+    """Retorna el LLM de Groq (se crea en la primera llamada)"""
+    global _llm
+    if _llm is None:
+        with _init_lock:
+            if _llm is None:
+                from langchain_groq import ChatGroq
+                _llm = ChatGroq(
+                    model="llama-3.3-70b-versatile",
+                    groq_api_key=require_groq_api_key(),
+                    temperature=0.3,
+                    max_tokens=2048
+                )
+    return _llm
+
+
+def get_tools():
+    """Retorna las herramientas disponibles para el agente"""
+    global _tools
+    if _tools is None:
+        with _init_lock:
+            if _tools is None:
+                from src.tools.agent_tools import (
+                    create_support_ticket, get_ticket_status, find_similar_tickets, search_tickets
+                )
+                from src.tools.system_tools import get_system_performance, check_disk_space, check_network_connection
+                from src.tools.docker_tools import get_docker_containers_status
+                from src.tools.log_tools import get_recent_system_errors
+                _tools = [
+                    # Tickets
+                    create_support_ticket,
+                    get_ticket_status,
+                    find_similar_tickets,
+                    search_tickets,
+                    # Sistema Windows
+                    get_system_performance,
+                    check_disk_space,
+                    check_network_connection,
+                    get_recent_system_errors,
+                    # Docker
+                    get_docker_containers_status
+                ]
+    return _tools
+
+
+# Herramientas con efectos: crean tickets o ejecutan diagnósticos en la máquina donde corre
+# el proceso (en un batch de consultas históricas, no es la del usuario). En modo solo
+# lectura se sustituyen por stubs que registran la llamada sin ejecutarla.
+SIDE_EFFECT_TOOLS = {
+    "create_support_ticket",
+    "get_system_performance",
+    "check_disk_space",
+    "check_network_connection",
+    "get_recent_system_errors",
+    "get_docker_containers_status",
+}
+
+# Llamadas que los stubs no han ejecutado en el turno actual (las fija run_agent_turn)
+_skipped_calls: contextvars.ContextVar[Optional[list]] = contextvars.ContextVar("skipped_calls", default=None)
+
+
+def _dry_run_stub(tool):
+    """Copia de `tool` (mismo nombre, descripción y argumentos) que solo registra la llamada"""
+    from langchain_core.tools import StructuredTool
+
+    def record(**kwargs):
+        calls = _skipped_calls.get()
+        if calls is not None:
+            calls.append({"name": tool.name, "args": kwargs})
+        return f"[Modo solo lectura] {tool.name} no se ha ejecutado. Responde sin su resultado."
+
+    return StructuredTool.from_function(
+        func=record, name=tool.name, description=tool.description, args_schema=tool.args_schema
+    )
+
+
+def get_dry_run_tools():
+    """Herramientas del agente con las de efectos sustituidas por stubs"""
+    return [_dry_run_stub(t) if t.name in SIDE_EFFECT_TOOLS else t for t in get_tools()]
+
 
 # System prompt
 SYSTEM_PROMPT = """Eres un asistente de soporte IT llamado **IT Assistant** para una empresa.
@@ -47,17 +121,22 @@ SYSTEM_PROMPT = """Eres un asistente de soporte IT llamado **IT Assistant** para
 1. 📚 **Consultar documentación**: Tienes acceso a manuales y guías IT de la empresa
 2. 🎫 **Gestión de tickets**: Puedes crear y consultar el estado de tickets en FreeScout
 3. 🖥️ **Diagnóstico del sistema**: Puedes obtener información de CPU, RAM, disco y red del sistema Windows
+4. 🐳 **Contenedores Docker**: Puedes consultar el estado de los contenedores
 
 **Herramientas disponibles**:
 - **Tickets**: 
   * create_support_ticket(subject, description, priority) - Crea un nuevo ticket
+  * find_similar_tickets(problem_description) - Busca tickets abiertos sobre el mismo problema
+  * search_tickets(query, page, only_open) - Busca tickets por palabras del asunto o los mensajes (paginado, 10 por página)
   * get_ticket_status(ticket_number) - Consulta estado de un ticket. **MUY IMPORTANTE**: ticket_number debe ser un número entero (1, 2, 3), NO texto ("1", "#1")
-- **Sistema**: get_system_performance, check_disk_space, check_network_connection
+- **Sistema**: get_system_performance, check_disk_space, check_network_connection, get_recent_system_errors(hours)
+- **Docker**: get_docker_containers_status(name_filter) - Estado de los contenedores (name_filter opcional, ej: "freescout")
 
 **IMPORTANTE sobre tickets**:
-- Cuando el usuario pregunte por "mis tickets" o "estado de tickets", pregúntale el número específico
+- Cuando el usuario pregunte por "mis tickets" o "estado de tickets" sin dar un número, pregúntale el número o busca por tema con search_tickets (ej: "¿qué tickets hay sobre la impresora?" → search_tickets("impresora"))
 - SIEMPRE usa números enteros para get_ticket_status: get_ticket_status(1) ✅, NO get_ticket_status("1") ❌
 - Si el usuario dice "ticket 1" o "ticket #1", extrae solo el número: 1
+- ANTES de crear un ticket, usa find_similar_tickets: si ya hay uno abierto sobre el mismo problema, díselo al usuario y no crees un duplicado salvo que él lo pida
 
 **Comportamiento**:
 - Sé amable, profesional y claro
@@ -65,6 +144,8 @@ SYSTEM_PROMPT = """Eres un asistente de soporte IT llamado **IT Assistant** para
 - Si el usuario reporta lentitud, usa get_system_performance para diagnosticar
 - Si reporta problemas de espacio, usa check_disk_space
 - Si hay problemas de red, usa check_network_connection
+- Si pregunta por errores recientes del sistema, usa get_recent_system_errors
+- Si pregunta por contenedores o un servicio Docker no responde, usa get_docker_containers_status
 - **Cuando crees un ticket, SIEMPRE destaca el número de ticket** para que el usuario lo pueda consultar después
 - Si no puedes resolver el problema, crea un ticket con toda la información recopilada
 - Siempre confirma al usuario cuando realices acciones
@@ -74,36 +155,66 @@ SYSTEM_PROMPT = """Eres un asistente de soporte IT llamado **IT Assistant** para
 1. **Lentitud del sistema** → get_system_performance → interpretar resultados
 2. **Problemas de red** → check_network_connection → diagnosticar
 3. **Consulta general** → Busca en el manual IT (RAG)
-4. **Problema no resuelto** → create_support_ticket con toda la info recopilada
+4. **Problema no resuelto** → find_similar_tickets → create_support_ticket con toda la info recopilada (si no hay uno igual abierto)
 
 ¡Adelante, ayuda a los usuarios!"""
 
-# Crear el agente usando LangGraph
-import warnings
-warnings.filterwarnings('ignore', category=DeprecationWarning)
+def get_agent_executor(dry_run: bool = False):
+    """
+    Retorna el grafo del agente LangGraph (se construye en la primera llamada).
+    Con dry_run=True, un grafo aparte con las herramientas de efectos sustituidas por stubs.
+    """
+    global _agent_executor, _dry_run_executor
+    if dry_run:
+        if _dry_run_executor is None:
+            llm = get_llm()
+            tools = get_dry_run_tools()
+            with _init_lock:
+                if _dry_run_executor is None:
+                    from langgraph.prebuilt import create_react_agent
+                    _dry_run_executor = create_react_agent(model=llm, tools=tools)
+        return _dry_run_executor
+    if _agent_executor is None:
+        llm = get_llm()
+        tools = get_tools()
+        with _init_lock:
+            if _agent_executor is None:
+                # Crear el agente usando LangGraph
+                import warnings
+                warnings.filterwarnings('ignore', category=DeprecationWarning)
 
-from langgraph.prebuilt import create_react_agent
+                from langgraph.prebuilt import create_react_agent
 
-# Crear agente sin modificador de estado (lo añadiremos en el mensaje)
-agent_executor = create_react_agent(
-    model=llm,
-    tools=tools
-)
+                # Crear agente sin modificador de estado (lo añadiremos en el mensaje)
+                _agent_executor = create_react_agent(
+                    model=llm,
+                    tools=tools
+                )
+    return _agent_executor
 
-def query_agent(user_message: str, chat_history: list = None) -> str:
+@dataclass
+class AgentTurn:
+    """Resultado completo de una consulta: respuesta, fragmentos recuperados y herramientas usadas"""
+    answer: str
+    docs: list = field(default_factory=list)
+    tool_calls: list = field(default_factory=list)
+    error: Optional[str] = None
+    # Llamadas a herramientas de efectos que no se ejecutaron (modo dry_run)
+    skipped_tool_calls: list = field(default_factory=list)
+
+def _build_user_message(user_message: str):
     """
-    Procesa una consulta del usuario usando el agente.
-    
-    Args:
-        user_message: Mensaje del usuario
-        chat_history: Historial de conversación (opcional)
+    Busca contexto en el RAG y construye el mensaje que recibe el agente.
     
     Returns:
-        Respuesta del agente
+        Tupla (mensaje enriquecido, documentos recuperados)
     """
+    relevant_docs = []
+    
     # Primero intenta buscar en el RAG
     try:
-        relevant_docs = get_relevant_docs(user_message, k=2)
+        with timed_stage("rag"):
+            relevant_docs = get_relevant_docs(user_message, k=RAG_TOP_K)
         if relevant_docs:
             context = "\n\n".join([doc.page_content for doc in relevant_docs])
             enhanced_message = f"""Usuario pregunta: {user_message}
@@ -117,40 +228,175 @@ Si la respuesta está en el contexto, úsala. Si no, usa tus herramientas."""
     except Exception as e:
         print(f"⚠️ Error al consultar RAG: {e}")
         enhanced_message = user_message
+    return enhanced_message, relevant_docs
+
+def _build_run_config() -> dict:
+    """Configuración de ejecución del grafo (callbacks de Langfuse y de medición)"""
+    # Preparar configuración con callbacks de Langfuse si está habilitado
+    config = {}
+    callbacks = []
+    langfuse_handler = get_langfuse_handler()
+    if langfuse_handler:
+        callbacks.append(langfuse_handler)
+    
+    # Si hay una medición activa (benchmarks), desglosar tiempos de LLM y herramientas
+    timings = current_timings()
+    if timings is not None:
+        from src.perf.callbacks import StageTimingCallback
+        callbacks.append(StageTimingCallback(timings))
+    
+    if callbacks:
+        config["callbacks"] = callbacks
+    return config
+
+def run_agent_turn(user_message: str, chat_history: list = None, dry_run: bool = False) -> AgentTurn:
+    """
+    Procesa una consulta del usuario usando el agente y devuelve el detalle del turno.
+    
+    Args:
+        user_message: Mensaje del usuario
+        chat_history: Historial de conversación (opcional)
+        dry_run: No ejecutar las herramientas con efectos (SIDE_EFFECT_TOOLS), solo registrarlas
+    
+    Returns:
+        AgentTurn con la respuesta, los documentos del RAG y las llamadas a herramientas
+    """
+    enhanced_message, relevant_docs = _build_user_message(user_message)
+    skipped_calls = []
+    token = _skipped_calls.set(skipped_calls)
     
     # Invocar al agente con el system prompt
     try:
-        # Preparar configuración con callbacks de Langfuse si está habilitado
-        config = {}
-        if langfuse_handler:
-            config["callbacks"] = [langfuse_handler]
+        config = _build_run_config()
+        agent_executor = get_agent_executor(dry_run=dry_run)
+        with timed_stage("agent"):
+            response = agent_executor.invoke(
+                {
+                    "messages": [
+                        ("system", SYSTEM_PROMPT),
+                        ("user", enhanced_message)
+                    ]
+                },
+                config=config
+            )
         
-        response = agent_executor.invoke(
-            {
-                "messages": [
-                    ("system", SYSTEM_PROMPT),
-                    ("user", enhanced_message)
-                ]
-            },
-            config=config
-        )
+        messages = response.get("messages", [])
+        tool_calls = [
+            {"name": call["name"], "args": call["args"]}
+            for message in messages
+            for call in (getattr(message, "tool_calls", None) or [])
+        ]
         
         # Extraer la respuesta final
-        if "messages" in response and len(response["messages"]) > 0:
-            last_message = response["messages"][-1]
+        if len(messages) > 0:
+            last_message = messages[-1]
             # Manejar diferentes tipos de mensajes
             if hasattr(last_message, 'content'):
-                return last_message.content
+                answer = last_message.content
             else:
-                return str(last_message)
+                answer = str(last_message)
         else:
-            return "Lo siento, no pude procesar tu solicitud. Por favor, intenta de nuevo."
+            answer = "Lo siento, no pude procesar tu solicitud. Por favor, intenta de nuevo."
+        return AgentTurn(answer=answer, docs=relevant_docs, tool_calls=tool_calls,
+                         skipped_tool_calls=skipped_calls)
             
     except Exception as e:
         print(f"❌ Error en el agente: {e}")
         import traceback
         traceback.print_exc()
-        return f"Ocurrió un error al procesar tu solicitud: {str(e)}"
+        return AgentTurn(
+            answer=f"Ocurrió un error al procesar tu solicitud: {str(e)}",
+            docs=relevant_docs,
+            error=str(e),
+            skipped_tool_calls=skipped_calls
+        )
+    finally:
+        _skipped_calls.reset(token)
+
+def query_agent(user_message: str, chat_history: list = None) -> str:
+    """
+    Procesa una consulta del usuario usando el agente.
+    
+    Args:
+        user_message: Mensaje del usuario
+        chat_history: Historial de conversación (opcional)
+    
+    Returns:
+        Respuesta del agente
+    """
+    return run_agent_turn(user_message, chat_history).answer
+
+def stream_agent_turn(user_message: str, chat_history: list = None):
+    """
+    Igual que run_agent_turn pero genera la respuesta por fragmentos a medida que llega del LLM.
+    
+    Yields:
+        Dicts {"type": "token", "content": ...}, {"type": "tool", "name": ...}
+        y un último {"type": "done", "answer": ..., "docs": [...]} (o {"type": "error", ...})
+    """
+    enhanced_message, relevant_docs = _build_user_message(user_message)
+    answer_parts = []
+    try:
+        agent_executor = get_agent_executor()
+        stream = agent_executor.stream(
+            {
+                "messages": [
+                    ("system", SYSTEM_PROMPT),
+                    ("user", enhanced_message)
+                ]
+            },
+            config=_build_run_config(),
+            stream_mode="messages"
+        )
+        for chunk, metadata in stream:
+            # Solo interesan los mensajes del nodo del LLM, no las salidas de herramientas
+            if metadata.get("langgraph_node") != "agent":
+                continue
+            for call in getattr(chunk, "tool_call_chunks", None) or []:
+                if call.get("name"):
+                    answer_parts.clear()
+                    yield {"type": "tool", "name": call["name"]}
+            if isinstance(chunk.content, str) and chunk.content:
+                answer_parts.append(chunk.content)
+                yield {"type": "token", "content": chunk.content}
+        yield {"type": "done", "answer": "".join(answer_parts), "docs": relevant_docs}
+    except Exception as e:
+        print(f"❌ Error en el agente: {e}")
+        yield {"type": "error", "error": f"Ocurrió un error al procesar tu solicitud: {str(e)}"}
+
+def warmup(dummy_query: bool = False) -> dict:
+    """
+    Precarga todo lo que necesita la primera consulta y mide cada fase.
+    
+    Fases:
+        embeddings:  carga del modelo de embeddings + una inferencia de prueba
+        vectorstore: apertura del índice vectorial
+        agent:       construcción del LLM, herramientas y grafo LangGraph
+        dummy_query: consulta completa de prueba (opcional, consume una llamada al LLM)
+    
+    Returns:
+        Dict {fase: segundos}; las fases que fallan se registran con un aviso y no detienen el arranque
+    """
+    import time
+    from src.rag.rag_retriever import get_embeddings, get_vectordb
+    
+    phases = [
+        ("embeddings", lambda: get_embeddings().embed_query("warmup")),
+        ("vectorstore", get_vectordb),
+        ("agent", get_agent_executor),
+    ]
+    if dummy_query:
+        phases.append(("dummy_query", lambda: query_agent("¿Cómo reseteo mi contraseña?")))
+    
+    timings = {}
+    for name, load in phases:
+        start = time.perf_counter()
+        try:
+            load()
+        except Exception as e:
+            print(f"⚠️ Warm-up '{name}' falló: {e}")
+        timings[name] = time.perf_counter() - start
+    return timings
 
 if __name__ == "__main__":
     # Test del agente
@@ -0,0 +1,211 @@
+"""
+📦 Modo batch: ejecuta miles de consultas con el mismo pipeline que `query_agent`
+
+Lee un JSONL o CSV de consultas, las procesa con concurrencia acotada reutilizando
+los recursos precargados (embeddings, índice y agente) y escribe un JSONL con la
+respuesta, los fragmentos recuperados, las herramientas usadas y los tiempos.
+
+Por defecto se ejecuta en modo solo lectura (--dry-run): las herramientas con efectos
+(crear tickets, diagnósticos del sistema, Docker, logs) no se ejecutan; cada registro
+guarda en `skipped_tool_calls` las llamadas que el agente intentó. Con --no-dry-run se
+ejecutan de verdad (ej: un batch que sí debe crear tickets).
+
+El propio fichero de salida hace de checkpoint: si el proceso se interrumpe, al
+relanzar el mismo comando se saltan las consultas ya escritas. Con --retry-errors
+las consultas fallidas se vuelven a añadir al final; vale el último registro de cada id.
+
+Formato de entrada:
+    JSONL: {"id": "123", "query": "¿Cómo me conecto a la VPN?"}   (también "question" o "text")
+    CSV:   columnas id,query  (id es opcional; por defecto se usa el número de línea)
+
+Uso:
+    python -m src.agent.batch --input historico.jsonl --output respuestas.jsonl --concurrency 4
+"""
+import argparse
+import csv
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Dict, Iterator, Set, Tuple
+
+from src.perf.timing import collect_stages, percentile
+
+QUERY_FIELDS = ("query", "question", "text")
+
+
+def read_queries(path: str) -> Iterator[Tuple[str, str]]:
+    """Genera pares (id, consulta) a partir de un JSONL o CSV"""
+    if path.lower().endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as f:
+            for n, row in enumerate(csv.DictReader(f), start=1):
+                query = next((row[k] for k in QUERY_FIELDS if row.get(k)), None)
+                if query:
+                    yield str(row.get("id") or n), query
+    else:
+        with open(path, encoding="utf-8") as f:
+            for n, line in enumerate(f, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                record = json.loads(line)
+                query = next((record[k] for k in QUERY_FIELDS if record.get(k)), None)
+                if query:
+                    yield str(record.get("id", n)), query
+
+
+def load_checkpoint(output_path: str, retry_errors: bool = False) -> Set[str]:
+    """
+    Retorna los ids ya procesados en el fichero de salida.
+    Si la última línea quedó a medias por una interrupción, se recorta.
+    """
+    done: Set[str] = set()
+    path = Path(output_path)
+    if not path.exists():
+        return done
+
+    valid_bytes = 0
+    with open(path, "rb") as f:
+        for raw in f:
+            try:
+                record = json.loads(raw)
+            except ValueError:
+                break
+            valid_bytes += len(raw)
+            if retry_errors and record.get("error"):
+                continue
+            done.add(str(record["id"]))
+
+    if valid_bytes < path.stat().st_size:
+        print(f"⚠️ Recortando línea incompleta al final de {output_path}")
+        with open(path, "r+b") as f:
+            f.truncate(valid_bytes)
+    return done
+
+
+def process_query(query_id: str, query: str, dry_run: bool = True) -> Dict:
+    """Ejecuta una consulta con el pipeline del agente y construye el registro de salida"""
+    from src.agent.agent import run_agent_turn
+    from src.rag.rag_retriever import doc_chunk_id
+
+    with collect_stages() as timings:
+        start = time.perf_counter()
+        try:
+            turn = run_agent_turn(query, dry_run=dry_run)
+            answer, docs, tool_calls, error = turn.answer, turn.docs, turn.tool_calls, turn.error
+            skipped = turn.skipped_tool_calls
+        except Exception as e:
+            answer, docs, tool_calls, error, skipped = None, [], [], str(e), []
+        total = time.perf_counter() - start
+
+    return {
+        "id": query_id,
+        "query": query,
+        "answer": answer,
+        "chunk_ids": [doc_chunk_id(doc) for doc in docs],
+        "tool_calls": tool_calls,
+        "dry_run": dry_run,
+        "skipped_tool_calls": skipped,
+        "timings_ms": {stage: round(seconds * 1000, 2) for stage, seconds in timings.as_dict().items()},
+        "total_ms": round(total * 1000, 2),
+        "error": error,
+    }
+
+
+def run_batch(input_path: str, output_path: str, concurrency: int = 4,
+              retry_errors: bool = False, limit: int = None, fsync_every: int = 50,
+              dry_run: bool = True) -> Dict:
+    """Procesa el fichero de entrada y añade los resultados al de salida"""
+    done = load_checkpoint(output_path, retry_errors=retry_errors)
+    if done:
+        print(f"⏩ Checkpoint: {len(done)} consultas ya procesadas, se saltarán")
+
+    pending = ((qid, q) for qid, q in read_queries(input_path) if qid not in done)
+    if limit:
+        pending = (item for n, item in enumerate(pending) if n < limit)
+
+    processed, errors, totals = 0, 0, []
+    started = time.perf_counter()
+    with open(output_path, "a", encoding="utf-8") as out, \
+            ThreadPoolExecutor(max_workers=concurrency) as pool:
+        in_flight = set()
+
+        def write(record: Dict):
+            nonlocal processed, errors
+            out.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+            out.flush()
+            processed += 1
+            totals.append(record["total_ms"])
+            if record["error"]:
+                errors += 1
+            if processed % fsync_every == 0:
+                os.fsync(out.fileno())
+                rate = processed / (time.perf_counter() - started)
+                print(f"   {processed} consultas ({rate:.2f}/s, {errors} errores)")
+
+        try:
+            for query_id, query in pending:
+                # Ventana acotada: nunca más de 2×concurrencia consultas en vuelo
+                if len(in_flight) >= concurrency * 2:
+                    finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        write(future.result())
+                in_flight.add(pool.submit(process_query, query_id, query, dry_run))
+            for future in wait(in_flight).done:
+                write(future.result())
+        except KeyboardInterrupt:
+            print("\n⏸️ Interrumpido: relanza el mismo comando para continuar desde el checkpoint")
+            for future in in_flight:
+                future.cancel()
+            raise
+        finally:
+            out.flush()
+            os.fsync(out.fileno())
+
+    elapsed = time.perf_counter() - started
+    return {
+        "processed": processed,
+        "skipped": len(done),
+        "errors": errors,
+        "elapsed_s": round(elapsed, 2),
+        "throughput_qps": round(processed / elapsed, 3) if elapsed else 0.0,
+        "p50_ms": round(percentile(totals, 50), 2),
+        "p95_ms": round(percentile(totals, 95), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ejecuta consultas en lote con el agente IT")
+    parser.add_argument("--input", required=True, help="Fichero JSONL o CSV con las consultas")
+    parser.add_argument("--output", required=True, help="Fichero JSONL de resultados (también checkpoint)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Consultas simultáneas")
+    parser.add_argument("--retry-errors", action="store_true", help="Reprocesar las consultas que fallaron")
+    parser.add_argument("--limit", type=int, default=None, help="Procesar como máximo N consultas nuevas")
+    parser.add_argument("--no-warmup", action="store_true", help="No precargar recursos antes de empezar")
+    parser.add_argument("--dry-run", action=argparse.BooleanOptionalAction, default=True,
+                        help="No ejecutar herramientas con efectos, solo registrarlas (por defecto; "
+                             "--no-dry-run para ejecutarlas)")
+    args = parser.parse_args()
+
+    if not args.no_warmup:
+        from src.agent.agent import warmup
+        print("🔥 Precargando embeddings, índice y agente...")
+        for phase, seconds in warmup().items():
+            print(f"   {phase:<14}{seconds:>8.2f} s")
+
+    mode = "solo lectura" if args.dry_run else "⚠️ ejecutando herramientas con efectos"
+    print(f"📦 Procesando {args.input} → {args.output} (concurrencia {args.concurrency}, {mode})")
+    summary = run_batch(args.input, args.output, args.concurrency, args.retry_errors, args.limit,
+                        dry_run=args.dry_run)
+
+    print("="*60)
+    print("✅ Batch completado")
+    print(f"   Procesadas: {summary['processed']} | Saltadas: {summary['skipped']} | Errores: {summary['errors']}")
+    print(f"   Throughput: {summary['throughput_qps']} consultas/s")
+    print(f"   Latencia p50/p95: {summary['p50_ms']} / {summary['p95_ms']} ms")
+    print("="*60)
+
+
+if __name__ == "__main__":
+    main()
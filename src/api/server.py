@@ -0,0 +1,324 @@
+"""
+🔌 API HTTP del agente IT con varios workers (pre-fork)
+
+Endpoints:
+    GET  /health            Estado del worker y su uso de memoria
+    POST /v1/query          {"message": "..."} → {"answer", "chunk_ids", "tool_calls"}
+    POST /v1/query/stream   Igual, pero responde NDJSON por fragmentos (chunked)
+
+Modelo de procesos:
+    El proceso maestro carga el modelo de embeddings y construye el agente, congela
+    el GC (gc.freeze) y después hace fork de API_WORKERS procesos que comparten el
+    socket de escucha. Las páginas del modelo se comparten copy-on-write entre todos
+    los workers en lugar de duplicarse. Las conexiones que no sobreviven a un fork
+    (cliente de Chroma/SQLite) se abren en cada worker después del fork; el índice
+    plano (RAG_BACKEND=flat) es un mmap de solo lectura y se abre antes.
+
+    En sistemas sin fork (Windows) se ejecuta un único proceso con hilos.
+
+Uso:
+    python -m src.api.server --workers 4
+    python -m src.api.server --workers 4 --no-preload   # cada worker carga su copia (comparativa)
+    python -m src.api.server --workers 4 --memory-report 30 --memory-report-output memoria_preload.json
+"""
+import argparse
+import gc
+import json
+import os
+import signal
+import socket
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+
+from src.config import (
+    API_HOST,
+    API_PORT,
+    API_WORKERS,
+    API_PRELOAD,
+    API_TORCH_THREADS,
+    DEBUG_MODE,
+    RAG_BACKEND,
+    require_groq_api_key,
+)
+
+MAX_BODY_BYTES = 64 * 1024
+
+
+# ==================== MEMORIA ====================
+
+def read_memory(pid: int = None) -> Dict[str, float]:
+    """
+    Uso de memoria de un proceso en MB (Linux, /proc/<pid>/smaps_rollup).
+    - rss:     páginas residentes (cuenta varias veces las compartidas)
+    - pss:     reparto proporcional de las compartidas (suma real entre procesos)
+    - private: páginas exclusivas de este proceso
+    """
+    path = f"/proc/{pid or os.getpid()}/smaps_rollup"
+    values = {}
+    try:
+        with open(path) as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                parts = rest.split()
+                if parts and parts[-1] == "kB":
+                    values[key] = int(parts[0]) / 1024
+    except OSError:
+        return {}
+    return {
+        "rss_mb": round(values.get("Rss", 0.0), 1),
+        "pss_mb": round(values.get("Pss", 0.0), 1),
+        "private_mb": round(values.get("Private_Clean", 0.0) + values.get("Private_Dirty", 0.0), 1),
+    }
+
+
+def print_memory_report(master_pid: int, worker_pids: List[int]) -> List[Dict]:
+    """Imprime la memoria del maestro y de cada worker; devuelve las filas medidas"""
+    rows = []
+    print("\n" + "="*60)
+    print("🧠 MEMORIA POR PROCESO (MB)")
+    print("="*60)
+    print(f"{'proceso':<18}{'rss':>12}{'pss':>12}{'privada':>12}")
+    print("-"*60)
+    total_pss = 0.0
+    for label, pid in [("maestro", master_pid)] + [(f"worker {pid}", pid) for pid in worker_pids]:
+        mem = read_memory(pid)
+        if not mem:
+            continue
+        total_pss += mem["pss_mb"]
+        rows.append({"process": label.split()[0], "pid": pid, **mem})
+        print(f"{label:<18}{mem['rss_mb']:>12.1f}{mem['pss_mb']:>12.1f}{mem['private_mb']:>12.1f}")
+    print("-"*60)
+    print(f"{'total (pss)':<18}{'':>12}{total_pss:>12.1f}")
+    print("="*60)
+    return rows
+
+
+# ==================== CARGA DE RECURSOS ====================
+
+def preload_shared():
+    """Recursos de solo lectura que se cargan antes del fork y se comparten entre workers"""
+    # Los tokenizers de HuggingFace no toleran hilos creados antes del fork
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+    from src.agent.agent import get_agent_executor
+    from src.rag.rag_retriever import get_embeddings
+
+    start = time.perf_counter()
+    get_embeddings().embed_query("warmup")
+    get_agent_executor()
+    if RAG_BACKEND == "flat":
+        # El índice plano es un mmap de solo lectura: se comparte sin problemas tras el fork
+        from src.rag.rag_retriever import get_vectordb
+        get_vectordb()
+    print(f"🔥 Recursos compartidos cargados en {time.perf_counter() - start:.2f}s")
+
+
+def open_worker_resources():
+    """Recursos que deben abrirse en cada worker (conexiones que no sobreviven a un fork)"""
+    if API_TORCH_THREADS > 0 and "torch" in sys.modules:
+        sys.modules["torch"].set_num_threads(API_TORCH_THREADS)
+    from src.rag.rag_retriever import get_vectordb
+    get_vectordb()
+    # Cada worker tiene su propio segmento del spool de tickets en diferido y reenvía lo pendiente
+    from src.tools.ticket_spool import get_ticket_writer
+    get_ticket_writer()
+
+
+# ==================== HANDLER HTTP ====================
+
+class ChatAPIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "ITAssistantAPI/1.0"
+
+    def log_message(self, format, *args):
+        if DEBUG_MODE:
+            super().log_message(format, *args)
+
+    def _send_json(self, status: int, payload: Dict):
+        body = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self) -> Dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        if length <= 0 or length > MAX_BODY_BYTES:
+            raise ValueError("Cuerpo vacío o demasiado grande")
+        return json.loads(self.rfile.read(length))
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, {"status": "ok", "pid": os.getpid(), **read_memory()})
+        else:
+            self._send_json(404, {"error": "Ruta no encontrada"})
+
+    def do_POST(self):
+        if self.path not in ("/v1/query", "/v1/query/stream"):
+            self._send_json(404, {"error": "Ruta no encontrada"})
+            return
+        try:
+            payload = self._read_json()
+            message = str(payload.get("message", "")).strip()
+            if not message:
+                raise ValueError("Falta 'message'")
+        except ValueError as e:
+            self._send_json(400, {"error": str(e)})
+            return
+
+        if self.path == "/v1/query":
+            self._handle_query(message, payload.get("history"))
+        else:
+            self._handle_stream(message, payload.get("history"))
+
+    def _handle_query(self, message: str, history):
+        from src.agent.agent import run_agent_turn
+        from src.rag.rag_retriever import doc_chunk_id
+
+        turn = run_agent_turn(message, chat_history=history)
+        self._send_json(200, {
+            "answer": turn.answer,
+            "chunk_ids": [doc_chunk_id(doc) for doc in turn.docs],
+            "tool_calls": turn.tool_calls,
+            "error": turn.error,
+        })
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _handle_stream(self, message: str, history):
+        from src.agent.agent import stream_agent_turn
+        from src.rag.rag_retriever import doc_chunk_id
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson; charset=utf-8")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        try:
+            for event in stream_agent_turn(message, chat_history=history):
+                if event["type"] == "done":
+                    event = {"type": "done", "answer": event["answer"],
+                             "chunk_ids": [doc_chunk_id(doc) for doc in event["docs"]]}
+                self._write_chunk((json.dumps(event, ensure_ascii=False) + "\n").encode("utf-8"))
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # El cliente cerró la conexión a mitad de respuesta
+            self.close_connection = True
+
+
+# ==================== PROCESOS ====================
+
+def run_worker(sock: socket.socket, preload: bool):
+    """Bucle de un worker: sirve peticiones sobre el socket compartido"""
+    if not preload:
+        preload_shared()
+    open_worker_resources()
+
+    httpd = ThreadingHTTPServer(sock.getsockname()[:2], ChatAPIHandler, bind_and_activate=False)
+    httpd.socket.close()
+    httpd.socket = sock
+    httpd.daemon_threads = True
+    print(f"👷 Worker {os.getpid()} listo")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+
+
+def serve(host: str = API_HOST, port: int = API_PORT, workers: int = API_WORKERS,
+          preload: bool = API_PRELOAD, memory_report: float = 0, memory_report_output: str = None):
+    sock = socket.create_server((host, port), backlog=256)
+    print(f"🔌 API escuchando en http://{host}:{port} ({workers} workers, preload={'sí' if preload else 'no'})")
+
+    if preload:
+        preload_shared()
+        # Sacar los objetos cargados del GC para que sus cabeceras no se escriban
+        # (y se copien) en cada worker durante las recolecciones
+        gc.collect()
+        gc.freeze()
+
+    if workers <= 1 or not hasattr(os, "fork"):
+        run_worker(sock, preload)
+        return
+
+    children: Dict[int, int] = {}
+    stopping = False
+
+    def spawn(slot: int):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            try:
+                run_worker(sock, preload)
+            finally:
+                os._exit(0)
+        children[pid] = slot
+
+    def shutdown(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    for slot in range(workers):
+        spawn(slot)
+
+    report_at = time.monotonic() + memory_report if memory_report else None
+    while children:
+        if report_at and time.monotonic() >= report_at:
+            rows = print_memory_report(os.getpid(), list(children))
+            if memory_report_output:
+                with open(memory_report_output, "w", encoding="utf-8") as f:
+                    json.dump({"workers": workers, "preload": preload, "processes": rows}, f, indent=2)
+                print(f"💾 Informe de memoria guardado en: {memory_report_output}")
+            report_at = None
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+        if pid == 0:
+            time.sleep(0.5)
+            continue
+        slot = children.pop(pid, None)
+        if not stopping and slot is not None:
+            print(f"⚠️ Worker {pid} terminó (estado {status}); relanzando...")
+            spawn(slot)
+
+    sock.close()
+    print("👋 API detenida")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API HTTP multi-proceso del agente IT")
+    parser.add_argument("--host", default=API_HOST)
+    parser.add_argument("--port", type=int, default=API_PORT)
+    parser.add_argument("--workers", type=int, default=API_WORKERS)
+    parser.add_argument("--no-preload", action="store_true",
+                        help="Cargar el modelo en cada worker tras el fork (lanzamiento ingenuo)")
+    parser.add_argument("--memory-report", type=float, default=0, metavar="SEGUNDOS",
+                        help="Mostrar la memoria de cada proceso pasados N segundos")
+    parser.add_argument("--memory-report-output", metavar="JSON",
+                        help="Guardar también el informe de memoria en JSON")
+    args = parser.parse_args()
+
+    # Fallar en el maestro, antes del fork, y no en cada worker con la primera consulta
+    require_groq_api_key()
+    serve(args.host, args.port, args.workers, preload=API_PRELOAD and not args.no_preload,
+          memory_report=args.memory_report, memory_report_output=args.memory_report_output)
+
+
+if __name__ == "__main__":
+    main()
@@ -10,9 +10,13 @@ load_dotenv()
 # ==================== API KEYS ====================
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 
-# Validación de API keys requeridas
-if not GROQ_API_KEY:
-    raise ValueError("❌ GROQ_API_KEY no encontrada en el archivo .env")
+
+def require_groq_api_key() -> str:
+    """Retorna la API key de Groq o lanza un error si no está configurada"""
+    api_key = os.getenv("GROQ_API_KEY") or GROQ_API_KEY
+    if not api_key:
+        raise ValueError("❌ GROQ_API_KEY no encontrada en el archivo .env")
+    return api_key
 
 # ==================== LLM CONFIGURATION (GROQ + GEMMA) ====================
 LLM_MODEL = os.getenv("LLM_MODEL", "gemma2-9b-it")
@@ -27,19 +31,89 @@ MYSQL_PASSWORD = os.getenv("MYSQL_PASSWORD", "freescout_password")
 MYSQL_DATABASE = os.getenv("MYSQL_DATABASE", "freescout")
 
 # ==================== CHROMADB / RAG ====================
+# Backend del índice vectorial: "chroma" o "flat" (matriz mmap + NumPy, ver src/rag/flat_index.py)
+RAG_BACKEND = os.getenv("RAG_BACKEND", "chroma").lower()
+FLAT_INDEX_DIR = os.getenv("FLAT_INDEX_DIR", "./data/FLAT_INDEX")
+# Índices versionados: si existe INDEX_ROOT/CURRENT se usa la versión activa y se cambia en caliente
+INDEX_ROOT = os.getenv("INDEX_ROOT", "./data/INDEX")
+INDEX_POLL_SECONDS = float(os.getenv("INDEX_POLL_SECONDS", "5"))
+INDEX_KEEP_VERSIONS = int(os.getenv("INDEX_KEEP_VERSIONS", "3"))
 CHROMA_DIR = os.getenv("CHROMA_DIR", "./data/CHROMA_DB")
 CHROMA_COLLECTION_NAME = os.getenv("CHROMA_COLLECTION_NAME", "manual_it")
 EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+# Agrupar en un solo batch las consultas concurrentes que llegan en una ventana de pocos ms
+EMBEDDING_BATCHING = os.getenv("EMBEDDING_BATCHING", "true").lower() == "true"
+EMBEDDING_BATCH_MAX_SIZE = int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "32"))
+EMBEDDING_BATCH_MAX_WAIT_MS = float(os.getenv("EMBEDDING_BATCH_MAX_WAIT_MS", "5"))
 
 # ==================== RAG PARAMETERS ====================
 CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "500"))
 CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "50"))
 RAG_TOP_K = int(os.getenv("RAG_TOP_K", "2"))
+# "mmr" descarta chunks redundantes entre sí al recuperar; "similarity" = los k más parecidos
+RAG_SEARCH_TYPE = os.getenv("RAG_SEARCH_TYPE", "mmr").lower()
+RAG_MMR_FETCH_K = int(os.getenv("RAG_MMR_FETCH_K", "10"))
+# 1 = solo relevancia, 0 = solo diversidad
+RAG_MMR_LAMBDA = float(os.getenv("RAG_MMR_LAMBDA", "0.7"))
+# Similitud de Jaccard (MinHash) a partir de la cual un chunk se considera casi duplicado al indexar (0 = no filtrar)
+RAG_DEDUP_THRESHOLD = float(os.getenv("RAG_DEDUP_THRESHOLD", "0.9"))
 
 # ==================== GRADIO ====================
 GRADIO_SERVER_NAME = os.getenv("GRADIO_SERVER_NAME", "0.0.0.0")
 GRADIO_SERVER_PORT = int(os.getenv("GRADIO_SERVER_PORT", "7860"))
 GRADIO_SHARE = os.getenv("GRADIO_SHARE", "false").lower() == "true"
+# Número de peticiones de chat que se procesan a la vez (1 = comportamiento por defecto de Gradio)
+GRADIO_CONCURRENCY_LIMIT = int(os.getenv("GRADIO_CONCURRENCY_LIMIT", "1"))
+
+# ==================== API HTTP ====================
+API_HOST = os.getenv("API_HOST", "0.0.0.0")
+API_PORT = int(os.getenv("API_PORT", "8000"))
+API_WORKERS = int(os.getenv("API_WORKERS", "2"))
+# Cargar el modelo de embeddings y el agente antes de hacer fork (memoria compartida copy-on-write)
+API_PRELOAD = os.getenv("API_PRELOAD", "true").lower() == "true"
+# Hilos de PyTorch por worker (0 = valor por defecto de torch)
+API_TORCH_THREADS = int(os.getenv("API_TORCH_THREADS", "0"))
+# Si se define, la interfaz Gradio actúa como cliente ligero de la API (ej: http://localhost:8000)
+CHAT_API_URL = os.getenv("CHAT_API_URL", "")
+CHAT_API_TIMEOUT = float(os.getenv("CHAT_API_TIMEOUT", "120"))
+
+# ==================== FEED DE TICKETS ====================
+# Hilo que sigue los cambios de tickets en FreeScout (estado en memoria + avisos a las sesiones)
+TICKET_WATCHER_ENABLED = os.getenv("TICKET_WATCHER_ENABLED", "true").lower() == "true"
+TICKET_WATCH_INTERVAL = float(os.getenv("TICKET_WATCH_INTERVAL", "5"))
+# Si el feed lleva más de estos segundos sin actualizarse, el estado se consulta en MySQL
+TICKET_MAX_STALENESS = float(os.getenv("TICKET_MAX_STALENESS", "15"))
+TICKET_SNAPSHOT_SIZE = int(os.getenv("TICKET_SNAPSHOT_SIZE", "10000"))
+# Crear los tickets en segundo plano: se confirman al instante y se guardan en un spool local
+TICKET_WRITE_BEHIND = os.getenv("TICKET_WRITE_BEHIND", "false").lower() == "true"
+TICKET_SPOOL_DIR = os.getenv("TICKET_SPOOL_DIR", "./data/ticket_spool")
+# Espera inicial entre reintentos si FreeScout no está disponible (se duplica hasta 60 s)
+TICKET_SPOOL_RETRY_SECONDS = float(os.getenv("TICKET_SPOOL_RETRY_SECONDS", "5"))
+# Índice de embeddings de tickets abiertos (find_similar_tickets)
+TICKET_INDEX_ENABLED = os.getenv("TICKET_INDEX_ENABLED", "true").lower() == "true"
+TICKET_INDEX_PATH = os.getenv("TICKET_INDEX_PATH", "./data/ticket_index")
+TICKET_INDEX_REFRESH_SECONDS = float(os.getenv("TICKET_INDEX_REFRESH_SECONDS", "10"))
+# Similitud coseno mínima para considerar que dos tickets tratan el mismo problema
+TICKET_SIMILARITY_MIN = float(os.getenv("TICKET_SIMILARITY_MIN", "0.6"))
+
+# ==================== DOCKER ====================
+# Daemon de Docker: socket unix (Linux / WSL) o TCP (ej: tcp://localhost:2375 en Docker Desktop)
+DOCKER_HOST = os.getenv("DOCKER_HOST", "unix:///var/run/docker.sock")
+DOCKER_TIMEOUT = float(os.getenv("DOCKER_TIMEOUT", "5"))
+
+# ==================== LOGS DEL SISTEMA ====================
+# Ficheros de log (estilo syslog) en los que se buscan errores, separados por comas
+SYSTEM_LOG_FILES = [p.strip() for p in os.getenv(
+    "SYSTEM_LOG_FILES", "/var/log/syslog,/var/log/messages,/var/log/kern.log"
+).split(",") if p.strip()]
+# Posiciones leídas y contadores de errores (para no reescanear al reiniciar)
+LOG_STATE_FILE = os.getenv("LOG_STATE_FILE", "./data/log_analyzer_state.json")
+LOG_BUCKET_SECONDS = int(os.getenv("LOG_BUCKET_SECONDS", "300"))
+LOG_RETENTION_HOURS = float(os.getenv("LOG_RETENTION_HOURS", "24"))
+# La primera vez que se ve un fichero solo se analizan sus últimos N bytes
+LOG_INITIAL_SCAN_BYTES = int(os.getenv("LOG_INITIAL_SCAN_BYTES", str(50 * 1024 * 1024)))
+# Segundos entre lecturas de los logs en segundo plano
+LOG_UPDATE_INTERVAL = float(os.getenv("LOG_UPDATE_INTERVAL", "30"))
 
 # ==================== LANGFUSE (OPCIONAL) ====================
 LANGFUSE_SECRET_KEY = os.getenv("LANGFUSE_SECRET_KEY", None)
@@ -47,9 +121,6 @@ LANGFUSE_PUBLIC_KEY = os.getenv("LANGFUSE_PUBLIC_KEY", None)
 LANGFUSE_BASE_URL = os.getenv("LANGFUSE_BASE_URL", "https://cloud.langfuse.com")
 LANGFUSE_ENABLED = bool(LANGFUSE_SECRET_KEY and LANGFUSE_PUBLIC_KEY)
 
-if LANGFUSE_ENABLED:
-    print("✅ Langfuse tracing habilitado")
-
 # ==================== DEFAULT CUSTOMER ====================
 DEFAULT_CUSTOMER_EMAIL = os.getenv("DEFAULT_CUSTOMER_EMAIL", "usuario@empresa.local")
 DEFAULT_CUSTOMER_NAME = os.getenv("DEFAULT_CUSTOMER_NAME", "Usuario IT")
@@ -57,6 +128,12 @@ DEFAULT_CUSTOMER_NAME = os.getenv("DEFAULT_CUSTOMER_NAME", "Usuario IT")
 # ==================== SISTEMA ====================
 DEBUG_MODE = os.getenv("DEBUG_MODE", "false").lower() == "true"
 
+# ==================== ARRANQUE ====================
+# Precargar embeddings, índice y agente al lanzar main.py (en vez de en la primera consulta)
+WARMUP_ON_START = os.getenv("WARMUP_ON_START", "true").lower() == "true"
+# Lanzar además una consulta de prueba completa (consume una llamada al LLM)
+WARMUP_DUMMY_QUERY = os.getenv("WARMUP_DUMMY_QUERY", "false").lower() == "true"
+
 def print_config():
     """Muestra la configuración actual (sin datos sensibles)"""
     print("="*60)
@@ -65,12 +142,18 @@ def print_config():
     print(f"🤖 LLM: {LLM_MODEL} (Groq)")
     print(f"🌡️  Temperatura: {LLM_TEMPERATURE}")
     print(f"🗄️  MySQL Host: {MYSQL_HOST}:{MYSQL_PORT}")
-    print(f"📦 ChromaDB: {CHROMA_DIR}")
+    if RAG_BACKEND == "flat":
+        print(f"📦 Índice plano: {FLAT_INDEX_DIR}")
+    else:
+        print(f"📦 ChromaDB: {CHROMA_DIR}")
     print(f"🧠 Embedding Model: {EMBEDDING_MODEL}")
-    print(f"📊 RAG Top-K: {RAG_TOP_K}")
-    print(f"🌐 Gradio: {GRADIO_SERVER_NAME}:{GRADIO_SERVER_PORT}")
+    print(f"📊 RAG Top-K: {RAG_TOP_K} ({RAG_SEARCH_TYPE})")
+    print(f"🌐 Gradio: {GRADIO_SERVER_NAME}:{GRADIO_SERVER_PORT} (concurrencia: {GRADIO_CONCURRENCY_LIMIT})")
+    if CHAT_API_URL:
+        print(f"🔌 API del agente: {CHAT_API_URL}")
     print(f"🔍 Langfuse: {'Habilitado' if LANGFUSE_ENABLED else 'Deshabilitado'}")
     print(f"🐛 Debug Mode: {'Habilitado' if DEBUG_MODE else 'Deshabilitado'}")
+    print(f"🔥 Warm-up: {'Habilitado' if WARMUP_ON_START else 'Deshabilitado'}")
     print("="*60)
 
 if __name__ == "__main__":
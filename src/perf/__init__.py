@@ -0,0 +1,3 @@
+"""
+Herramientas de medición de rendimiento (benchmarks, backends falsos, tiempos por etapa)
+"""
@@ -0,0 +1,173 @@
+"""
+📊 Benchmark de latencia extremo a extremo de `query_agent` (offline)
+
+Ejecuta escenarios representativos (FAQ, creación de tickets, diagnóstico) contra
+backends falsos y reporta p50/p95/p99 por escenario y por etapa:
+- rag:    búsqueda en el índice vectorial
+- agent:  ejecución completa del grafo LangGraph
+- llm:    tiempo dentro del modelo de chat
+- tools:  tiempo dentro de las herramientas
+- total:  llamada completa a query_agent
+
+Uso:
+    python -m src.perf.benchmark --iterations 50
+    python -m src.perf.benchmark --save-baseline default
+    python -m src.perf.benchmark --compare default
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from src.perf.fakes import offline_backends
+from src.perf.timing import collect_stages, summarize
+
+BASELINES_DIR = Path(__file__).resolve().parents[2] / "benchmarks" / "baselines"
+
+SCENARIOS: Dict[str, List[str]] = {
+    "faq": [
+        "¿Cómo reseteo mi contraseña?",
+        "¿Cómo me conecto a la VPN?",
+        "No me aparece la impresora de mi planta",
+        "¿Cuál es el tamaño máximo de los adjuntos del correo?",
+    ],
+    "tickets": [
+        "Crea un ticket: Mi ordenador no arranca",
+        "Crea un ticket: La impresora de la segunda planta no imprime",
+        "¿Cuál es el estado del ticket #1?",
+    ],
+    "diagnostics": [
+        "Mi PC va muy lento, ¿puedes revisarlo?",
+        "¿Tengo espacio suficiente en el disco?",
+        "No tengo internet, ¿puedes comprobar la red?",
+    ],
+}
+
+STAGES = ["total", "rag", "agent", "llm", "tools"]
+
+
+def run_scenario(query_agent, queries: List[str], iterations: int, warmup: int) -> Dict[str, Dict]:
+    """Ejecuta `iterations` consultas (rotando entre `queries`) y resume los tiempos por etapa"""
+    for i in range(warmup):
+        query_agent(queries[i % len(queries)])
+
+    samples: Dict[str, List[float]] = {stage: [] for stage in STAGES}
+    for i in range(iterations):
+        with collect_stages() as timings:
+            start = time.perf_counter()
+            query_agent(queries[i % len(queries)])
+            samples["total"].append(time.perf_counter() - start)
+        for stage in timings.stages():
+            samples.setdefault(stage, []).append(timings.total(stage))
+
+    return {stage: summarize(values) for stage, values in samples.items() if values}
+
+
+def run_benchmark(scenarios: List[str], iterations: int, warmup: int, llm_latency: float,
+                  db_latency: float, tool_latency: float, embeddings: str) -> Dict:
+    with offline_backends(llm_latency=llm_latency, db_latency=db_latency,
+                          tool_latency=tool_latency, embeddings=embeddings):
+        from src.agent.agent import query_agent
+
+        results = {}
+        for name in scenarios:
+            print(f"▶️  Escenario '{name}' ({iterations} iteraciones)...")
+            results[name] = run_scenario(query_agent, SCENARIOS[name], iterations, warmup)
+
+    return {
+        "config": {
+            "iterations": iterations,
+            "warmup": warmup,
+            "llm_latency_s": llm_latency,
+            "db_latency_s": db_latency,
+            "tool_latency_s": tool_latency,
+            "embeddings": embeddings,
+            "python": platform.python_version(),
+        },
+        "scenarios": results,
+    }
+
+
+def print_report(report: Dict):
+    print("\n" + "="*72)
+    print("📊 LATENCIA POR ESCENARIO Y ETAPA (ms)")
+    print("="*72)
+    print(f"{'Escenario':<14}{'Etapa':<10}{'n':>6}{'p50':>12}{'p95':>12}{'p99':>12}")
+    print("-"*72)
+    for scenario, stages in report["scenarios"].items():
+        for stage in STAGES:
+            if stage not in stages:
+                continue
+            s = stages[stage]
+            print(f"{scenario:<14}{stage:<10}{s['n']:>6}{s['p50_ms']:>12.2f}{s['p95_ms']:>12.2f}{s['p99_ms']:>12.2f}")
+    print("="*72)
+
+
+def compare_with_baseline(report: Dict, baseline: Dict, tolerance: float, min_delta_ms: float) -> List[str]:
+    """Retorna la lista de regresiones (percentil actual > baseline * (1 + tolerancia))"""
+    regressions = []
+    print(f"\n🔍 Comparación con baseline (tolerancia {tolerance:.0%}, mínimo {min_delta_ms} ms)")
+    for scenario, stages in report["scenarios"].items():
+        base_stages = baseline.get("scenarios", {}).get(scenario, {})
+        for stage, current in stages.items():
+            base = base_stages.get(stage)
+            if not base:
+                continue
+            for key in ("p50_ms", "p95_ms", "p99_ms"):
+                delta = current[key] - base[key]
+                if current[key] > base[key] * (1 + tolerance) and delta > min_delta_ms:
+                    regressions.append(
+                        f"{scenario}/{stage} {key}: {base[key]:.2f} → {current[key]:.2f} ms (+{delta:.2f})"
+                    )
+    if regressions:
+        print("❌ Regresiones detectadas:")
+        for line in regressions:
+            print(f"   - {line}")
+    else:
+        print("✅ Sin regresiones respecto al baseline")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark offline de latencia de query_agent")
+    parser.add_argument("--scenario", choices=list(SCENARIOS) + ["all"], default="all")
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Latencia simulada del LLM (s)")
+    parser.add_argument("--db-latency", type=float, default=0.0, help="Latencia simulada de FreeScout (s)")
+    parser.add_argument("--tool-latency", type=float, default=0.0, help="Latencia simulada de PowerShell (s)")
+    parser.add_argument("--embeddings", choices=["fake", "real"], default="fake",
+                        help="'fake' no descarga nada; 'real' usa EMBEDDING_MODEL")
+    parser.add_argument("--output", help="Guardar el informe JSON en esta ruta")
+    parser.add_argument("--save-baseline", metavar="NOMBRE", help="Guardar como benchmarks/baselines/NOMBRE.json")
+    parser.add_argument("--compare", metavar="NOMBRE", help="Comparar con benchmarks/baselines/NOMBRE.json")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Margen permitido antes de marcar regresión")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0, help="Diferencia mínima para marcar regresión")
+    args = parser.parse_args()
+
+    scenarios = list(SCENARIOS) if args.scenario == "all" else [args.scenario]
+    report = run_benchmark(scenarios, args.iterations, args.warmup, args.llm_latency,
+                           args.db_latency, args.tool_latency, args.embeddings)
+    print_report(report)
+
+    serialized = json.dumps(report, indent=2, sort_keys=True, ensure_ascii=False) + "\n"
+    if args.output:
+        Path(args.output).write_text(serialized, encoding="utf-8")
+        print(f"💾 Informe guardado en: {args.output}")
+    if args.save_baseline:
+        BASELINES_DIR.mkdir(parents=True, exist_ok=True)
+        path = BASELINES_DIR / f"{args.save_baseline}.json"
+        path.write_text(serialized, encoding="utf-8")
+        print(f"💾 Baseline guardado en: {path}")
+    if args.compare:
+        path = BASELINES_DIR / f"{args.compare}.json"
+        baseline = json.loads(path.read_text(encoding="utf-8"))
+        if compare_with_baseline(report, baseline, args.tolerance, args.min_delta_ms):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Callback de LangChain que reparte el tiempo del agente en etapas "llm" y "tools"
+"""
+import time
+from typing import Any, Dict
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from src.perf.timing import StageTimings
+
+
+class StageTimingCallback(BaseCallbackHandler):
+    """Registra la duración de cada llamada al LLM y a cada herramienta en un StageTimings"""
+
+    def __init__(self, timings: StageTimings):
+        self.timings = timings
+        self._starts: Dict[UUID, float] = {}
+
+    def _start(self, run_id: UUID):
+        self._starts[run_id] = time.perf_counter()
+
+    def _stop(self, run_id: UUID, stage: str):
+        start = self._starts.pop(run_id, None)
+        if start is not None:
+            self.timings.add(stage, time.perf_counter() - start)
+
+    # LLM
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages, *, run_id: UUID, **kwargs):
+        self._start(run_id)
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts, *, run_id: UUID, **kwargs):
+        self._start(run_id)
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs):
+        self._stop(run_id, "llm")
+
+    def on_llm_error(self, error, *, run_id: UUID, **kwargs):
+        self._stop(run_id, "llm")
+
+    # Herramientas
+    def on_tool_start(self, serialized: Dict[str, Any], input_str: str, *, run_id: UUID, **kwargs):
+        self._start(run_id)
+
+    def on_tool_end(self, output, *, run_id: UUID, **kwargs):
+        self._stop(run_id, "tools")
+
+    def on_tool_error(self, error, *, run_id: UUID, **kwargs):
+        self._stop(run_id, "tools")
@@ -0,0 +1,523 @@
+"""
+🧪 Backends falsos para ejecutar `query_agent` sin red
+
+- ScriptedChatModel: modelo de chat con guion (llama a herramientas igual que el LLM real)
+- InMemoryFreeScoutDB: sustituto SQLite en memoria de FreeScoutDB
+- FakeSubprocess: respuestas enlatadas de PowerShell para las herramientas de sistema
+- SlowFakeEmbeddings: embeddings deterministas con coste por llamada y por texto
+- build_fixture_vectordb: pequeño índice Chroma construido a partir de fixtures/manual_it.md
+
+Todos aceptan una latencia inyectable (en segundos) para simular backends lentos.
+"""
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from unittest import mock
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+FIXTURE_MANUAL = FIXTURES_DIR / "manual_it.md"
+
+
+# ==================== LLM CON GUION ====================
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    Modelo de chat determinista que imita las decisiones del agente real:
+    - "crea un ticket ..."        → create_support_ticket
+    - "... ticket #N ..."         → get_ticket_status(N)
+    - lentitud / disco / red      → herramientas de diagnóstico
+    - cualquier otra cosa         → respuesta a partir del contexto del manual
+    Tras recibir el resultado de una herramienta devuelve la respuesta final.
+    """
+
+    latency: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted-fake"
+
+    def bind_tools(self, tools, **kwargs):
+        # Las herramientas se eligen por guion; no hace falta enlazarlas
+        return self
+
+    def _generate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs) -> ChatResult:
+        if self.latency:
+            time.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=self._next_message(messages))])
+
+    def _next_message(self, messages: List[BaseMessage]) -> AIMessage:
+        last = messages[-1]
+        if isinstance(last, ToolMessage):
+            return AIMessage(content=f"He revisado el resultado de la herramienta:\n\n{str(last.content)[:300]}")
+
+        prompt = next((m.content for m in reversed(messages) if isinstance(m, HumanMessage)), "")
+        question, context = _split_enhanced_message(prompt)
+        text = question.lower()
+
+        if "crea un ticket" in text or "crear un ticket" in text:
+            problem = question.split(":", 1)[-1].strip() or question
+            return _tool_call("create_support_ticket", {
+                "subject": problem[:100],
+                "description": problem,
+                "priority": "normal",
+            })
+
+        if "parecido" in text or "similar" in text:
+            problem = question.split(":", 1)[-1].strip() or question
+            return _tool_call("find_similar_tickets", {"problem_description": problem})
+
+        topic_match = re.search(r"tickets (?:hay |tengo )?sobre (?:la |el |los |las )?(.+?)\??$", text)
+        if topic_match:
+            return _tool_call("search_tickets", {"query": topic_match.group(1)})
+
+        ticket_match = re.search(r"ticket\s*#?\s*(\d+)", text)
+        if ticket_match:
+            return _tool_call("get_ticket_status", {"ticket_number": int(ticket_match.group(1))})
+
+        if any(word in text for word in ("lento", "rendimiento", "cpu", "ram")):
+            return _tool_call("get_system_performance", {})
+        if "disco" in text or "espacio" in text:
+            return _tool_call("check_disk_space", {})
+        if "internet" in text or " red" in text:
+            return _tool_call("check_network_connection", {})
+
+        if context:
+            return AIMessage(content=f"Según el manual IT:\n\n{context[:400]}")
+        return AIMessage(content="No tengo información sobre eso. ¿Quieres que cree un ticket?")
+
+
+def _split_enhanced_message(prompt: str):
+    """Separa la pregunta original del contexto RAG que añade query_agent"""
+    if not prompt.startswith("Usuario pregunta:"):
+        return prompt, ""
+    head, _, rest = prompt.partition("\n\nContexto del manual IT:\n")
+    question = head[len("Usuario pregunta:"):].strip()
+    context = rest.rsplit("\n\nSi la respuesta está en el contexto", 1)[0]
+    return question, context
+
+
+_tool_call_counter = 0
+_tool_call_lock = threading.Lock()
+
+
+def _tool_call(name: str, args: Dict[str, Any]) -> AIMessage:
+    global _tool_call_counter
+    with _tool_call_lock:
+        _tool_call_counter += 1
+        call_id = f"call_{_tool_call_counter}"
+    return AIMessage(content="", tool_calls=[{"name": name, "args": args, "id": call_id, "type": "tool_call"}])
+
+
+# ==================== FREESCOUT EN MEMORIA ====================
+
+class InMemoryFreeScoutDB:
+    """Sustituto de FreeScoutDB con la misma interfaz pública, respaldado por SQLite en memoria."""
+
+    STATUS_MAP = {1: "Activo", 2: "Pendiente", 3: "Cerrado", 4: "Spam"}
+
+    def __init__(self, latency: float = 0.0, seed_tickets: int = 1):
+        self.latency = latency
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(":memory:", check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE conversations (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                number INTEGER NOT NULL,
+                subject TEXT,
+                status INTEGER NOT NULL DEFAULT 1,
+                state INTEGER NOT NULL DEFAULT 2,
+                customer_email TEXT,
+                created_at TEXT,
+                updated_at TEXT,
+                threads_count INTEGER NOT NULL DEFAULT 1
+            );
+            CREATE UNIQUE INDEX conversations_number ON conversations(number);
+            CREATE INDEX conversations_updated_at_id ON conversations(updated_at, id);
+            CREATE TABLE threads (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                conversation_id INTEGER NOT NULL,
+                type INTEGER NOT NULL DEFAULT 1,
+                state INTEGER NOT NULL DEFAULT 2,
+                body TEXT,
+                first INTEGER NOT NULL DEFAULT 0,
+                message_id TEXT
+            );
+            CREATE INDEX threads_conversation ON threads(conversation_id);
+            CREATE INDEX threads_message_id ON threads(message_id);
+        """)
+        for i in range(seed_tickets):
+            self.create_ticket(f"Ticket de ejemplo {i + 1}", "Ticket creado por el fixture del benchmark")
+
+    def _sleep(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def create_ticket(self, subject: str, body: str,
+                      customer_email: str = "usuario@empresa.local",
+                      priority: int = 2, idempotency_key: Optional[str] = None) -> Dict:
+        self._sleep()
+        now = datetime.now().isoformat(sep=" ", timespec="seconds")
+        message_id = f"{idempotency_key}@it-chatbot" if idempotency_key else None
+        with self._lock:
+            cursor = self._conn.cursor()
+            if message_id:
+                cursor.execute(
+                    "SELECT c.id, c.number FROM threads t JOIN conversations c ON c.id = t.conversation_id "
+                    "WHERE t.message_id = ? LIMIT 1",
+                    (message_id,),
+                )
+                existing = cursor.fetchone()
+                if existing:
+                    return {
+                        "success": True,
+                        "ticket_id": existing[0],
+                        "number": existing[1],
+                        "subject": subject,
+                        "customer_email": customer_email,
+                        "created_at": datetime.now().isoformat(),
+                        "message": f"✅ Ticket #{existing[1]} ya estaba creado"
+                    }
+            cursor.execute("SELECT COALESCE(MAX(number), 0) + 1 FROM conversations")
+            number = cursor.fetchone()[0]
+            cursor.execute(
+                "INSERT INTO conversations (number, subject, status, customer_email, created_at, updated_at) "
+                "VALUES (?, ?, 1, ?, ?, ?)",
+                (number, subject, customer_email, now, now),
+            )
+            conversation_id = cursor.lastrowid
+            cursor.execute(
+                "INSERT INTO threads (conversation_id, body, first, message_id) VALUES (?, ?, 1, ?)",
+                (conversation_id, body, message_id),
+            )
+            self._conn.commit()
+        return {
+            "success": True,
+            "ticket_id": conversation_id,
+            "number": number,
+            "subject": subject,
+            "customer_email": customer_email,
+            "created_at": datetime.now().isoformat(),
+            "message": f"✅ Ticket #{number} creado correctamente"
+        }
+
+    def _fetch_one(self, where: str, value: int) -> Optional[Dict]:
+        self._sleep()
+        with self._lock:
+            row = self._conn.execute(f"""
+                SELECT c.id, c.number, c.subject, c.status, c.customer_email,
+                       c.created_at, c.updated_at, t.body
+                FROM conversations c
+                LEFT JOIN threads t ON t.conversation_id = c.id AND t.first = 1
+                WHERE {where} = ?
+                LIMIT 1
+            """, (value,)).fetchone()
+        if not row:
+            return None
+        return {
+            "ticket_id": row[0],
+            "number": row[1],
+            "subject": row[2],
+            "status": self.STATUS_MAP.get(row[3], "Desconocido"),
+            "customer_email": row[4],
+            # mysql.connector devuelve datetime: mismo tipo aquí
+            "created_at": datetime.fromisoformat(row[5]),
+            "updated_at": datetime.fromisoformat(row[6]),
+            "description": row[7] if row[7] else "Sin descripción"
+        }
+
+    def get_ticket(self, ticket_id: int) -> Optional[Dict]:
+        return self._fetch_one("c.id", ticket_id)
+
+    def get_ticket_by_number(self, ticket_number: int) -> Optional[Dict]:
+        return self._fetch_one("c.number", ticket_number)
+
+    def get_change_watermark(self) -> Optional[tuple]:
+        self._sleep()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT updated_at, id FROM conversations ORDER BY updated_at DESC, id DESC LIMIT 1"
+            ).fetchone()
+        return (datetime.fromisoformat(row[0]), row[1]) if row else None
+
+    def get_ticket_changes(self, since_updated_at, since_id: int, limit: int = 500) -> List[Dict]:
+        self._sleep()
+        since = since_updated_at if isinstance(since_updated_at, str) else \
+            since_updated_at.isoformat(sep=" ", timespec="seconds")
+        with self._lock:
+            rows = self._conn.execute("""
+                SELECT c.id, c.number, c.subject, c.status, c.state, c.customer_email,
+                       c.created_at, c.updated_at, t.body,
+                       (SELECT COUNT(*) FROM threads m
+                        WHERE m.conversation_id = c.id AND m.type IN (1, 2) AND m.state = 2)
+                FROM conversations c
+                LEFT JOIN threads t ON t.conversation_id = c.id AND t.first = 1
+                WHERE c.updated_at > ? OR (c.updated_at = ? AND c.id > ?)
+                ORDER BY c.updated_at, c.id
+                LIMIT ?
+            """, (since, since, since_id, limit)).fetchall()
+        return [
+            {
+                "ticket_id": row[0],
+                "number": row[1],
+                "subject": row[2],
+                "status": self.STATUS_MAP.get(row[3], "Desconocido"),
+                "state": row[4],
+                "customer_email": row[5],
+                "created_at": datetime.fromisoformat(row[6]),
+                "updated_at": datetime.fromisoformat(row[7]),
+                "description": row[8],
+                "messages_count": row[9]
+            }
+            for row in rows
+        ]
+
+    def search_tickets(self, query: str, limit: int = 10, offset: int = 0,
+                       only_open: bool = False) -> List[Dict]:
+        """Versión simplificada del FULLTEXT: cuenta las palabras de la consulta (asunto x2)"""
+        self._sleep()
+        words = {w for w in re.findall(r"\w+", query.lower()) if len(w) >= 3}
+        if not words:
+            return []
+        with self._lock:
+            rows = self._conn.execute("""
+                SELECT c.id, c.number, c.subject, c.status, c.updated_at, GROUP_CONCAT(t.body, ' ')
+                FROM conversations c
+                LEFT JOIN threads t ON t.conversation_id = c.id AND t.type IN (1, 2) AND t.state = 2
+                WHERE c.state = 2 AND c.status <> 4
+                GROUP BY c.id
+            """).fetchall()
+        results = []
+        for row in rows:
+            if only_open and row[3] == 3:
+                continue
+            subject = re.findall(r"\w+", (row[2] or "").lower())
+            body = re.findall(r"\w+", (row[5] or "").lower())
+            score = sum(2 * subject.count(w) + body.count(w) for w in words)
+            if score:
+                results.append({
+                    "ticket_id": row[0],
+                    "number": row[1],
+                    "subject": row[2],
+                    "status": self.STATUS_MAP.get(row[3], "Desconocido"),
+                    "updated_at": datetime.fromisoformat(row[4]),
+                    "score": float(score),
+                })
+        results.sort(key=lambda r: (-r["score"], -r["ticket_id"]))
+        return results[offset:offset + limit]
+
+    def update_ticket(self, ticket_number: int, status: Optional[int] = None, add_reply: bool = False,
+                      add_note: bool = False, state: Optional[int] = None):
+        """
+        Simula la acción de un técnico en FreeScout. Como FreeScout, cada acción añade un thread:
+        cambio de estado (línea de historial, type 4), respuesta (type 2) o nota interna (type 3).
+        `state` cambia conversations.state (1 borrador, 2 publicado, 3 borrado).
+        """
+        now = datetime.now().isoformat(sep=" ", timespec="seconds")
+        new_threads = []
+        if status is not None:
+            new_threads.append((4, None))
+        if add_reply:
+            new_threads.append((2, "Respuesta del equipo de IT"))
+        if add_note:
+            new_threads.append((3, "Nota interna"))
+        with self._lock:
+            row = self._conn.execute("SELECT id FROM conversations WHERE number = ?", (ticket_number,)).fetchone()
+            if not row:
+                return
+            self._conn.executemany(
+                "INSERT INTO threads (conversation_id, type, body) VALUES (?, ?, ?)",
+                [(row[0], thread_type, body) for thread_type, body in new_threads],
+            )
+            self._conn.execute("""
+                UPDATE conversations
+                SET status = COALESCE(?, status), state = COALESCE(?, state),
+                    threads_count = threads_count + ?, updated_at = ?
+                WHERE id = ?
+            """, (status, state, len(new_threads), now, row[0]))
+            self._conn.commit()
+
+
+# ==================== POWERSHELL FALSO ====================
+
+class FakeSubprocess:
+    """Sustituye al módulo `subprocess` dentro de system_tools con salidas enlatadas"""
+
+    CANNED = [
+        ("LoadPercentage", "23"),
+        ("Win32_OperatingSystem", "7.52 GB / 15.89 GB (47.33%)"),
+        ("Get-Process", "Name     CPU  RAM_MB\n----     ---  ------\nchrome  812.4  1532.1\nTeams   301.2   845.7\nCode    198.9   712.3"),
+        ("Get-PSDrive", "Name Usado_GB Libre_GB Total_GB Porcentaje_Usado\n---- -------- -------- -------- ----------------\nC      180.12   295.88    476.0            37.84"),
+        ("Get-NetAdapter", "Name     Status LinkSpeed\n----     ------ ---------\nEthernet Up     1 Gbps"),
+        ("Test-Connection", "True"),
+    ]
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+
+    def check_output(self, args, text=True, timeout=None, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        command = args[-1] if isinstance(args, (list, tuple)) else str(args)
+        for marker, output in self.CANNED:
+            if marker in command:
+                return output
+        return ""
+
+
+# ==================== ÍNDICE CHROMA DE FIXTURE ====================
+
+class SlowFakeEmbeddings(Embeddings):
+    """
+    Embeddings deterministas con coste simulado: cada llamada cuesta `call_latency`
+    más `per_text_latency` por texto, como un modelo real que amortiza el batch.
+
+    Con `serialize` (por defecto) las llamadas se atienden de una en una, como un modelo
+    en CPU que ya usa todos los núcleos: dos consultas simultáneas no cuestan lo mismo
+    que una. Sin él las llamadas concurrentes se solapan (un servicio remoto sin límite).
+    """
+
+    def __init__(self, size: int = 384, call_latency: float = 0.0, per_text_latency: float = 0.0,
+                 serialize: bool = True):
+        from langchain_core.embeddings import DeterministicFakeEmbedding
+        self.inner = DeterministicFakeEmbedding(size=size)
+        self.call_latency = call_latency
+        self.per_text_latency = per_text_latency
+        self._lock = threading.Lock() if serialize else None
+
+    def _sleep(self, n: int):
+        cost = self.call_latency + self.per_text_latency * n
+        if not cost:
+            return
+        if self._lock is None:
+            time.sleep(cost)
+            return
+        with self._lock:
+            time.sleep(cost)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self._sleep(len(texts))
+        return self.inner.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        self._sleep(1)
+        return self.inner.embed_query(text)
+
+
+def make_embeddings(kind: str = "fake", call_latency: float = 0.0, per_text_latency: float = 0.0,
+                    batching: bool = False):
+    """
+    Crea el modelo de embeddings de los benchmarks.
+
+    Args:
+        kind: "fake" (hash determinista, sin descargas) o "real" (modelo HuggingFace configurado)
+        call_latency / per_text_latency: coste simulado de los embeddings "fake"
+        batching: envolver con MicroBatchingEmbeddings (config EMBEDDING_BATCH_*)
+    """
+    if kind == "real":
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+        from src.config import EMBEDDING_MODEL
+        embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
+    else:
+        embeddings = SlowFakeEmbeddings(call_latency=call_latency, per_text_latency=per_text_latency)
+
+    if batching:
+        from src.config import EMBEDDING_BATCH_MAX_SIZE, EMBEDDING_BATCH_MAX_WAIT_MS
+        from src.rag.embedding_batcher import MicroBatchingEmbeddings
+        embeddings = MicroBatchingEmbeddings(
+            embeddings,
+            max_batch_size=EMBEDDING_BATCH_MAX_SIZE,
+            max_wait_ms=EMBEDDING_BATCH_MAX_WAIT_MS
+        )
+    return embeddings
+
+
+def build_fixture_vectordb(persist_directory: str, embedding_function,
+                           chunk_size: int = 500, chunk_overlap: int = 50):
+    """
+    Construye un índice Chroma pequeño con el manual de fixture.
+
+    Args:
+        persist_directory: Directorio (temporal) donde guardar Chroma
+        embedding_function: Modelo de embeddings (ver make_embeddings)
+    """
+    from langchain_community.vectorstores import Chroma
+    from langchain_core.documents import Document
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    text = FIXTURE_MANUAL.read_text(encoding="utf-8")
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    chunks = splitter.split_documents([Document(page_content=text, metadata={"source": str(FIXTURE_MANUAL)})])
+
+    return Chroma.from_documents(
+        documents=chunks,
+        embedding=embedding_function,
+        collection_name="benchmark_fixture",
+        persist_directory=persist_directory
+    )
+
+
+# ==================== INSTALACIÓN DE LOS FAKES ====================
+
+@dataclass
+class OfflineBackends:
+    db: InMemoryFreeScoutDB
+    vectordb: Any
+    llm: ScriptedChatModel
+    embeddings: Any
+
+
+@contextmanager
+def offline_backends(llm_latency: float = 0.0, db_latency: float = 0.0,
+                     tool_latency: float = 0.0, embeddings: str = "fake",
+                     embed_latency: float = 0.0, embed_per_text_latency: float = 0.0,
+                     embedding_batching: bool = False):
+    """
+    Sustituye LLM, FreeScout, PowerShell, embeddings y Chroma por fakes mientras dure el bloque.
+
+    Ejemplo:
+        with offline_backends(llm_latency=0.2):
+            query_agent("¿Cómo me conecto a la VPN?")
+    """
+    from langgraph.prebuilt import create_react_agent
+    from src.agent import agent
+    from src.rag import rag_retriever
+    from src.tools import freescout_integration, system_tools, ticket_watcher, ticket_spool, ticket_index
+
+    with ExitStack() as stack:
+        tmpdir = stack.enter_context(tempfile.TemporaryDirectory(prefix="bench_chroma_", ignore_cleanup_errors=True))
+        embedding_function = make_embeddings(embeddings, embed_latency, embed_per_text_latency,
+                                             batching=embedding_batching)
+        vectordb = build_fixture_vectordb(tmpdir, embedding_function)
+        fake_db = InMemoryFreeScoutDB(latency=db_latency)
+        llm = ScriptedChatModel(latency=llm_latency)
+
+        stack.enter_context(mock.patch.object(rag_retriever, "_embeddings", embedding_function))
+        stack.enter_context(mock.patch.object(rag_retriever, "_vectordb", vectordb))
+        stack.enter_context(mock.patch.object(freescout_integration, "_freescout_db", fake_db))
+        stack.enter_context(mock.patch.object(ticket_watcher, "_ticket_watcher", None))
+        stack.enter_context(mock.patch.object(ticket_spool, "_ticket_writer", None))
+        fake_ticket_index = ticket_index.TicketIndex(fake_db, embedding_function)
+        fake_ticket_index.refresh()
+        stack.enter_context(mock.patch.object(ticket_index, "_ticket_index", fake_ticket_index))
+        stack.enter_context(mock.patch.object(system_tools, "subprocess", FakeSubprocess(latency=tool_latency)))
+        stack.enter_context(mock.patch.object(agent, "_langfuse_handler", None))
+        stack.enter_context(mock.patch.object(agent, "_langfuse_initialized", True))
+        stack.enter_context(mock.patch.object(agent, "_llm", llm))
+        stack.enter_context(mock.patch.object(
+            agent, "_agent_executor", create_react_agent(model=llm, tools=agent.get_tools())
+        ))
+        stack.enter_context(mock.patch.object(agent, "_dry_run_executor", None))
+
+        yield OfflineBackends(db=fake_db, vectordb=vectordb, llm=llm, embeddings=embedding_function)
@@ -0,0 +1,233 @@
+"""
+🚦 Test de carga concurrente del chat (main.py)
+
+Simula N sesiones de usuario simultáneas que llaman al manejador de Gradio
+(`respond` → `chatbot_response` → `query_agent`) con tiempos de reflexión
+configurables y la mezcla de mensajes de `examples`. Los backends son los fakes
+de src.perf.fakes con latencia inyectable.
+
+Un semáforo con `--workers` plazas reproduce el límite de concurrencia de la cola
+de Gradio (GRADIO_CONCURRENCY_LIMIT), de modo que el informe separa:
+- espera en cola: desde que el usuario envía hasta que un worker lo atiende
+- servicio:       tiempo dentro del manejador
+- latencia:       espera + servicio (lo que percibe el usuario)
+
+Con `--target embeddings` las sesiones llaman solo a `embed_query` del modelo de
+embeddings del RAG (con las preguntas del fixture de retrieval_eval), sin pasar por
+el agente: aísla el efecto del micro-batching y no necesita Gradio.
+
+Uso:
+    python -m src.perf.loadtest --concurrency 1,2,4,8,16 --duration 20 --llm-latency 0.5
+    # Efecto del micro-batching de embeddings (comparar on/off)
+    python -m src.perf.loadtest --target embeddings --workers 32 --concurrency 1,4,16,32 --think-time 0 \
+        --embed-latency 0.02 --embed-per-text-latency 0.001 --embedding-batching on
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from src.perf.fakes import offline_backends
+from src.perf.timing import percentile
+
+
+@dataclass
+class LevelStats:
+    """Muestras recogidas para un nivel de concurrencia"""
+    sessions: int
+    queue_delays: List[float] = field(default_factory=list)
+    service_times: List[float] = field(default_factory=list)
+    latencies: List[float] = field(default_factory=list)
+    errors: int = 0
+    elapsed: float = 0.0
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def record(self, queue_delay: float, service_time: float, failed: bool):
+        with self.lock:
+            self.queue_delays.append(queue_delay)
+            self.service_times.append(service_time)
+            self.latencies.append(queue_delay + service_time)
+            if failed:
+                self.errors += 1
+
+    def summary(self) -> Dict:
+        completed = len(self.latencies)
+        ms = lambda values, q: round(percentile(values, q) * 1000, 2)
+        return {
+            "sessions": self.sessions,
+            "completed": completed,
+            "errors": self.errors,
+            "throughput_rps": round(completed / self.elapsed, 3) if self.elapsed else 0.0,
+            "queue_p50_ms": ms(self.queue_delays, 50),
+            "queue_p95_ms": ms(self.queue_delays, 95),
+            "latency_p50_ms": ms(self.latencies, 50),
+            "latency_p95_ms": ms(self.latencies, 95),
+            "latency_p99_ms": ms(self.latencies, 99),
+            "service_p50_ms": ms(self.service_times, 50),
+        }
+
+
+def _think(rng: random.Random, mean_think_time: float, distribution: str) -> float:
+    if mean_think_time <= 0:
+        return 0.0
+    if distribution == "fixed":
+        return mean_think_time
+    return rng.expovariate(1.0 / mean_think_time)
+
+
+def run_session(session_id: int, handler, messages: List[str], weights: Optional[List[float]],
+                slots: threading.Semaphore, stats: LevelStats, deadline: float,
+                think_time: float, think_distribution: str, seed: int):
+    """Bucle de una sesión simulada: pensar → enviar → esperar respuesta, hasta el deadline"""
+    rng = random.Random(seed + session_id)
+    history: List[Dict] = []
+    while True:
+        pause = _think(rng, think_time, think_distribution)
+        if time.perf_counter() + pause >= deadline:
+            return
+        time.sleep(pause)
+
+        message = rng.choices(messages, weights=weights, k=1)[0]
+        submitted = time.perf_counter()
+        with slots:
+            started = time.perf_counter()
+            _, history = handler(message, history)
+            finished = time.perf_counter()
+
+        reply = history[-1]["content"] if history else ""
+        stats.record(started - submitted, finished - started, failed=str(reply).startswith("❌"))
+        # Evitar que el historial crezca sin límite en pruebas largas
+        history = history[-20:]
+
+
+def run_level(handler, sessions: int, workers: int, duration: float, messages: List[str],
+              weights: Optional[List[float]], think_time: float, think_distribution: str,
+              seed: int) -> LevelStats:
+    stats = LevelStats(sessions=sessions)
+    slots = threading.Semaphore(workers)
+    start = time.perf_counter()
+    deadline = start + duration
+    threads = [
+        threading.Thread(
+            target=run_session,
+            args=(i, handler, messages, weights, slots, stats, deadline, think_time, think_distribution, seed),
+            daemon=True,
+        )
+        for i in range(sessions)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats.elapsed = time.perf_counter() - start
+    return stats
+
+
+def _embedding_handler(embeddings):
+    """Manejador con la firma de `respond` que solo embebe la consulta"""
+    def handler(message: str, history: List[Dict]):
+        try:
+            embeddings.embed_query(message)
+            reply = "ok"
+        except Exception as e:
+            reply = f"❌ {e}"
+        return None, history + [{"role": "assistant", "content": reply}]
+    return handler
+
+
+def _fixture_questions() -> List[str]:
+    from src.perf.retrieval_eval import FIXTURE_QUESTIONS
+    with open(FIXTURE_QUESTIONS, encoding="utf-8") as f:
+        return [json.loads(line)["question"] for line in f if line.strip()]
+
+
+def print_report(rows: List[Dict], workers: int):
+    print("\n" + "="*96)
+    print(f"🚦 CARGA CONCURRENTE (workers={workers})")
+    print("="*96)
+    print(f"{'sesiones':>9}{'ok':>7}{'err':>5}{'req/s':>9}{'cola p50':>11}{'cola p95':>11}"
+          f"{'lat p50':>11}{'lat p95':>11}{'lat p99':>11}{'serv p50':>11}")
+    print("-"*96)
+    for r in rows:
+        print(f"{r['sessions']:>9}{r['completed']:>7}{r['errors']:>5}{r['throughput_rps']:>9.2f}"
+              f"{r['queue_p50_ms']:>11.1f}{r['queue_p95_ms']:>11.1f}{r['latency_p50_ms']:>11.1f}"
+              f"{r['latency_p95_ms']:>11.1f}{r['latency_p99_ms']:>11.1f}{r['service_p50_ms']:>11.1f}")
+    print("="*96)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Test de carga concurrente del chat de main.py")
+    parser.add_argument("--target", choices=["chat", "embeddings"], default="chat",
+                        help="Manejador de Gradio completo o solo embed_query del RAG")
+    parser.add_argument("--concurrency", default="1,2,4,8,16", help="Niveles de sesiones simultáneas")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Plazas de ejecución simultánea (por defecto GRADIO_CONCURRENCY_LIMIT)")
+    parser.add_argument("--duration", type=float, default=20.0, help="Segundos por nivel")
+    parser.add_argument("--think-time", type=float, default=2.0, help="Tiempo medio de reflexión (s)")
+    parser.add_argument("--think-distribution", choices=["exponential", "fixed"], default="exponential")
+    parser.add_argument("--mix-weights", default=None,
+                        help="Pesos separados por comas para cada mensaje de `examples` de main.py")
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--db-latency", type=float, default=0.02)
+    parser.add_argument("--tool-latency", type=float, default=0.3)
+    parser.add_argument("--embeddings", choices=["fake", "real"], default="fake")
+    parser.add_argument("--embed-latency", type=float, default=0.0,
+                        help="Coste fijo simulado por llamada al modelo de embeddings (s)")
+    parser.add_argument("--embed-per-text-latency", type=float, default=0.0,
+                        help="Coste simulado por texto embebido (s)")
+    parser.add_argument("--embedding-batching", choices=["on", "off"], default="off",
+                        help="Agrupar las consultas concurrentes (MicroBatchingEmbeddings)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Guardar resultados en JSON")
+    args = parser.parse_args()
+
+    levels = [int(x) for x in args.concurrency.split(",") if x.strip()]
+
+    with offline_backends(llm_latency=args.llm_latency, db_latency=args.db_latency,
+                          tool_latency=args.tool_latency, embeddings=args.embeddings,
+                          embed_latency=args.embed_latency,
+                          embed_per_text_latency=args.embed_per_text_latency,
+                          embedding_batching=args.embedding_batching == "on") as backends:
+        from src.config import GRADIO_CONCURRENCY_LIMIT
+
+        if args.target == "embeddings":
+            handler = _embedding_handler(backends.embeddings)
+            messages = _fixture_questions()
+        else:
+            # main.py construye la interfaz al importarse, pero no lanza el servidor
+            import main as chat_app
+            handler = chat_app.respond
+            messages = [example[0] for example in chat_app.examples]
+
+        workers = args.workers or GRADIO_CONCURRENCY_LIMIT
+        weights = [float(w) for w in args.mix_weights.split(",")] if args.mix_weights else None
+        if weights and len(weights) != len(messages):
+            parser.error(f"--mix-weights necesita {len(messages)} valores")
+
+        rows = []
+        for sessions in levels:
+            print(f"▶️  {sessions} sesiones durante {args.duration:.0f}s...")
+            stats = run_level(handler, sessions, workers, args.duration, messages, weights,
+                              args.think_time, args.think_distribution, args.seed)
+            rows.append(stats.summary())
+
+        batcher = backends.embeddings
+        if hasattr(batcher, "mean_batch_size"):
+            print(f"🧮 Embeddings: {batcher.requests} consultas en {batcher.batches} batches "
+                  f"(media {batcher.mean_batch_size:.2f} por batch)")
+
+    print_report(rows, workers)
+    if args.output:
+        Path(args.output).write_text(
+            json.dumps({"workers": workers, "levels": rows}, indent=2, ensure_ascii=False) + "\n",
+            encoding="utf-8",
+        )
+        print(f"💾 Resultados guardados en: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+"""
+🎯 Evaluación de calidad frente a coste del RAG (barrido de parámetros)
+
+CHUNK_SIZE, CHUNK_OVERLAP y RAG_TOP_K se eligieron a ojo. Este script reconstruye
+el índice con cada combinación de troceado (mismo pipeline que build_index:
+páginas → chunks → filtro de duplicados → índice plano) y, con un conjunto de
+preguntas etiquetadas, mide para cada combinación y cada k:
+
+- recall@k:  fracción de pasajes relevantes cubiertos por los k fragmentos recuperados
+- MRR:       1 / posición del primer fragmento relevante (0 si no aparece en los k)
+- contexto: caracteres medios de los k fragmentos recuperados, lo que acaba en el prompt
+  del LLM (coste y latencia de la respuesta); crece con k y con el tamaño del chunk
+- tamaño del índice en disco, tiempo de construcción y latencia de búsqueda (p50/p95)
+
+Al final marca con ★ las configuraciones Pareto-óptimas en calidad (recall, MRR),
+contexto y tamaño del índice: ninguna otra es a la vez mejor o igual en calidad y más
+barata. Sin el contexto el k más grande ganaría siempre. Los tiempos se muestran al
+lado pero no cuentan para el frente: varían de una ejecución a otra y harían que el
+frente cambiase sin cambiar nada.
+
+Los documentos Markdown se leen como texto plano (el loader de build_index necesita
+`unstructured`); así el fixture por defecto funciona sin dependencias extra.
+
+Las etiquetas son pasajes de texto del documento, no ids de chunk: un fragmento es
+relevante si se solapa con al menos la mitad del pasaje (o el pasaje cubre al menos
+la mitad del fragmento), así que sirven para cualquier troceado.
+
+Formato de las preguntas (JSONL):
+    {"question": "¿Cómo me conecto a la VPN?", "passages": ["La VPN corporativa usa el cliente GlobalProtect."]}
+
+Uso:
+    python -m src.perf.retrieval_eval
+    python -m src.perf.retrieval_eval --source docs/manual.pdf --questions preguntas.jsonl \\
+        --chunk-sizes 300,500,800 --overlaps 0,50,100 --k 1,2,3,5 --output eval.json
+"""
+import argparse
+import json
+import re
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from src.config import RAG_SEARCH_TYPE, RAG_MMR_FETCH_K, RAG_MMR_LAMBDA, RAG_DEDUP_THRESHOLD
+from src.perf.fakes import FIXTURE_MANUAL, make_embeddings
+from src.perf.timing import summarize
+from src.rag.build_index import iter_pages, assign_chunk_ids
+from src.rag.dedup import NearDuplicateFilter
+from src.rag.flat_index import FlatVectorStore, export_flat_index
+from src.rag.ingest import iter_chunks
+
+FIXTURE_QUESTIONS = Path(__file__).resolve().parent / "fixtures" / "retrieval_questions.jsonl"
+
+# (métrica, True si mayor es mejor) para el frente de Pareto. Solo métricas deterministas:
+# build_seconds y latency_*_ms se informan pero tienen ruido de medida
+OBJECTIVES = [
+    ("recall", True),
+    ("mrr", True),
+    ("context_chars", False),
+    ("index_bytes", False),
+]
+
+# Span = (fuente, página, inicio, fin) en caracteres del texto de la página
+Span = Tuple[str, Optional[int], int, int]
+
+
+# ==================== ETIQUETAS ====================
+
+def load_questions(path: str) -> List[Dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _passage_regex(passage: str) -> re.Pattern:
+    # Tolerante a saltos de línea y espacios distintos entre el pasaje y el documento
+    return re.compile(r"\s+".join(re.escape(word) for word in passage.split()))
+
+
+def locate_passages(pages, questions: List[Dict]) -> List[List[Span]]:
+    """Posición de los pasajes de cada pregunta en las páginas (los no encontrados se avisan y se omiten)"""
+    located = []
+    for question in questions:
+        spans = []
+        for passage in question["passages"]:
+            pattern = _passage_regex(passage)
+            for page in pages:
+                match = pattern.search(page.page_content)
+                if match:
+                    spans.append((page.metadata.get("source"), page.metadata.get("page"), match.start(), match.end()))
+                    break
+            else:
+                print(f"⚠️ Pasaje no encontrado en el documento: {passage[:60]!r}")
+        located.append(spans)
+    return located
+
+
+def chunk_span(doc) -> Span:
+    start = doc.metadata.get("start_index", 0)
+    return (doc.metadata.get("source"), doc.metadata.get("page"), start, start + len(doc.page_content))
+
+
+def covers(chunk: Span, passage: Span) -> bool:
+    """El fragmento cuenta como relevante si solapa con la mitad del pasaje o del propio fragmento"""
+    if chunk[:2] != passage[:2]:
+        return False
+    overlap = min(chunk[3], passage[3]) - max(chunk[2], passage[2])
+    return overlap > 0 and overlap >= 0.5 * min(chunk[3] - chunk[2], passage[3] - passage[2])
+
+
+def score_ranking(retrieved: List[Span], passages: List[Span]) -> Tuple[float, float]:
+    """(recall, reciprocal rank) de una lista de fragmentos recuperados frente a los pasajes relevantes"""
+    found = {i for i, passage in enumerate(passages) if any(covers(chunk, passage) for chunk in retrieved)}
+    reciprocal_rank = next(
+        (1.0 / rank for rank, chunk in enumerate(retrieved, 1) if any(covers(chunk, p) for p in passages)),
+        0.0,
+    )
+    return len(found) / len(passages), reciprocal_rank
+
+
+# ==================== BARRIDO ====================
+
+def load_pages(source: str):
+    """Páginas del documento como en build_index, salvo el Markdown, que se lee como texto plano"""
+    if source.lower().endswith(".md"):
+        from langchain_community.document_loaders import TextLoader
+        return TextLoader(source, encoding="utf-8").load()
+    return list(iter_pages(source))
+
+
+class CachedQueryEmbeddings:
+    """Las preguntas se repiten en cada configuración: su embedding se calcula una sola vez,
+    así la latencia medida es la de la búsqueda en el índice"""
+
+    def __init__(self, embeddings):
+        self.embeddings = embeddings
+        self._queries: Dict[str, List[float]] = {}
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        if text not in self._queries:
+            self._queries[text] = self.embeddings.embed_query(text)
+        return self._queries[text]
+
+
+def build_config_index(pages, directory: str, embeddings, chunk_size: int, chunk_overlap: int,
+                       dedup_threshold: float) -> Dict:
+    """Construye el índice plano de una configuración y retorna su coste"""
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap,
+                                              add_start_index=True)
+    chunks = iter_chunks(iter(pages), splitter)
+    if dedup_threshold > 0:
+        chunks = NearDuplicateFilter(threshold=dedup_threshold).filter(chunks)
+
+    start = time.perf_counter()
+    export_flat_index(directory, assign_chunk_ids(chunks), embeddings)
+    build_seconds = time.perf_counter() - start
+    index_bytes = sum(f.stat().st_size for f in Path(directory).rglob("*") if f.is_file())
+    return {"build_seconds": round(build_seconds, 3), "index_bytes": index_bytes}
+
+
+def retrieve(store: FlatVectorStore, query: str, k: int, search_type: str):
+    """Igual que rag_retriever.get_relevant_docs, pero sobre un índice concreto"""
+    if search_type == "mmr":
+        return store.max_marginal_relevance_search(query, k=k, fetch_k=max(RAG_MMR_FETCH_K, k),
+                                                   lambda_mult=RAG_MMR_LAMBDA)
+    return store.similarity_search(query, k=k)
+
+
+def evaluate(source: str, questions_path: str, chunk_sizes: List[int], overlaps: List[int],
+             ks: List[int], embeddings: str = "real", search_type: str = RAG_SEARCH_TYPE,
+             dedup_threshold: float = RAG_DEDUP_THRESHOLD, repeats: int = 3) -> List[Dict]:
+    """Una fila de métricas por (chunk_size, chunk_overlap, k)"""
+    pages = load_pages(source)
+    questions = load_questions(questions_path)
+    labelled = [(q["question"], spans) for q, spans in zip(questions, locate_passages(pages, questions)) if spans]
+    if not labelled:
+        raise ValueError("Ningún pasaje etiquetado aparece en el documento")
+    print(f"📋 {len(labelled)} preguntas con pasajes localizados en {source}")
+
+    embedding_function = CachedQueryEmbeddings(make_embeddings(embeddings))
+    rows = []
+    workdir = tempfile.mkdtemp(prefix="retrieval_eval_")
+    try:
+        for chunk_size in chunk_sizes:
+            for chunk_overlap in overlaps:
+                if chunk_overlap >= chunk_size:
+                    continue
+                directory = str(Path(workdir) / f"{chunk_size}_{chunk_overlap}")
+                print(f"🔧 chunk_size={chunk_size} overlap={chunk_overlap}...")
+                cost = build_config_index(pages, directory, embedding_function, chunk_size, chunk_overlap,
+                                          dedup_threshold)
+                store = FlatVectorStore.load(directory, embedding_function)
+                for k in ks:
+                    recalls, reciprocal_ranks, context_chars, latencies = [], [], [], []
+                    for question, passages in labelled:
+                        for _ in range(repeats):
+                            start = time.perf_counter()
+                            docs = retrieve(store, question, k, search_type)
+                            latencies.append(time.perf_counter() - start)
+                        recall, reciprocal_rank = score_ranking([chunk_span(d) for d in docs], passages)
+                        recalls.append(recall)
+                        reciprocal_ranks.append(reciprocal_rank)
+                        context_chars.append(sum(len(d.page_content) for d in docs))
+                    latency = summarize(latencies)
+                    rows.append({
+                        "chunk_size": chunk_size,
+                        "chunk_overlap": chunk_overlap,
+                        "k": k,
+                        "chunks": len(store.index),
+                        "recall": round(sum(recalls) / len(recalls), 4),
+                        "mrr": round(sum(reciprocal_ranks) / len(reciprocal_ranks), 4),
+                        "context_chars": round(sum(context_chars) / len(context_chars)),
+                        **cost,
+                        "latency_p50_ms": latency["p50_ms"],
+                        "latency_p95_ms": latency["p95_ms"],
+                    })
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    for row in pareto_front(rows):
+        row["pareto"] = True
+    return rows
+
+
+def _dominates(a: Dict, b: Dict) -> bool:
+    at_least_as_good = all((a[m] >= b[m]) if higher else (a[m] <= b[m]) for m, higher in OBJECTIVES)
+    strictly_better = any((a[m] > b[m]) if higher else (a[m] < b[m]) for m, higher in OBJECTIVES)
+    return at_least_as_good and strictly_better
+
+
+def pareto_front(rows: List[Dict]) -> List[Dict]:
+    """Filas que ninguna otra domina (mejor o igual en todo y estrictamente mejor en algo)"""
+    return [row for row in rows if not any(_dominates(other, row) for other in rows if other is not row)]
+
+
+# ==================== INFORME ====================
+
+def print_report(rows: List[Dict]):
+    print("\n" + "=" * 106)
+    print(f"{'chunk':>6} {'overlap':>8} {'k':>3} {'chunks':>7} {'recall@k':>9} {'MRR':>6} "
+          f"{'contexto':>9} {'índice':>10} {'build s':>8} {'p50 ms':>8} {'p95 ms':>8}")
+    print("-" * 106)
+    for row in sorted(rows, key=lambda r: (r["chunk_size"], r["chunk_overlap"], r["k"])):
+        print(f"{row['chunk_size']:>6} {row['chunk_overlap']:>8} {row['k']:>3} {row['chunks']:>7} "
+              f"{row['recall']:>9.3f} {row['mrr']:>6.3f} {row['context_chars']:>9} "
+              f"{row['index_bytes'] / 1024:>8.1f}KB "
+              f"{row['build_seconds']:>8.2f} {row['latency_p50_ms']:>8.2f} {row['latency_p95_ms']:>8.2f}"
+              f"{'  ★' if row.get('pareto') else ''}")
+    print("=" * 106)
+    front = [r for r in rows if r.get("pareto")]
+    # A igual calidad, la que mete menos texto en el prompt (el k más pequeño que basta)
+    best = max(front, key=lambda r: (r["recall"], r["mrr"], -r["context_chars"], -r["index_bytes"], -r["k"]))
+    print(f"★ = Pareto-óptima ({len(front)} de {len(rows)}). Mejor calidad del frente: "
+          f"CHUNK_SIZE={best['chunk_size']} CHUNK_OVERLAP={best['chunk_overlap']} RAG_TOP_K={best['k']}")
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Barrido de troceado y k del RAG: calidad frente a coste")
+    parser.add_argument("--source", default=str(FIXTURE_MANUAL), help="Documento a indexar (PDF, TXT o MD)")
+    parser.add_argument("--questions", default=str(FIXTURE_QUESTIONS), help="JSONL de preguntas etiquetadas")
+    parser.add_argument("--chunk-sizes", type=_int_list, default=[300, 500, 800])
+    parser.add_argument("--overlaps", type=_int_list, default=[0, 50, 100])
+    parser.add_argument("--k", type=_int_list, default=[1, 2, 3, 5])
+    parser.add_argument("--embeddings", choices=["fake", "real"], default="real",
+                        help="'real' usa EMBEDDING_MODEL; 'fake' solo sirve para probar el script")
+    parser.add_argument("--search-type", choices=["similarity", "mmr"], default=RAG_SEARCH_TYPE)
+    parser.add_argument("--dedup-threshold", type=float, default=RAG_DEDUP_THRESHOLD)
+    parser.add_argument("--repeats", type=int, default=3, help="Búsquedas por pregunta para medir la latencia")
+    parser.add_argument("--output", help="Guardar las filas en JSON en esta ruta")
+    args = parser.parse_args()
+
+    rows = evaluate(args.source, args.questions, args.chunk_sizes, args.overlaps, args.k,
+                    embeddings=args.embeddings, search_type=args.search_type,
+                    dedup_threshold=args.dedup_threshold, repeats=args.repeats)
+    print_report(rows)
+    if args.output:
+        Path(args.output).write_text(json.dumps(rows, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+        print(f"💾 Resultados guardados en: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+⏱️ Medición de tiempos por etapa
+
+Permite registrar cuánto tarda cada etapa de una consulta (RAG, LLM, herramientas...)
+sin coste apreciable cuando no hay ninguna medición activa. Solo usa la librería
+estándar para que pueda importarse desde cualquier módulo sin efectos secundarios.
+"""
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+
+class StageTimings:
+    """Acumula duraciones (en segundos) agrupadas por nombre de etapa."""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float):
+        """Registra una duración para la etapa indicada"""
+        with self._lock:
+            self.samples[stage].append(seconds)
+
+    def total(self, stage: str) -> float:
+        """Tiempo total acumulado en una etapa (una consulta puede llamar varias veces al LLM)"""
+        with self._lock:
+            return sum(self.samples.get(stage, []))
+
+    def stages(self) -> List[str]:
+        with self._lock:
+            return list(self.samples.keys())
+
+    def as_dict(self) -> Dict[str, float]:
+        """Totales por etapa en segundos"""
+        with self._lock:
+            return {stage: sum(values) for stage, values in self.samples.items()}
+
+
+_active_timings: ContextVar[Optional[StageTimings]] = ContextVar("active_stage_timings", default=None)
+
+
+def current_timings() -> Optional[StageTimings]:
+    """Retorna el colector activo en este contexto (o None si no se está midiendo)"""
+    return _active_timings.get()
+
+
+@contextmanager
+def collect_stages(timings: Optional[StageTimings] = None):
+    """
+    Activa la recogida de tiempos por etapa dentro del bloque.
+
+    Ejemplo:
+        with collect_stages() as timings:
+            query_agent("¿Cómo reseteo mi contraseña?")
+        print(timings.as_dict())
+    """
+    timings = timings if timings is not None else StageTimings()
+    token = _active_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _active_timings.reset(token)
+
+
+@contextmanager
+def timed_stage(name: str):
+    """Mide el bloque como la etapa `name` si hay un colector activo"""
+    timings = _active_timings.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - start)
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Percentil `q` (0-100) con interpolación lineal entre rangos"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    if len(ordered) == 1:
+        return ordered[0]
+    position = (len(ordered) - 1) * (q / 100.0)
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    fraction = position - lower
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * fraction
+
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    """Resumen p50/p95/p99/media en milisegundos de una lista de duraciones en segundos"""
+    return {
+        "n": len(values),
+        "p50_ms": round(percentile(values, 50) * 1000, 2),
+        "p95_ms": round(percentile(values, 95) * 1000, 2),
+        "p99_ms": round(percentile(values, 99) * 1000, 2),
+        "mean_ms": round((sum(values) / len(values)) * 1000, 2) if values else 0.0,
+    }
@@ -1,10 +1,21 @@
 import argparse
+import hashlib
+import os
+import sys
 from langchain_community.document_loaders import PyPDFLoader, TextLoader, UnstructuredMarkdownLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_community.vectorstores import Chroma
 from dotenv import load_dotenv
 
+# Permitir `python src/rag/build_index.py` además de `python -m src.rag.build_index`
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from src.rag.flat_index import export_flat_index
+from src.rag.dedup import NearDuplicateFilter
+from src.rag.ingest import iter_pdf_pages, iter_chunks, batched, DEFAULT_PAGE_WINDOW, DEFAULT_CHUNK_WINDOW
+from src.rag.index_versions import new_version, write_version_manifest, publish_version, gc_versions, read_current
+from src.config import EMBEDDING_MODEL
+
 load_dotenv()
 
 def load_document(path):
@@ -19,38 +30,148 @@ def load_document(path):
     else:
         raise ValueError("Formato no soportado. Usa PDF, TXT o MD.")
 
+def iter_pages(path, page_window=DEFAULT_PAGE_WINDOW):
+    """Páginas del documento sin cargarlo entero (TXT y MD se leen como una sola página)"""
+    if path.lower().endswith(".pdf"):
+        return iter_pdf_pages(path, page_window)
+    return iter(load_document(path))
+
+def assign_chunk_ids(chunks):
+    """Asigna a cada chunk un id estable derivado de su fuente, página y contenido (en streaming)"""
+    seen = {}
+    for chunk in chunks:
+        key = f"{chunk.metadata.get('source')}|{chunk.metadata.get('page')}|{chunk.page_content}"
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+        # Texto idéntico en la misma página: añadir un sufijo para que el id siga siendo único
+        n = seen.get(digest, 0)
+        seen[digest] = n + 1
+        chunk.metadata["chunk_id"] = digest if n == 0 else f"{digest}-{n}"
+        yield chunk
+
+def export_chroma_to_flat(chroma_dir, collection_name, flat_dir, dtype):
+    """Exporta una colección Chroma existente al índice plano sin volver a calcular embeddings"""
+    from langchain_core.documents import Document
+    from src.rag.flat_index import FlatIndexWriter
+
+    db = Chroma(persist_directory=chroma_dir, collection_name=collection_name)
+    data = db.get(include=["embeddings", "documents", "metadatas"])
+    docs = [
+        Document(page_content=text, metadata=metadata or {}, id=doc_id)
+        for doc_id, text, metadata in zip(data["ids"], data["documents"], data["metadatas"])
+    ]
+    with FlatIndexWriter(flat_dir, dtype=dtype, embedding_model=EMBEDDING_MODEL) as writer:
+        writer.add(data["embeddings"], docs)
+    return len(docs)
+
 def main():
     parser = argparse.ArgumentParser()
-    parser.add_argument("--source", required=True, help="Ruta del documento IT")
+    parser.add_argument("--source", help="Ruta del documento IT")
+    parser.add_argument("--backend", choices=["chroma", "flat"], default=os.getenv("RAG_BACKEND", "chroma"),
+                        help="Tipo de índice a generar")
     parser.add_argument("--chroma-dir", default="CHROMA_DB", help="Directorio donde guardar Chroma")
     parser.add_argument("--collection-name", default="manual_it", help="Nombre de la colección")
+    parser.add_argument("--flat-dir", default=os.getenv("FLAT_INDEX_DIR", "./data/FLAT_INDEX"),
+                        help="Directorio del índice plano")
+    parser.add_argument("--dtype", choices=["float32", "float16"], default="float32",
+                        help="Precisión de los vectores del índice plano (float16 ocupa la mitad)")
+    parser.add_argument("--from-chroma", action="store_true",
+                        help="Exportar la colección Chroma existente al índice plano (sin --source)")
+    parser.add_argument("--index-root", default=None,
+                        help="Publicar como nueva versión en este directorio (cambio en caliente, ej: ./data/INDEX)")
+    parser.add_argument("--keep-versions", type=int, default=int(os.getenv("INDEX_KEEP_VERSIONS", "3")),
+                        help="Versiones a conservar en --index-root (las más antiguas se borran)")
     parser.add_argument("--chunk-size", type=int, default=500)
     parser.add_argument("--chunk-overlap", type=int, default=50)
+    parser.add_argument("--window", type=int, default=int(os.getenv("INGEST_WINDOW", str(DEFAULT_CHUNK_WINDOW))),
+                        help="Chunks que se embeben y escriben juntos (acota la memoria de la ingesta)")
+    parser.add_argument("--page-window", type=int,
+                        default=int(os.getenv("INGEST_PAGE_WINDOW", str(DEFAULT_PAGE_WINDOW))),
+                        help="Páginas de PDF cuyos objetos se mantienen en caché mientras se leen")
+    parser.add_argument("--dedup-threshold", type=float, default=float(os.getenv("RAG_DEDUP_THRESHOLD", "0.9")),
+                        help="Similitud (0-1) a partir de la cual se descartan chunks casi duplicados (0 = no filtrar)")
     args = parser.parse_args()
 
-    print("📄 Cargando documento...")
-    docs = load_document(args.source)
+    if not args.source and not args.from_chroma:
+        parser.error("--source es obligatorio (salvo con --from-chroma)")
+
+    # Con --index-root se construye en un directorio de versión nuevo, sin tocar el que se está sirviendo
+    version_id = None
+    if args.index_root:
+        version_id, version_path = new_version(args.index_root)
+        if args.from_chroma:
+            args.backend = "flat"
+            args.flat_dir = str(version_path)
+        elif args.backend == "flat":
+            args.flat_dir = str(version_path)
+        else:
+            args.chroma_dir = str(version_path)
+        print(f"🆕 Nueva versión del índice: {version_id}")
+
+    build(args)
+
+    if version_id:
+        write_version_manifest(
+            version_path,
+            backend=args.backend,
+            collection_name=args.collection_name,
+            source=args.source,
+            chunk_size=args.chunk_size,
+            chunk_overlap=args.chunk_overlap,
+            dedup_threshold=args.dedup_threshold
+        )
+        previous = read_current(args.index_root)
+        publish_version(args.index_root, version_id)
+        print(f"🔄 Versión {version_id} publicada como activa (los servidores la cargarán en caliente)")
+        # La que era activa se conserva: los servidores la usan hasta su siguiente sondeo
+        removed = gc_versions(args.index_root, keep=args.keep_versions, protect=[previous])
+        if removed:
+            print(f"🧹 Versiones antiguas eliminadas: {', '.join(removed)}")
+
+def build(args):
+    if args.from_chroma:
+        print("📤 Exportando colección Chroma a índice plano...")
+        count = export_chroma_to_flat(args.chroma_dir, args.collection_name, args.flat_dir, args.dtype)
+        print(f"✅ {count} chunks exportados a:", args.flat_dir)
+        return
 
-    print("✂️ Dividiendo en chunks...")
     splitter = RecursiveCharacterTextSplitter(
         chunk_size=args.chunk_size,
-        chunk_overlap=args.chunk_overlap
+        chunk_overlap=args.chunk_overlap,
+        add_start_index=True
     )
-    chunks = splitter.split_documents(docs)
+
+    # Páginas → chunks → filtro de duplicados → ids: todo perezoso, nada se materializa hasta la ventana
+    print(f"📄 Leyendo {args.source} por páginas (ventana de {args.window} chunks)...")
+    chunks = iter_chunks(iter_pages(args.source, args.page_window), splitter)
+    dedup = None
+    if args.dedup_threshold > 0:
+        dedup = NearDuplicateFilter(threshold=args.dedup_threshold)
+        chunks = dedup.filter(chunks)
+    chunks = assign_chunk_ids(chunks)
 
     print("🧠 Cargando embeddings locales (HuggingFace)...")
-    embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-
-    print("📦 Creando base vectorial Chroma...")
-    db = Chroma.from_documents(
-        documents=chunks,
-        embedding=embeddings,
-        collection_name=args.collection_name,
-        persist_directory=args.chroma_dir
-    )
+    embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
+
+    if args.backend == "flat":
+        print(f"📐 Creando índice plano ({args.dtype})...")
+        export_flat_index(args.flat_dir, chunks, embeddings, dtype=args.dtype,
+                          batch_size=args.window, embedding_model=EMBEDDING_MODEL)
+        destination = args.flat_dir
+    else:
+        print("📦 Creando base vectorial Chroma...")
+        db = Chroma(
+            collection_name=args.collection_name,
+            embedding_function=embeddings,
+            persist_directory=args.chroma_dir
+        )
+        for batch in batched(chunks, args.window):
+            db.add_documents(batch, ids=[chunk.metadata["chunk_id"] for chunk in batch])
+        db.persist()
+        destination = args.chroma_dir
 
-    db.persist()
-    print("✅ Índice creado correctamente en:", args.chroma_dir)
+    if dedup:
+        print(f"🧹 {dedup.removed} chunks casi duplicados descartados, {dedup.kept} indexados")
+    print("✅ Índice creado correctamente en:", destination)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,119 @@
+"""
+🧹 Eliminación de chunks casi duplicados al indexar
+
+Los manuales IT repiten mucho texto (cabeceras, avisos legales, los mismos pasos
+de VPN en varias guías) y el splitter genera chunks casi idénticos que luego
+ocupan las pocas plazas de contexto del agente.
+
+Cada chunk se resume con una firma MinHash sobre sus n-gramas de palabras; un
+índice LSH por bandas propone candidatos y solo se compara la firma completa con
+ellos, así que el coste es lineal en el número de chunks. Se conserva la primera
+aparición de cada grupo de duplicados.
+"""
+import re
+import zlib
+from typing import Iterable, Iterator, List, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _lsh_params(num_perm: int, threshold: float) -> Tuple[int, int]:
+    """Elige (bandas, filas) cuyo umbral aproximado (1/b)^(1/r) es el más cercano a `threshold`"""
+    best = None
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        error = abs((1.0 / bands) ** (1.0 / rows) - threshold)
+        if best is None or error < best[0]:
+            best = (error, bands, rows)
+    return best[1], best[2]
+
+
+class MinHasher:
+    """
+    Firmas MinHash de textos (hashing multiplicativo de 64 bits sobre crc32 de cada n-grama).
+
+    Args:
+        num_perm: Número de funciones hash (longitud de la firma)
+        shingle_size: Palabras por n-grama
+        seed: Semilla de las funciones hash (misma semilla → firmas comparables)
+    """
+
+    def __init__(self, num_perm: int = 64, shingle_size: int = 5, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        # Multiplicadores impares: h(x) = (a·x + b) mod 2^64, quedándonos con los 32 bits altos
+        self._a = rng.integers(1, 2**63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, 2**63, size=num_perm, dtype=np.uint64)
+
+    def shingles(self, text: str) -> List[str]:
+        words = _WORD_RE.findall(text.lower())
+        if len(words) <= self.shingle_size:
+            return [" ".join(words)]
+        return [" ".join(words[i:i + self.shingle_size]) for i in range(len(words) - self.shingle_size + 1)]
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = np.fromiter(
+            (zlib.crc32(s.encode("utf-8")) for s in set(self.shingles(text))), dtype=np.uint64
+        )
+        # (shingles × num_perm); el desbordamiento de uint64 es el módulo 2^64 buscado
+        with np.errstate(over="ignore"):
+            permuted = (hashes[:, None] * self._a + self._b) >> np.uint64(32)
+        return permuted.min(axis=0)
+
+
+class NearDuplicateFilter:
+    """
+    Filtro incremental: recuerda las firmas de los chunks aceptados y descarta los que
+    tengan una similitud de Jaccard estimada >= `threshold` con alguno de ellos.
+    Procesa los chunks de uno en uno, de modo que sirve también para ingestas en streaming.
+    """
+
+    def __init__(self, threshold: float = 0.9, num_perm: int = 64, shingle_size: int = 5, seed: int = 1):
+        if not 0 < threshold <= 1:
+            raise ValueError("threshold debe estar en (0, 1]")
+        self.threshold = threshold
+        self.hasher = MinHasher(num_perm, shingle_size, seed)
+        # Umbral LSH algo por debajo del de verificación: se prefiere algún candidato de más a perder duplicados
+        self.bands, self.rows = _lsh_params(num_perm, max(threshold - 0.15, 0.3))
+        self._buckets = [dict() for _ in range(self.bands)]
+        self._signatures: List[np.ndarray] = []
+        self.kept = 0
+        self.removed = 0
+
+    def is_duplicate(self, text: str) -> bool:
+        """Retorna True si `text` es casi duplicado de un chunk ya aceptado; si no, lo registra"""
+        signature = self.hasher.signature(text)
+        keys = [signature[b * self.rows:(b + 1) * self.rows].tobytes() for b in range(self.bands)]
+
+        candidates = set()
+        for bucket, key in zip(self._buckets, keys):
+            candidates.update(bucket.get(key, ()))
+        for idx in candidates:
+            if np.mean(self._signatures[idx] == signature) >= self.threshold:
+                self.removed += 1
+                return True
+
+        idx = len(self._signatures)
+        self._signatures.append(signature)
+        for bucket, key in zip(self._buckets, keys):
+            bucket.setdefault(key, []).append(idx)
+        self.kept += 1
+        return False
+
+    def filter(self, docs: Iterable[Document]) -> Iterator[Document]:
+        for doc in docs:
+            if not self.is_duplicate(doc.page_content):
+                yield doc
+
+
+def remove_near_duplicates(docs: Iterable[Document], threshold: float = 0.9) -> Tuple[List[Document], int]:
+    """Retorna (chunks sin casi duplicados, número de chunks eliminados)"""
+    dedup = NearDuplicateFilter(threshold=threshold)
+    kept = list(dedup.filter(docs))
+    return kept, dedup.removed
@@ -0,0 +1,96 @@
+"""
+🧮 Micro-batching de embeddings de consultas
+
+Con varias sesiones concurrentes cada turno embebía su consulta por separado
+(batch de 1), desaprovechando casi toda la capacidad de cálculo matricial de la CPU.
+MicroBatchingEmbeddings agrupa las llamadas a `embed_query` que llegan desde varios
+hilos durante unos milisegundos, las ejecuta como un único batch y devuelve a cada
+hilo su vector.
+
+Todas las consultas se embeben con `embed_documents` del modelo base (también las que
+llegan solas). En HuggingFaceEmbeddings (el modelo del proyecto) `embed_query` es
+`embed_documents([texto])[0]`, así que el vector es el mismo; un modelo con prefijo o
+instrucción de consulta necesita EMBEDDING_BATCHING=false.
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+
+class MicroBatchingEmbeddings(Embeddings):
+    """
+    Envuelve un modelo de embeddings agrupando las consultas concurrentes.
+
+    Args:
+        base: Modelo de embeddings real (ej: HuggingFaceEmbeddings)
+        max_batch_size: Máximo de consultas por batch
+        max_wait_ms: Tiempo máximo que espera la primera consulta a que lleguen más
+    """
+
+    def __init__(self, base: Embeddings, max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        self.base = base
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._start_lock = threading.Lock()
+        self._queue = None
+        self._worker_pid = None
+        # Estadísticas (para los tests de carga)
+        self.batches = 0
+        self.requests = 0
+
+    # Los documentos (indexación) ya llegan en bloque: no hace falta agruparlos
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.base.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        future: Future = Future()
+        self._ensure_worker().put((text, future))
+        return future.result()
+
+    @property
+    def mean_batch_size(self) -> float:
+        return self.requests / self.batches if self.batches else 0.0
+
+    def _ensure_worker(self) -> queue.Queue:
+        # Tras un fork el hilo del padre no existe en el hijo: se arranca uno nuevo
+        if self._worker_pid != os.getpid():
+            with self._start_lock:
+                if self._worker_pid != os.getpid():
+                    self._queue = queue.Queue()
+                    threading.Thread(target=self._run, args=(self._queue,),
+                                     name="embedding-batcher", daemon=True).start()
+                    self._worker_pid = os.getpid()
+        return self._queue
+
+    def _collect(self, requests: queue.Queue) -> list:
+        batch = [requests.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(requests.get(timeout=remaining) if remaining > 0 else requests.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self, requests: queue.Queue):
+        while True:
+            batch = self._collect(requests)
+            texts = [text for text, _ in batch]
+            try:
+                # Siempre el mismo método, tenga el batch 1 o 32 consultas: con modelos que
+                # tratan distinto consultas y documentos, un vector no debe depender de la carga
+                vectors = self.base.embed_documents(texts)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            self.requests += len(batch)
+            for (_, future), vector in zip(batch, vectors):
+                future.set_result(vector)
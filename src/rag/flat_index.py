@@ -0,0 +1,259 @@
+"""
+📐 Índice vectorial plano en disco (alternativa ligera a Chroma)
+
+Para un corpus de decenas de miles de fragmentos una búsqueda exacta con NumPy
+es tan rápida como un índice aproximado, y se abre casi al instante porque todo
+se mapea en memoria (mmap) en lugar de cargarse.
+
+Formato del directorio:
+    manifest.json   dimensión, número de vectores, dtype y modelo de embeddings
+    vectors.bin     matriz contigua (count × dim) en float16 o float32, normalizada
+    chunks.jsonl    un JSON por fragmento: {"id", "text", "metadata"}
+    offsets.bin     uint64 con el offset de cada línea de chunks.jsonl (count + 1)
+"""
+import json
+import mmap
+import os
+import shutil
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+FORMAT_VERSION = 1
+# Filas por bloque al calcular productos escalares (acota la memoria temporal con float16)
+SEARCH_BLOCK_ROWS = 16384
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class FlatIndexWriter:
+    """
+    Escribe un índice plano de forma incremental (los vectores se añaden por bloques).
+    Se escribe en `<path>.tmp` y se renombra al cerrar, así nunca queda un índice a medias.
+    """
+
+    def __init__(self, path: str, dtype: str = "float32", embedding_model: Optional[str] = None):
+        if dtype not in ("float16", "float32"):
+            raise ValueError("dtype debe ser 'float16' o 'float32'")
+        self.path = Path(path)
+        self.tmp_path = Path(f"{path}.tmp")
+        self.dtype = np.dtype(dtype)
+        self.embedding_model = embedding_model
+        self.dim = None
+        self.count = 0
+
+        shutil.rmtree(self.tmp_path, ignore_errors=True)
+        self.tmp_path.mkdir(parents=True)
+        self._vectors = open(self.tmp_path / "vectors.bin", "wb")
+        self._chunks = open(self.tmp_path / "chunks.jsonl", "wb")
+        self._offsets = [0]
+
+    def add(self, vectors: List[List[float]], docs: List[Document]):
+        """Añade un bloque de vectores con sus documentos"""
+        if len(vectors) != len(docs):
+            raise ValueError("Número de vectores y documentos distinto")
+        if not docs:
+            return
+        matrix = np.asarray(vectors, dtype=np.float32)
+        if self.dim is None:
+            self.dim = matrix.shape[1]
+        elif matrix.shape[1] != self.dim:
+            raise ValueError(f"Dimensión {matrix.shape[1]} distinta de {self.dim}")
+
+        self._vectors.write(_normalize(matrix).astype(self.dtype).tobytes())
+        for doc in docs:
+            chunk_id = getattr(doc, "id", None) or doc.metadata.get("chunk_id") or str(self.count)
+            line = json.dumps(
+                {"id": chunk_id, "text": doc.page_content, "metadata": doc.metadata},
+                ensure_ascii=False, default=str
+            ).encode("utf-8") + b"\n"
+            self._chunks.write(line)
+            self._offsets.append(self._offsets[-1] + len(line))
+            self.count += 1
+
+    def close(self) -> Path:
+        """Cierra los ficheros, escribe el manifest y publica el índice en `path`"""
+        self._vectors.close()
+        self._chunks.close()
+        np.asarray(self._offsets, dtype=np.uint64).tofile(self.tmp_path / "offsets.bin")
+        manifest = {
+            "format": FORMAT_VERSION,
+            "dim": self.dim or 0,
+            "count": self.count,
+            "dtype": self.dtype.name,
+            "normalized": True,
+            "embedding_model": self.embedding_model,
+        }
+        (self.tmp_path / "manifest.json").write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+
+        # El índice anterior se aparta con un rename y se borra después de publicar el nuevo:
+        # `path` solo falta entre dos renames, no durante todo el rmtree
+        old_path = Path(f"{self.path}.old-{os.getpid()}")
+        shutil.rmtree(old_path, ignore_errors=True)
+        if self.path.exists():
+            os.replace(self.path, old_path)
+        try:
+            os.replace(self.tmp_path, self.path)
+        except OSError:
+            if old_path.exists():
+                os.replace(old_path, self.path)
+            raise
+        shutil.rmtree(old_path, ignore_errors=True)
+        return self.path
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._vectors.close()
+            self._chunks.close()
+            shutil.rmtree(self.tmp_path, ignore_errors=True)
+
+
+class FlatIndex:
+    """Índice plano abierto en modo solo lectura mediante mmap"""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.manifest = json.loads((self.path / "manifest.json").read_text(encoding="utf-8"))
+        if self.manifest.get("format") != FORMAT_VERSION:
+            raise ValueError(f"Formato de índice no soportado: {self.manifest.get('format')}")
+        self.count = self.manifest["count"]
+        self.dim = self.manifest["dim"]
+
+        if self.count:
+            self.vectors = np.memmap(self.path / "vectors.bin", dtype=self.manifest["dtype"],
+                                     mode="r", shape=(self.count, self.dim))
+            self.offsets = np.memmap(self.path / "offsets.bin", dtype=np.uint64, mode="r")
+            with open(self.path / "chunks.jsonl", "rb") as f:
+                self._chunks = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self.vectors = np.zeros((0, self.dim), dtype=np.float32)
+            self.offsets = np.zeros(1, dtype=np.uint64)
+            self._chunks = b""
+
+    def __len__(self) -> int:
+        return self.count
+
+    def close(self):
+        """Libera los mmap (y con ellos el espacio de los ficheros si el directorio se ha borrado)"""
+        if isinstance(self._chunks, mmap.mmap):
+            self._chunks.close()
+        self.vectors = self.offsets = None
+        self._chunks = b""
+
+    def scores(self, query_vector: List[float]) -> np.ndarray:
+        """Similitud coseno de la consulta con todos los vectores"""
+        query = _normalize(np.asarray(query_vector, dtype=np.float32))
+        if self.vectors.dtype == np.float32:
+            return np.asarray(self.vectors @ query)
+        out = np.empty(self.count, dtype=np.float32)
+        for start in range(0, self.count, SEARCH_BLOCK_ROWS):
+            block = self.vectors[start:start + SEARCH_BLOCK_ROWS].astype(np.float32)
+            out[start:start + len(block)] = block @ query
+        return out
+
+    def top_k(self, query_vector: List[float], k: int) -> List[Tuple[int, float]]:
+        """Los k fragmentos más similares como pares (posición, score), de mayor a menor"""
+        if self.count == 0 or k <= 0:
+            return []
+        scores = self.scores(query_vector)
+        k = min(k, self.count)
+        candidates = np.argpartition(-scores, k - 1)[:k]
+        ordered = candidates[np.argsort(-scores[candidates])]
+        return [(int(i), float(scores[i])) for i in ordered]
+
+    def get_vectors(self, positions: List[int]) -> np.ndarray:
+        return np.asarray(self.vectors[positions], dtype=np.float32)
+
+    def get_document(self, position: int) -> Document:
+        start, end = int(self.offsets[position]), int(self.offsets[position + 1])
+        record = json.loads(self._chunks[start:end])
+        return Document(page_content=record["text"], metadata=record["metadata"], id=record["id"])
+
+
+class FlatVectorStore:
+    """
+    Adaptador con la parte de la interfaz de un vector store de LangChain que usa el retriever.
+    """
+
+    def __init__(self, index: FlatIndex, embedding_function):
+        self.index = index
+        self.embedding_function = embedding_function
+
+    @classmethod
+    def load(cls, path: str, embedding_function) -> "FlatVectorStore":
+        return cls(FlatIndex(path), embedding_function)
+
+    def close(self):
+        self.index.close()
+
+    def similarity_search_with_score(self, query: str, k: int = 4) -> List[Tuple[Document, float]]:
+        query_vector = self.embedding_function.embed_query(query)
+        return [(self.index.get_document(i), score) for i, score in self.index.top_k(query_vector, k)]
+
+    def similarity_search(self, query: str, k: int = 4) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
+
+    def max_marginal_relevance_search(self, query: str, k: int = 4, fetch_k: int = 20,
+                                      lambda_mult: float = 0.5) -> List[Document]:
+        """Selecciona k de los fetch_k más similares penalizando los parecidos a los ya elegidos (MMR)"""
+        query_vector = self.embedding_function.embed_query(query)
+        candidates = self.index.top_k(query_vector, max(fetch_k, k))
+        if not candidates:
+            return []
+        positions = [i for i, _ in candidates]
+        relevance = np.asarray([score for _, score in candidates], dtype=np.float32)
+        selected = mmr_select(self.index.get_vectors(positions), relevance, k, lambda_mult)
+        return [self.index.get_document(positions[i]) for i in selected]
+
+
+def mmr_select(vectors: np.ndarray, relevance: np.ndarray, k: int, lambda_mult: float = 0.5,
+               duplicate_similarity: float = 0.98) -> List[int]:
+    """
+    Maximal Marginal Relevance sobre vectores normalizados.
+    Los candidatos con similitud >= `duplicate_similarity` a uno ya elegido solo se usan
+    si no queda otro. Retorna las posiciones elegidas (en `vectors`) por orden de selección.
+    """
+    k = min(k, len(vectors))
+    if k <= 0:
+        return []
+    selected = [int(np.argmax(relevance))]
+    # Similitud máxima de cada candidato con lo ya seleccionado
+    redundancy = vectors @ vectors[selected[0]]
+    while len(selected) < k:
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[selected] = -np.inf
+        duplicates = redundancy >= duplicate_similarity
+        duplicates[selected] = True
+        if not duplicates.all():
+            scores[duplicates] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        redundancy = np.maximum(redundancy, vectors @ vectors[best])
+    return selected
+
+
+def export_flat_index(path: str, docs: Iterable[Document], embedding_function,
+                      dtype: str = "float32", batch_size: int = 256,
+                      embedding_model: Optional[str] = None) -> Path:
+    """Embebe los documentos por bloques y los escribe como índice plano"""
+    with FlatIndexWriter(path, dtype=dtype, embedding_model=embedding_model) as writer:
+        batch: List[Document] = []
+        for doc in docs:
+            batch.append(doc)
+            if len(batch) >= batch_size:
+                writer.add(embedding_function.embed_documents([d.page_content for d in batch]), batch)
+                batch = []
+        if batch:
+            writer.add(embedding_function.embed_documents([d.page_content for d in batch]), batch)
+    return Path(path)
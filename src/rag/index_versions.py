@@ -0,0 +1,236 @@
+"""
+🔄 Versiones del índice RAG con cambio en caliente
+
+Estructura de INDEX_ROOT:
+    versions/<version>/   un índice completo (Chroma o plano) + version.json
+    CURRENT               id de la versión activa (se reemplaza de forma atómica)
+
+build_index.py escribe cada reconstrucción en una versión nueva y, cuando está
+completa, actualiza CURRENT. El servidor no necesita reiniciarse: IndexManager
+detecta el cambio, carga la nueva versión en segundo plano y la sustituye de golpe.
+Las consultas en curso terminan con la versión anterior (la reservan con
+`use_store()`) y las nuevas usan la nueva; la anterior se cierra en cuanto la suelta
+la última consulta que la usaba.
+
+gc_versions nunca borra la versión activa ni la que lo era antes de publicar: un
+servidor que aún no ha cambiado (hasta INDEX_POLL_SECONDS de retraso) sigue leyéndola.
+"""
+import json
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+CURRENT_FILE = "CURRENT"
+VERSIONS_DIR = "versions"
+VERSION_MANIFEST = "version.json"
+# Versiones que gc_versions conserva como mínimo: la nueva y la que sirven aún los servidores
+MIN_KEEP_VERSIONS = 2
+
+
+# ==================== PUBLICACIÓN ====================
+
+def new_version(root: str) -> Tuple[str, Path]:
+    """Reserva un id de versión nuevo (ordenable por fecha) y retorna (id, directorio)"""
+    version_id = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+    path = Path(root) / VERSIONS_DIR / version_id
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return version_id, path
+
+
+def write_version_manifest(path: Path, backend: str, **extra):
+    manifest = {"backend": backend, "created_at": datetime.now(timezone.utc).isoformat(), **extra}
+    (Path(path) / VERSION_MANIFEST).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+
+
+def read_version_manifest(path: Path) -> dict:
+    return json.loads((Path(path) / VERSION_MANIFEST).read_text(encoding="utf-8"))
+
+
+def publish_version(root: str, version_id: str):
+    """Apunta CURRENT a `version_id` de forma atómica (escribir temporal + os.replace)"""
+    root_path = Path(root)
+    if not (root_path / VERSIONS_DIR / version_id / VERSION_MANIFEST).exists():
+        raise ValueError(f"La versión {version_id} no existe o está incompleta")
+    tmp = root_path / f"{CURRENT_FILE}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(version_id)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, root_path / CURRENT_FILE)
+
+
+def read_current(root: str) -> Optional[str]:
+    try:
+        return (Path(root) / CURRENT_FILE).read_text(encoding="utf-8").strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def list_versions(root: str) -> List[str]:
+    versions_dir = Path(root) / VERSIONS_DIR
+    if not versions_dir.exists():
+        return []
+    return sorted(p.name for p in versions_dir.iterdir() if p.is_dir() and not p.name.endswith(".tmp"))
+
+
+def gc_versions(root: str, keep: int = 3, protect: Iterable[Optional[str]] = ()) -> List[str]:
+    """
+    Borra las versiones más antiguas conservando las `keep` más recientes (mínimo
+    MIN_KEEP_VERSIONS), la activa y las de `protect` (ej: la activa antes de publicar,
+    que los servidores siguen usando hasta su siguiente sondeo).
+    """
+    keep = max(keep, MIN_KEEP_VERSIONS)
+    protected = {read_current(root), *protect}
+    removable = [v for v in list_versions(root)[:-keep] if v not in protected]
+    for version_id in removable:
+        shutil.rmtree(Path(root) / VERSIONS_DIR / version_id, ignore_errors=True)
+    return removable
+
+
+# ==================== CONSUMO (SERVIDOR) ====================
+
+class IndexManager:
+    """
+    Mantiene la versión activa del índice y la cambia en caliente cuando CURRENT cambia.
+
+    Args:
+        root: Directorio raíz de versiones (INDEX_ROOT)
+        loader: Función que abre el vector store de un directorio de versión
+        poll_interval: Segundos entre comprobaciones de CURRENT
+    """
+
+    def __init__(self, root: str, loader: Callable[[Path], object], poll_interval: float = 5.0):
+        self.root = root
+        self.loader = loader
+        self.poll_interval = poll_interval
+        self._active: Optional[Tuple[str, object]] = None
+        self._load_lock = threading.Lock()
+        self._watcher_lock = threading.Lock()
+        self._watcher_pid = None
+        self._failed_version: Optional[str] = None
+        # _lease_lock protege la versión activa frente a las reservas: consultas en curso por
+        # store (id → contador) y stores sustituidos que aún no se han podido cerrar
+        self._lease_lock = threading.Lock()
+        self._leases: Dict[int, int] = {}
+        self._retired: List[object] = []
+
+    @property
+    def version(self) -> Optional[str]:
+        active = self._active
+        return active[0] if active else None
+
+    def current_store(self):
+        """
+        Vector store de la versión activa, sin reservarlo (para abrirlo o precargarlo).
+        Para consultar hay que usar `use_store()`: si no, puede cerrarse a mitad de consulta.
+        """
+        active = self._active
+        if active is None:
+            with self._load_lock:
+                if self._active is None:
+                    self._swap_to(read_current(self.root))
+            active = self._active
+        self._ensure_watcher()
+        return active[1]
+
+    @contextmanager
+    def use_store(self):
+        """
+        Reserva el store de la versión activa mientras dure el bloque:
+
+            with manager.use_store() as store:
+                docs = store.similarity_search(query)
+
+        Si se sustituye durante la consulta, se cierra al salir la última que lo usaba.
+        """
+        self.current_store()
+        with self._lease_lock:
+            store = self._active[1]
+            self._leases[id(store)] = self._leases.get(id(store), 0) + 1
+        try:
+            yield store
+        finally:
+            with self._lease_lock:
+                remaining = self._leases[id(store)] - 1
+                if remaining:
+                    self._leases[id(store)] = remaining
+                else:
+                    del self._leases[id(store)]
+                close_now = not remaining and store in self._retired
+                if close_now:
+                    self._retired.remove(store)
+            if close_now:
+                _close_store(store)
+
+    def check_for_update(self) -> bool:
+        """Carga y activa la versión indicada por CURRENT si ha cambiado. Retorna True si cambió."""
+        target = read_current(self.root)
+        if target is None or target in (self.version, self._failed_version):
+            return False
+        with self._load_lock:
+            if target == self.version:
+                return False
+            try:
+                self._swap_to(target)
+            except Exception:
+                # No reintentar en cada sondeo una versión rota; se esperará a la siguiente
+                self._failed_version = target
+                raise
+        self.close_retired()
+        return True
+
+    def _swap_to(self, version_id: Optional[str]):
+        if version_id is None:
+            raise FileNotFoundError(f"No hay versión activa en {self.root}/{CURRENT_FILE}")
+        start = time.perf_counter()
+        store = self.loader(Path(self.root) / VERSIONS_DIR / version_id)
+        with self._lease_lock:
+            previous = self._active
+            # Una sola asignación: las consultas ven la versión anterior o la nueva, nunca un estado mixto
+            self._active = (version_id, store)
+            if previous:
+                # No se cierra aún: puede haber consultas en curso con él
+                self._retired.append(previous[1])
+        if previous:
+            print(f"🔄 Índice actualizado en caliente: {previous[0]} → {version_id} "
+                  f"({time.perf_counter() - start:.2f}s de carga)")
+
+    def close_retired(self) -> int:
+        """Cierra (o suelta) los stores sustituidos que ya no usa ninguna consulta. Retorna cuántos."""
+        with self._lease_lock:
+            unused = [store for store in self._retired if id(store) not in self._leases]
+            self._retired = [store for store in self._retired if id(store) in self._leases]
+        for store in unused:
+            _close_store(store)
+        return len(unused)
+
+    def _ensure_watcher(self):
+        # Tras un fork el hilo del padre no existe en el hijo: se arranca uno nuevo
+        if self.poll_interval <= 0 or self._watcher_pid == os.getpid():
+            return
+        with self._watcher_lock:
+            if self._watcher_pid == os.getpid():
+                return
+            self._watcher_pid = os.getpid()
+            threading.Thread(target=self._watch, name="index-watcher", daemon=True).start()
+
+    def _watch(self):
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                self.check_for_update()
+            except Exception as e:
+                # Si la versión nueva no carga, se sigue sirviendo la actual
+                print(f"⚠️ No se pudo cargar la nueva versión del índice: {e}")
+
+
+def _close_store(store):
+    # Chroma no tiene close: basta con no conservar la referencia
+    close = getattr(store, "close", None)
+    if callable(close):
+        close()
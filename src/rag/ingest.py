@@ -0,0 +1,73 @@
+"""
+📥 Ingesta en streaming para build_index.py
+
+`PyPDFLoader(path).load()` cargaba todas las páginas del manual en memoria antes de
+dividirlas, y `Chroma.from_documents` embebía después todos los chunks de una vez.
+Con manuales de miles de páginas los nodos de ingesta se quedaban sin memoria.
+
+Aquí el documento se recorre página a página: cada página se divide en chunks al
+leerla y los chunks se entregan en ventanas de tamaño fijo para embeberlos y
+escribirlos en el índice. La memoria máxima depende del tamaño de la ventana, no
+del documento. Cada chunk conserva de qué página (y posición dentro de ella) viene.
+"""
+from itertools import islice
+from typing import Iterable, Iterator, List
+
+from langchain_core.documents import Document
+
+# Páginas cuyos objetos PDF ya leídos se mantienen en la caché de pypdf
+DEFAULT_PAGE_WINDOW = 50
+# Chunks que se acumulan antes de embeberlos y escribirlos
+DEFAULT_CHUNK_WINDOW = 256
+
+
+def iter_pdf_pages(path: str, page_window: int = DEFAULT_PAGE_WINDOW) -> Iterator[Document]:
+    """
+    Extrae el texto de un PDF página a página (mismos metadatos que PyPDFLoader).
+
+    pypdf guarda en caché cada objeto que resuelve y esa caché crece con el documento.
+    Cada `page_window` páginas se abre un lector nuevo sobre el mismo fichero, y la
+    caché del anterior se libera con él; las páginas ya procesadas no se vuelven a leer.
+    Solo usa la API pública de pypdf. El fichero se pasa abierto: con una ruta, pypdf lo
+    cargaría entero en memoria en cada lector.
+    """
+    from pypdf import PdfReader
+
+    with open(path, "rb") as f:
+        reader = PdfReader(f)
+        total_pages = len(reader.pages)
+        labels = reader.page_labels
+        for number in range(total_pages):
+            if page_window > 0 and number > 0 and number % page_window == 0:
+                reader = PdfReader(f)
+            yield Document(
+                page_content=reader.pages[number].extract_text() or "",
+                metadata={
+                    "source": path,
+                    "page": number,
+                    "page_label": labels[number] if number < len(labels) else str(number + 1),
+                    "total_pages": total_pages,
+                },
+            )
+
+
+def iter_chunks(pages: Iterable[Document], splitter) -> Iterator[Document]:
+    """
+    Divide cada página al leerla. Los chunks no cruzan el límite de página, así que
+    `page` identifica siempre la página de origen y `start_index` la posición en ella
+    (el splitter debe crearse con add_start_index=True).
+    """
+    for page in pages:
+        if page.page_content.strip():
+            yield from splitter.split_documents([page])
+
+
+def batched(items: Iterable, size: int) -> Iterator[List]:
+    """Agrupa un iterable en listas de como mucho `size` elementos"""
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
@@ -1,18 +1,139 @@
-from langchain_community.vectorstores import Chroma
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from src.config import CHROMA_DIR, CHROMA_COLLECTION_NAME, EMBEDDING_MODEL
+import hashlib
+import threading
+from src.config import (
+    RAG_BACKEND,
+    FLAT_INDEX_DIR,
+    INDEX_ROOT,
+    INDEX_POLL_SECONDS,
+    CHROMA_DIR,
+    CHROMA_COLLECTION_NAME,
+    EMBEDDING_MODEL,
+    EMBEDDING_BATCHING,
+    EMBEDDING_BATCH_MAX_SIZE,
+    EMBEDDING_BATCH_MAX_WAIT_MS,
+    RAG_SEARCH_TYPE,
+    RAG_MMR_FETCH_K,
+    RAG_MMR_LAMBDA,
+)
+
+# El modelo de embeddings y el cliente de Chroma se cargan una sola vez por proceso
+# (antes se recreaban en cada consulta) y solo cuando se necesitan.
+_lock = threading.Lock()
+_embeddings = None
+_vectordb = None
+_index_manager = None
+_index_manager_checked = False
+
+def get_embeddings():
+    """Retorna el modelo de embeddings compartido (se carga en la primera llamada)"""
+    global _embeddings
+    if _embeddings is None:
+        with _lock:
+            if _embeddings is None:
+                from langchain_community.embeddings import HuggingFaceEmbeddings
+                embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
+                if EMBEDDING_BATCHING:
+                    from src.rag.embedding_batcher import MicroBatchingEmbeddings
+                    embeddings = MicroBatchingEmbeddings(
+                        embeddings,
+                        max_batch_size=EMBEDDING_BATCH_MAX_SIZE,
+                        max_wait_ms=EMBEDDING_BATCH_MAX_WAIT_MS
+                    )
+                # Se publica ya envuelto: quien lo lea sin el lock nunca ve el modelo sin batching
+                _embeddings = embeddings
+    return _embeddings
 
 def load_vectordb():
-    embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
+    if RAG_BACKEND == "flat":
+        from src.rag.flat_index import FlatVectorStore
+        return FlatVectorStore.load(FLAT_INDEX_DIR, get_embeddings())
+    
+    from langchain_community.vectorstores import Chroma
     vectordb = Chroma(
         persist_directory=CHROMA_DIR,
         collection_name=CHROMA_COLLECTION_NAME,
-        embedding_function=embeddings
+        embedding_function=get_embeddings()
     )
     return vectordb
 
+def load_index_version(path):
+    """Abre el vector store de un directorio de versión (ver src/rag/index_versions.py)"""
+    from src.rag.index_versions import read_version_manifest
+    manifest = read_version_manifest(path)
+    if manifest["backend"] == "flat":
+        from src.rag.flat_index import FlatVectorStore
+        return FlatVectorStore.load(str(path), get_embeddings())
+    
+    from langchain_community.vectorstores import Chroma
+    return Chroma(
+        persist_directory=str(path),
+        collection_name=manifest.get("collection_name", CHROMA_COLLECTION_NAME),
+        embedding_function=get_embeddings()
+    )
+
+def get_index_manager():
+    """Retorna el gestor de versiones si INDEX_ROOT tiene una versión publicada (o None)"""
+    global _index_manager, _index_manager_checked
+    if not _index_manager_checked:
+        with _lock:
+            if not _index_manager_checked:
+                from src.rag.index_versions import IndexManager, read_current
+                if INDEX_ROOT and read_current(INDEX_ROOT):
+                    _index_manager = IndexManager(INDEX_ROOT, load_index_version, INDEX_POLL_SECONDS)
+                _index_manager_checked = True
+    return _index_manager
+
+def get_vectordb():
+    """
+    Retorna la base vectorial compartida (se abre en la primera llamada).
+    Con índices versionados retorna la versión activa, que puede cambiar entre llamadas.
+    """
+    global _vectordb
+    if _vectordb is None:
+        manager = get_index_manager()
+        if manager is not None:
+            get_embeddings()
+            return manager.current_store()
+        get_embeddings()  # fuera del lock: load_vectordb la vuelve a pedir
+        with _lock:
+            if _vectordb is None:
+                _vectordb = load_vectordb()
+    return _vectordb
+
 def get_relevant_docs(query, k=3):
-    vectordb = load_vectordb()
-    retriever = vectordb.as_retriever(search_kwargs={"k": k})
-    docs = retriever.invoke(query)
-    return docs
\ No newline at end of file
+    manager = get_index_manager()
+    if manager is None:
+        return _search(get_vectordb(), query, k)
+    get_embeddings()
+    # La versión queda reservada durante la búsqueda: un cambio en caliente no la cierra
+    with manager.use_store() as vectordb:
+        return _search(vectordb, query, k)
+
+def _search(vectordb, query, k):
+    if RAG_SEARCH_TYPE == "mmr":
+        # Entre los RAG_MMR_FETCH_K más parecidos, elegir k que no se repitan entre sí
+        return vectordb.max_marginal_relevance_search(
+            query, k=k, fetch_k=max(RAG_MMR_FETCH_K, k), lambda_mult=RAG_MMR_LAMBDA
+        )
+    docs = vectordb.similarity_search(query, k=k)
+    return docs
+
+
+def doc_chunk_id(doc) -> str:
+    """
+    Identificador estable de un fragmento recuperado: id del vector store o, si no lo tiene,
+    fuente + página + posición en la página (start_index). Solo con la fuente, todos los
+    fragmentos de un documento compartirían id.
+    """
+    chunk_id = getattr(doc, "id", None) or doc.metadata.get("chunk_id")
+    if chunk_id:
+        return str(chunk_id)
+    chunk_id = doc.metadata.get("source", "desconocido")
+    page = doc.metadata.get("page")
+    if page is not None:
+        chunk_id += f"#p{page}"
+    start_index = doc.metadata.get("start_index")
+    if start_index is not None:
+        return f"{chunk_id}@{start_index}"
+    # Índice creado sin add_start_index: se distingue por el contenido
+    return f"{chunk_id}@{hashlib.sha1(doc.page_content.encode('utf-8')).hexdigest()[:16]}"
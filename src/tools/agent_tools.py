@@ -1,6 +1,10 @@
 from langchain.tools import tool
 from typing import Union
 from src.tools.freescout_integration import get_freescout_db
+from src.tools.ticket_watcher import get_ticket_watcher, current_session
+from src.tools.ticket_spool import get_ticket_writer
+from src.tools.ticket_index import get_ticket_index
+from src.config import TICKET_SIMILARITY_MIN
 
 @tool
 def create_support_ticket(subject: str, description: str, priority: str = "normal") -> str:
@@ -20,10 +24,37 @@ def create_support_ticket(subject: str, description: str, priority: str = "norma
     priority_map = {"low": 1, "normal": 2, "high": 3}
     priority_num = priority_map.get(priority.lower(), 2)
     
+    # Modo write-behind: se guarda en el spool local y FreeScout se actualiza en segundo plano
+    writer = get_ticket_writer()
+    if writer:
+        try:
+            record = writer.submit(subject, description, priority=priority_num,
+                                   session_id=current_session.get())
+        except OSError as e:
+            print(f"⚠️ No se pudo guardar el ticket en el spool, se crea directamente: {e}")
+        else:
+            return f"""✅ **Ticket registrado**
+
+📋 **Referencia**: {record['reference']}
+• **Asunto**: {subject}
+• **Fecha**: {record['created_at']}
+• **Prioridad**: {priority.upper()}
+
+📝 **Descripción**: 
+{description[:200]}{'...' if len(description) > 200 else ''}
+
+El ticket se está dando de alta en FreeScout; en cuanto tenga número te lo indicaré aquí.
+Aunque el sistema de tickets no esté disponible ahora mismo, tu solicitud no se perderá."""
+    
     db = get_freescout_db()
     result = db.create_ticket(subject, description, priority=priority_num)
     
     if result["success"]:
+        # Avisar a esta sesión de los cambios del ticket
+        watcher = get_ticket_watcher()
+        if watcher:
+            watcher.follow(result["number"])
+        
         return f"""✅ **Ticket creado exitosamente**
 
 ╔══════════════════════════════════════╗
@@ -70,10 +101,17 @@ def get_ticket_status(ticket_number: int) -> str:
         - get_ticket_status("1")  ❌
         - get_ticket_status("#1") ❌
     """
-    db = get_freescout_db()
-    ticket = db.get_ticket_by_number(ticket_number)
+    # Con el feed de cambios activo el estado sale de memoria (si está al día)
+    watcher = get_ticket_watcher()
+    if watcher:
+        ticket = watcher.get_ticket(ticket_number)
+    else:
+        ticket = get_freescout_db().get_ticket_by_number(ticket_number)
     
     if ticket:
+        if watcher:
+            watcher.follow(ticket_number)
+
         status_emoji = {
             "Activo": "🔵",
             "Pendiente": "🟡",
@@ -85,7 +123,7 @@ def get_ticket_status(ticket_number: int) -> str:
 
 {emoji} **Estado**: {ticket['status']}
 📌 **Asunto**: {ticket['subject']}
-📝 **Descripción**: {ticket['description']}
+📝 **Descripción**: {ticket['description'] or 'Sin descripción'}
 📧 **Email**: {ticket['customer_email']}
 ⏰ **Creado**: {ticket['created_at']}
 🔄 **Última actualización**: {ticket['updated_at']}
@@ -93,4 +131,78 @@ def get_ticket_status(ticket_number: int) -> str:
 🔗 Ver detalles completos: http://localhost:8080/conversation/{ticket['ticket_id']}
 """
     else:
-        return f"❌ No se encontró el ticket #{ticket_number}. Verifica el número e intenta nuevamente."
\ No newline at end of file
+        return f"❌ No se encontró el ticket #{ticket_number}. Verifica el número e intenta nuevamente."
+
+
+@tool
+def find_similar_tickets(problem_description: str) -> str:
+    """
+    Busca tickets ABIERTOS que traten del mismo problema que describe el usuario.
+    Utiliza esta herramienta ANTES de create_support_ticket para no crear tickets duplicados.
+    
+    Args:
+        problem_description: Descripción del problema (asunto y detalles que ha dado el usuario)
+    
+    Returns:
+        Lista de tickets abiertos parecidos con su número y grado de similitud
+    """
+    index = get_ticket_index()
+    if index is None:
+        return "ℹ️ La búsqueda de tickets similares no está activada. Puedes crear el ticket."
+    if not index.ready:
+        return "ℹ️ El índice de tickets todavía se está construyendo. Puedes crear el ticket."
+    
+    matches = index.similar(problem_description, k=5, min_score=TICKET_SIMILARITY_MIN)
+    if not matches:
+        return "✅ No hay tickets abiertos sobre este problema. Puedes crear un ticket nuevo."
+    
+    lines = [
+        f"• **#{t['number']}** — {t['subject']} ({t['status']}, similitud {t['score']:.0%})"
+        for t in matches
+    ]
+    return (
+        "🔎 **Tickets abiertos parecidos:**\n" + "\n".join(lines) +
+        "\n\nSi alguno es el mismo problema, indícaselo al usuario y ofrécele seguir ese ticket "
+        "(get_ticket_status) en lugar de crear uno nuevo."
+    )
+
+
+SEARCH_PAGE_SIZE = 10
+
+@tool
+def search_tickets(query: str, page: int = 1, only_open: bool = False) -> str:
+    """
+    Busca tickets por palabras en el asunto y en los mensajes (ej: "impresora", "vpn error 809").
+    Utiliza esta herramienta cuando el usuario pregunte por tickets sobre un tema y no sepa el número.
+    
+    Args:
+        query: Palabras a buscar
+        page: Página de resultados (1, 2, 3...), de 10 en 10
+        only_open: True para mostrar solo tickets no cerrados
+    
+    Returns:
+        Tickets encontrados, de más a menos relevante
+    """
+    page = max(1, int(page))
+    try:
+        # Se pide uno más para saber si hay otra página sin contar todos los resultados
+        results = get_freescout_db().search_tickets(
+            query, limit=SEARCH_PAGE_SIZE + 1, offset=(page - 1) * SEARCH_PAGE_SIZE, only_open=only_open
+        )
+    except Exception as e:
+        return f"❌ Error al buscar tickets: {e}"
+    
+    if not results:
+        if page > 1:
+            return f"ℹ️ No hay más tickets sobre \"{query}\"."
+        return f"ℹ️ No se encontraron tickets sobre \"{query}\"."
+    
+    has_more = len(results) > SEARCH_PAGE_SIZE
+    lines = [
+        f"• **#{t['number']}** — {t['subject']} ({t['status']}, actualizado {t['updated_at']})"
+        for t in results[:SEARCH_PAGE_SIZE]
+    ]
+    text = f"🔍 **Tickets sobre \"{query}\"** (página {page}):\n" + "\n".join(lines)
+    if has_more:
+        text += f"\n\nHay más resultados: search_tickets(query, page={page + 1})"
+    return text
@@ -0,0 +1,280 @@
+"""
+🐳 Cliente mínimo de la API de Docker Engine y caché de estado de contenedores
+
+Se habla directamente con el daemon por su socket unix (o TCP) con http.client,
+sin dependencias nuevas, y reutilizando la misma conexión entre peticiones.
+
+ContainerStateCache carga una vez la lista de contenedores y después la mantiene
+al día escuchando el stream `/events` del daemon, en lugar de consultarlo en cada
+pregunta: con cientos de contenedores la respuesta sale de memoria al instante.
+"""
+import http.client
+import json
+import os
+import re
+import socket
+import threading
+import time
+from typing import Dict, Iterator, List, Optional
+from urllib.parse import quote, urlparse
+
+from src.config import DOCKER_HOST, DOCKER_TIMEOUT
+
+# Estado resultante de cada acción de contenedor en /events (las demás no cambian el estado)
+EVENT_STATES = {
+    "create": "created",
+    "start": "running",
+    "restart": "running",
+    "unpause": "running",
+    "pause": "paused",
+    "die": "exited",
+    "stop": "exited",
+}
+
+
+class DockerEngineError(Exception):
+    """Error devuelto por el daemon de Docker o fallo de conexión"""
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTPConnection sobre un socket unix (ej: /var/run/docker.sock)"""
+
+    def __init__(self, socket_path: str, timeout: Optional[float] = None):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        self.sock = sock
+
+
+class DockerEngineClient:
+    """
+    Cliente HTTP de la API de Docker Engine.
+
+    Args:
+        host: Dirección del daemon, "unix:///var/run/docker.sock" o "tcp://host:2375"
+        timeout: Segundos máximos por petición (el stream de eventos no tiene límite)
+    """
+
+    def __init__(self, host: str = DOCKER_HOST, timeout: float = DOCKER_TIMEOUT):
+        self.host = host
+        self.timeout = timeout
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _new_connection(self, timeout: Optional[float]) -> http.client.HTTPConnection:
+        url = urlparse(self.host)
+        if url.scheme == "unix":
+            return UnixHTTPConnection(url.path, timeout=timeout)
+        if url.scheme in ("tcp", "http"):
+            return http.client.HTTPConnection(url.hostname, url.port or 2375, timeout=timeout)
+        raise DockerEngineError(f"DOCKER_HOST no soportado: {self.host}")
+
+    def get_json(self, path: str):
+        """GET sobre la conexión persistente; si el daemon la cerró, se reconecta una vez"""
+        with self._lock:
+            for attempt in range(2):
+                if self._conn is None:
+                    self._conn = self._new_connection(self.timeout)
+                try:
+                    self._conn.request("GET", path)
+                    response = self._conn.getresponse()
+                    body = response.read()
+                except (OSError, http.client.HTTPException) as e:
+                    self._conn.close()
+                    self._conn = None
+                    if attempt == 1:
+                        raise DockerEngineError(f"No se pudo conectar con Docker en {self.host}: {e}") from e
+                    continue
+                if response.will_close:
+                    self._conn.close()
+                    self._conn = None
+                return _decode(response.status, body)
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def list_containers(self, all: bool = True) -> List[Dict]:
+        return self.get_json(f"/containers/json?all={1 if all else 0}")
+
+    def stream_events(self, since: Optional[int] = None, filters: Optional[Dict] = None) -> Iterator[Dict]:
+        """Eventos del daemon uno a uno (conexión propia que queda abierta mientras se lea)"""
+        query = []
+        if since is not None:
+            query.append(f"since={since}")
+        if filters:
+            query.append("filters=" + quote(json.dumps(filters)))
+        conn = self._new_connection(None)
+        try:
+            conn.request("GET", "/events" + ("?" + "&".join(query) if query else ""))
+            response = conn.getresponse()
+            if response.status >= 400:
+                _decode(response.status, response.read())
+            while True:
+                line = response.readline()
+                if not line:
+                    return
+                if line.strip():
+                    yield json.loads(line)
+        except (OSError, http.client.HTTPException) as e:
+            raise DockerEngineError(f"Stream de eventos de Docker interrumpido: {e}") from e
+        finally:
+            conn.close()
+
+
+def _decode(status: int, body: bytes):
+    data = json.loads(body) if body else None
+    if status >= 400:
+        message = data.get("message") if isinstance(data, dict) else body.decode("utf-8", "replace")
+        raise DockerEngineError(f"Docker respondió {status}: {message}")
+    return data
+
+
+_EXIT_CODE_RE = re.compile(r"Exited \((-?\d+)\)")
+
+
+def _exit_code(value) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _container_from_list(item: Dict) -> Dict:
+    status = item.get("Status", "")
+    exit_code = _EXIT_CODE_RE.search(status)
+    health = None
+    for value in ("unhealthy", "healthy", "health: starting"):
+        if f"({value})" in status:
+            health = value.replace("health: ", "")
+            break
+    return {
+        "id": item["Id"],
+        "name": (item.get("Names") or [item["Id"][:12]])[0].lstrip("/"),
+        "image": item.get("Image", ""),
+        "state": item.get("State", "unknown"),
+        "status": status,
+        "health": health,
+        "exit_code": int(exit_code.group(1)) if exit_code else None,
+    }
+
+
+class ContainerStateCache:
+    """
+    Estado de todos los contenedores en memoria, actualizado por eventos.
+
+    Un hilo en segundo plano carga la lista completa y luego aplica cada evento de
+    `/events`. Si el stream se corta, vuelve a cargar la lista y se resuscribe.
+    """
+
+    def __init__(self, client: DockerEngineClient, reconnect_delay: float = 2.0):
+        self.client = client
+        self.reconnect_delay = reconnect_delay
+        self._containers: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._thread_pid = None
+        self.connected = False
+        self.last_error: Optional[str] = None
+        self.updated_at: Optional[float] = None
+
+    def start(self):
+        # Tras un fork el hilo del padre no existe en el hijo: se arranca uno nuevo
+        if self._thread_pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread_pid == os.getpid():
+                return
+            self._thread_pid = os.getpid()
+            threading.Thread(target=self._run, name="docker-events", daemon=True).start()
+
+    def wait_ready(self, timeout: float) -> bool:
+        """Espera a la primera carga completa. Retorna False si no llegó a tiempo."""
+        return self._ready.wait(timeout)
+
+    def containers(self) -> List[Dict]:
+        with self._lock:
+            return [dict(c) for c in self._containers.values()]
+
+    def load_snapshot(self):
+        containers = {item["Id"]: _container_from_list(item) for item in self.client.list_containers(all=True)}
+        with self._lock:
+            self._containers = containers
+            self.updated_at = time.time()
+        self._ready.set()
+
+    def apply_event(self, event: Dict):
+        if event.get("Type") != "container":
+            return
+        action = event.get("Action", "")
+        actor = event.get("Actor") or {}
+        container_id = actor.get("ID") or event.get("id")
+        attributes = actor.get("Attributes") or {}
+        if not container_id:
+            return
+
+        with self._lock:
+            self.updated_at = time.time()
+            if action == "destroy":
+                self._containers.pop(container_id, None)
+                return
+            container = self._containers.get(container_id)
+            if container is None:
+                container = self._containers[container_id] = {
+                    "id": container_id,
+                    "name": attributes.get("name", container_id[:12]),
+                    "image": attributes.get("image", ""),
+                    "state": "created",
+                    "status": "",
+                    "health": None,
+                    "exit_code": None,
+                }
+            if action.startswith("health_status"):
+                container["health"] = action.split(":", 1)[1].strip()
+            elif action == "rename":
+                container["name"] = attributes.get("name", container["name"])
+            elif action in EVENT_STATES:
+                container["state"] = EVENT_STATES[action]
+                when = time.strftime("%H:%M:%S", time.localtime(event.get("time", time.time())))
+                container["status"] = f"{action} a las {when}"
+                if action == "die":
+                    container["exit_code"] = _exit_code(attributes.get("exitCode"))
+                if action in ("start", "restart"):
+                    container["exit_code"] = None
+                    container["health"] = None if container["health"] is None else "starting"
+
+    def _run(self):
+        while True:
+            try:
+                # Pedir los eventos desde el instante anterior a la carga: los que se solapen
+                # se reaplican en orden y el estado final es el mismo
+                since = int(time.time())
+                self.load_snapshot()
+                self.connected = True
+                self.last_error = None
+                for event in self.client.stream_events(since=since, filters={"type": ["container"]}):
+                    self.apply_event(event)
+            except Exception as e:
+                self.last_error = str(e)
+            self.connected = False
+            time.sleep(self.reconnect_delay)
+
+
+_container_cache = None
+_cache_lock = threading.Lock()
+
+def get_container_cache() -> ContainerStateCache:
+    """Retorna la caché compartida de contenedores (el hilo de eventos arranca con el primer uso)"""
+    global _container_cache
+    if _container_cache is None:
+        with _cache_lock:
+            if _container_cache is None:
+                _container_cache = ContainerStateCache(DockerEngineClient())
+    _container_cache.start()
+    return _container_cache
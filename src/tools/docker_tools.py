@@ -0,0 +1,81 @@
+"""
+🐳 Docker Tools - Estado de los contenedores Docker
+"""
+import time
+
+from langchain.tools import tool
+
+from src.tools.docker_engine import get_container_cache
+
+# Segundos que se espera a la primera carga de la caché en la primera pregunta
+FIRST_LOAD_TIMEOUT = 3.0
+# Contenedores listados como máximo (primero los que tienen problemas)
+MAX_LISTED = 30
+
+STATE_ICONS = {"running": "🟢", "paused": "⏸️", "restarting": "🔄", "created": "⚪", "exited": "🔴", "dead": "🔴"}
+
+
+def _has_problem(container: dict) -> bool:
+    if container["health"] == "unhealthy" or container["state"] in ("restarting", "dead"):
+        return True
+    return container["state"] == "exited" and container["exit_code"] not in (None, 0)
+
+
+def _format_container(container: dict) -> str:
+    icon = STATE_ICONS.get(container["state"], "❔")
+    line = f"{icon} **{container['name']}** ({container['image']}) — {container['state']}"
+    if container["status"]:
+        line += f" · {container['status']}"
+    if container["health"]:
+        line += f" · salud: {container['health']}"
+    if container["exit_code"] not in (None, 0):
+        line += f" · código de salida {container['exit_code']}"
+    return line
+
+
+@tool
+def get_docker_containers_status(name_filter: str = "") -> str:
+    """
+    Obtiene el estado de los contenedores Docker (en ejecución, detenidos, con problemas).
+    Útil cuando el usuario pregunta por contenedores, servicios Docker o por qué un servicio no responde.
+
+    Args:
+        name_filter: Texto opcional para mostrar solo los contenedores cuyo nombre o imagen lo contengan
+
+    Returns:
+        Resumen por estado y lista de contenedores
+    """
+    try:
+        cache = get_container_cache()
+        if not cache.wait_ready(FIRST_LOAD_TIMEOUT):
+            return f"❌ Docker no está disponible: {cache.last_error or 'el daemon no responde'}"
+
+        containers = cache.containers()
+        if name_filter:
+            needle = name_filter.lower()
+            containers = [c for c in containers if needle in c["name"].lower() or needle in c["image"].lower()]
+
+        running = sum(1 for c in containers if c["state"] == "running")
+        problems = [c for c in containers if _has_problem(c)]
+        result = "🐳 **Contenedores Docker**\n\n"
+        result += (f"**Total**: {len(containers)} · **En ejecución**: {running} · "
+                   f"**Detenidos**: {len(containers) - running} · **Con problemas**: {len(problems)}\n\n")
+
+        if not containers:
+            result += "No hay contenedores" + (f" que coincidan con '{name_filter}'" if name_filter else "") + ".\n"
+        ordered = problems + sorted((c for c in containers if not _has_problem(c)),
+                                    key=lambda c: (c["state"] != "running", c["name"]))
+        for container in ordered[:MAX_LISTED]:
+            result += _format_container(container) + "\n"
+        if len(ordered) > MAX_LISTED:
+            result += f"... y {len(ordered) - MAX_LISTED} contenedores más\n"
+
+        if problems:
+            result += "\n⚠️ **Hay contenedores con problemas**: revisa sus logs con `docker logs <nombre>`."
+        if not cache.connected:
+            age = int(time.time() - cache.updated_at) if cache.updated_at else 0
+            result += f"\n\nℹ️ Conexión con Docker perdida: datos de hace {age}s."
+        return result
+
+    except Exception as e:
+        return f"❌ Error al obtener el estado de los contenedores: {str(e)}"
@@ -2,10 +2,74 @@ import mysql.connector
 import os
 from dotenv import load_dotenv
 from datetime import datetime
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 
 load_dotenv()
 
+# Bloqueo esperando a otra transacción (1205) o interbloqueo (1213): se resuelven reintentando
+RETRYABLE_ERRNOS = {1205, 1213}
+
+def is_retryable_error(error: Exception) -> bool:
+    """True si el error es de conexión o de bloqueo (reintentar), False si es permanente (datos, esquema...)"""
+    if isinstance(error, (mysql.connector.errors.InterfaceError, mysql.connector.errors.OperationalError)):
+        return True
+    return getattr(error, "errno", None) in RETRYABLE_ERRNOS
+
+# conversations.state / threads.state de FreeScout: 1 borrador, 2 publicado, 3 borrado
+STATE_PUBLISHED = 2
+# threads.type de FreeScout: 1 mensaje del cliente, 2 respuesta del equipo, 3 nota interna,
+# 4 línea de historial (cambio de estado, asignación...). Solo 1 y 2 son mensajes visibles
+MESSAGE_THREAD_TYPES = (1, 2)
+# conversations.status de FreeScout
+STATUS_CLOSED = 3
+STATUS_SPAM = 4
+
+# Candidatos máximos por rama (asunto / mensajes) en search_tickets: acota coste y paginación
+SEARCH_MAX_CANDIDATES = 1000
+
+def build_search_query(only_open: bool = False) -> str:
+    """
+    SQL de search_tickets. Parámetros: (query, query, query, query, limit, offset).
+
+    Cada rama (asuntos / mensajes) aplica sus filtros antes de quedarse con sus mejores
+    SEARCH_MAX_CANDIDATES: si se filtrara después, los tickets cerrados, borradores o notas
+    internas ocuparían esos huecos y la búsqueda devolvería menos resultados de los que hay.
+    """
+    conversation_filters = [f"c.state = {STATE_PUBLISHED}", f"c.status <> {STATUS_SPAM}"]
+    if only_open:
+        conversation_filters.append(f"c.status <> {STATUS_CLOSED}")
+    thread_filters = [
+        f"t.type IN ({', '.join(str(t) for t in MESSAGE_THREAD_TYPES)})",
+        f"t.state = {STATE_PUBLISHED}",
+    ]
+    subject_where = " AND ".join(["MATCH(c.subject) AGAINST (%s IN NATURAL LANGUAGE MODE)"] + conversation_filters)
+    body_where = " AND ".join(["MATCH(t.body) AGAINST (%s IN NATURAL LANGUAGE MODE)"]
+                              + thread_filters + conversation_filters)
+    # Cada rama se queda con sus mejores candidatos: el JOIN y la ordenación final
+    # trabajan sobre como mucho 2 * SEARCH_MAX_CANDIDATES filas, sea cual sea el buzón
+    return f"""
+        SELECT c.id, c.number, c.subject, c.status, c.updated_at, SUM(m.score) AS score
+        FROM (
+            (SELECT c.id AS conversation_id,
+                    2 * MATCH(c.subject) AGAINST (%s IN NATURAL LANGUAGE MODE) AS score
+             FROM conversations c
+             WHERE {subject_where}
+             ORDER BY score DESC LIMIT {SEARCH_MAX_CANDIDATES})
+            UNION ALL
+            (SELECT t.conversation_id,
+                    MATCH(t.body) AGAINST (%s IN NATURAL LANGUAGE MODE) AS score
+             FROM threads t
+             JOIN conversations c ON c.id = t.conversation_id
+             WHERE {body_where}
+             ORDER BY score DESC LIMIT {SEARCH_MAX_CANDIDATES})
+        ) m
+        JOIN conversations c ON c.id = m.conversation_id
+        GROUP BY c.id, c.number, c.subject, c.status, c.updated_at
+        ORDER BY score DESC, c.id DESC
+        LIMIT %s OFFSET %s
+    """
+
+
 class FreeScoutDB:
     """Integración directa con la base de datos de FreeScout."""
     
@@ -24,7 +88,8 @@ class FreeScoutDB:
     
     def create_ticket(self, subject: str, body: str, 
                      customer_email: str = "usuario@empresa.local",
-                     priority: int = 2) -> Dict:
+                     priority: int = 2,
+                     idempotency_key: Optional[str] = None) -> Dict:
         """
         Crea un ticket directamente en la base de datos de FreeScout.
         
@@ -33,22 +98,49 @@ class FreeScoutDB:
             body: Descripción del problema
             customer_email: Email del usuario que reporta
             priority: Prioridad (no se usa directamente en esta versión)
+            idempotency_key: Si se indica, se guarda en threads.message_id y un segundo
+                intento con la misma clave retorna el ticket ya creado en vez de duplicarlo
         
         Returns:
-            Dict con la información del ticket creado
+            Dict con la información del ticket creado. Si falla, `retryable` indica si
+            el error es de conexión (se puede reintentar) o permanente
         """
         conn = self._get_connection()
         cursor = conn.cursor()
+        message_id = f"{idempotency_key}@it-chatbot" if idempotency_key else None
         
         try:
-            # 1. Obtener el mailbox_id y folder_id (inbox)
-            cursor.execute("SELECT id FROM mailboxes ORDER BY id LIMIT 1")
+            # 1. Obtener el mailbox_id, bloqueando su fila hasta el commit: serializa las
+            #    creaciones de tickets del buzón (número consecutivo y clave de idempotencia)
+            cursor.execute("SELECT id FROM mailboxes ORDER BY id LIMIT 1 FOR UPDATE")
             result = cursor.fetchone()
             if not result:
                 raise Exception("No hay mailboxes configurados en FreeScout")
             mailbox_id = result[0]
             
-            # 2. Obtener el folder_id del inbox (type=1 es inbox)
+            # 2. ¿Ya se creó en un intento anterior? (lectura con bloqueo: ve lo último confirmado)
+            if message_id:
+                cursor.execute("""
+                    SELECT c.id, c.number FROM threads t
+                    JOIN conversations c ON c.id = t.conversation_id
+                    WHERE t.message_id = %s
+                    LIMIT 1
+                    FOR UPDATE
+                """, (message_id,))
+                existing = cursor.fetchone()
+                if existing:
+                    conn.rollback()
+                    return {
+                        "success": True,
+                        "ticket_id": existing[0],
+                        "number": existing[1],
+                        "subject": subject,
+                        "customer_email": customer_email,
+                        "created_at": datetime.now().isoformat(),
+                        "message": f"✅ Ticket #{existing[1]} ya estaba creado"
+                    }
+            
+            # 3. Obtener el folder_id del inbox (type=1 es inbox)
             cursor.execute("""
                 SELECT id FROM folders 
                 WHERE mailbox_id = %s AND type = 1 
@@ -57,14 +149,14 @@ class FreeScoutDB:
             folder_result = cursor.fetchone()
             folder_id = folder_result[0] if folder_result else 1
             
-            # 3. Obtener el siguiente número de conversación
+            # 4. Obtener el siguiente número de conversación
             cursor.execute("""
                 SELECT COALESCE(MAX(number), 0) + 1 FROM conversations 
                 WHERE mailbox_id = %s
             """, (mailbox_id,))
             conversation_number = cursor.fetchone()[0]
             
-            # 4. Buscar o crear customer (opcional, puede ser NULL)
+            # 5. Buscar o crear customer (opcional, puede ser NULL)
             cursor.execute("""
                 SELECT id FROM customers 
                 WHERE LOWER(first_name) = LOWER(%s) 
@@ -81,7 +173,7 @@ class FreeScoutDB:
                 """, ("Usuario", "IT"))
                 customer_id = cursor.lastrowid
             
-            # 5. Crear la conversación (ticket)
+            # 6. Crear la conversación (ticket)
             cursor.execute("""
                 INSERT INTO conversations 
                 (number, type, folder_id, status, state, subject, 
@@ -94,16 +186,16 @@ class FreeScoutDB:
             
             conversation_id = cursor.lastrowid
             
-            # 6. Crear el primer thread (mensaje del ticket)
+            # 7. Crear el primer thread (mensaje del ticket)
             cursor.execute("""
                 INSERT INTO threads 
                 (conversation_id, type, status, state, body, 
                  `from`, customer_id, source_via, source_type,
-                 first, created_at, updated_at)
-                VALUES (%s, 1, 1, 2, %s, %s, %s, 1, 8, 1, NOW(), NOW())
-            """, (conversation_id, body, customer_email, customer_id))
+                 first, message_id, created_at, updated_at)
+                VALUES (%s, 1, 1, 2, %s, %s, %s, 1, 8, 1, %s, NOW(), NOW())
+            """, (conversation_id, body, customer_email, customer_id, message_id))
             
-            # 7. Actualizar el contador de threads en la conversación
+            # 8. Actualizar el contador de threads en la conversación
             cursor.execute("""
                 UPDATE conversations 
                 SET threads_count = 1
@@ -127,6 +219,7 @@ class FreeScoutDB:
             return {
                 "success": False,
                 "error": str(e),
+                "retryable": is_retryable_error(e),
                 "message": f"❌ Error al crear ticket: {str(e)}"
             }
         finally:
@@ -203,6 +296,116 @@ class FreeScoutDB:
             cursor.close()
             conn.close()
 
+    def get_change_watermark(self) -> Optional[tuple]:
+        """Retorna (updated_at, id) de la última conversación modificada, o None si no hay ninguna"""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute("""
+                SELECT updated_at, id FROM conversations
+                ORDER BY updated_at DESC, id DESC
+                LIMIT 1
+            """)
+            row = cursor.fetchone()
+            return (row[0], row[1]) if row else None
+            
+        finally:
+            cursor.close()
+            conn.close()
+    
+    def get_ticket_changes(self, since_updated_at, since_id: int, limit: int = 500) -> List[Dict]:
+        """
+        Conversaciones modificadas después de la marca (updated_at, id), en orden de modificación.
+        Usa el índice (updated_at, id) de freescout_migrations: coste proporcional a los cambios.
+        Incluye `state` (2 = publicada) y `description` es None si no hay primer mensaje.
+        
+        Args:
+            since_updated_at: updated_at de la última fila ya procesada
+            since_id: id de la última fila ya procesada (desempata filas del mismo segundo)
+            limit: Máximo de filas por llamada (para paginar con la última fila devuelta)
+        """
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            # Keyset escrito como OR (no como tupla) para que MariaDB use el rango del índice (updated_at, id).
+            # messages_count solo cuenta mensajes publicados del cliente o del equipo: los cambios de
+            # estado, asignaciones y notas internas también crean threads y no son respuestas.
+            cursor.execute(f"""
+                SELECT c.id, c.number, c.subject, c.status, c.state, c.customer_email,
+                       c.created_at, c.updated_at, t.body,
+                       (SELECT COUNT(*) FROM threads m
+                        WHERE m.conversation_id = c.id
+                          AND m.type IN ({", ".join(str(t) for t in MESSAGE_THREAD_TYPES)})
+                          AND m.state = {STATE_PUBLISHED}) AS messages_count
+                FROM conversations c
+                LEFT JOIN threads t ON t.conversation_id = c.id AND t.first = 1
+                WHERE c.updated_at > %s OR (c.updated_at = %s AND c.id > %s)
+                ORDER BY c.updated_at, c.id
+                LIMIT %s
+            """, (since_updated_at, since_updated_at, since_id, limit))
+            
+            status_map = {1: "Activo", 2: "Pendiente", 3: "Cerrado", 4: "Spam"}
+            return [
+                {
+                    "ticket_id": row[0],
+                    "number": row[1],
+                    "subject": row[2],
+                    "status": status_map.get(row[3], "Desconocido"),
+                    "state": row[4],
+                    "customer_email": row[5],
+                    "created_at": row[6],
+                    "updated_at": row[7],
+                    "description": row[8],
+                    "messages_count": row[9]
+                }
+                for row in cursor.fetchall()
+            ]
+            
+        finally:
+            cursor.close()
+            conn.close()
+
+    def search_tickets(self, query: str, limit: int = 10, offset: int = 0,
+                       only_open: bool = False) -> List[Dict]:
+        """
+        Búsqueda de texto completo en asuntos y mensajes, ordenada por relevancia.
+        Usa los índices FULLTEXT de freescout_migrations (el asunto puntúa el doble).
+        Solo busca en conversaciones publicadas que no son spam, y en sus mensajes
+        (no en notas internas ni en el historial).
+        
+        Args:
+            query: Palabras a buscar (lenguaje natural, sin operadores)
+            limit: Resultados por página
+            offset: Resultados que se saltan (página * limit)
+            only_open: Excluir los tickets cerrados
+        """
+        if not query.strip() or offset >= SEARCH_MAX_CANDIDATES:
+            return []
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute(build_search_query(only_open), (query, query, query, query, limit, offset))
+            
+            status_map = {1: "Activo", 2: "Pendiente", 3: "Cerrado", 4: "Spam"}
+            return [
+                {
+                    "ticket_id": row[0],
+                    "number": row[1],
+                    "subject": row[2],
+                    "status": status_map.get(row[3], "Desconocido"),
+                    "updated_at": row[4],
+                    "score": float(row[5])
+                }
+                for row in cursor.fetchall()
+            ]
+            
+        finally:
+            cursor.close()
+            conn.close()
+
 # Instancia global
 _freescout_db = None
 
@@ -0,0 +1,99 @@
+"""
+🗄️ Migraciones de la base de datos de FreeScout que necesita el chatbot
+
+Solo añaden índices (no tocan tablas ni datos de FreeScout) y son idempotentes:
+cada índice se crea únicamente si no existe. Los FULLTEXT de un buzón grande pueden
+tardar varios minutos en crearse la primera vez.
+
+Uso:
+    python -m src.tools.freescout_migrations            # aplicar las pendientes
+    python -m src.tools.freescout_migrations --status   # ver cuáles faltan
+"""
+import argparse
+from typing import List
+
+from src.tools.freescout_integration import get_freescout_db
+
+# (tabla, nombre del índice, DDL)
+MIGRATIONS = [
+    (
+        "conversations",
+        "idx_conversations_updated_at_id",
+        # Feed de cambios de tickets (TicketWatcher): WHERE (updated_at, id) > (?, ?) ORDER BY updated_at, id
+        "CREATE INDEX idx_conversations_updated_at_id ON conversations (updated_at, id)",
+    ),
+    (
+        "threads",
+        "idx_threads_message_id",
+        # Idempotencia de los tickets en diferido (ticket_spool): WHERE message_id = ?
+        "CREATE INDEX idx_threads_message_id ON threads (message_id(191))",
+    ),
+    (
+        "conversations",
+        "ft_conversations_subject",
+        # Búsqueda de tickets (search_tickets): MATCH(subject) AGAINST (?)
+        "CREATE FULLTEXT INDEX ft_conversations_subject ON conversations (subject)",
+    ),
+    (
+        "threads",
+        "ft_threads_body",
+        # Búsqueda de tickets (search_tickets): MATCH(body) AGAINST (?)
+        "CREATE FULLTEXT INDEX ft_threads_body ON threads (body)",
+    ),
+]
+
+
+def _index_exists(cursor, table: str, index: str) -> bool:
+    cursor.execute("""
+        SELECT 1 FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+        LIMIT 1
+    """, (table, index))
+    return cursor.fetchone() is not None
+
+
+def pending_migrations() -> List[str]:
+    conn = get_freescout_db()._get_connection()
+    cursor = conn.cursor()
+    try:
+        return [index for table, index, _ in MIGRATIONS if not _index_exists(cursor, table, index)]
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def apply_migrations() -> List[str]:
+    """Crea los índices que falten. Retorna los nombres de los índices creados."""
+    conn = get_freescout_db()._get_connection()
+    cursor = conn.cursor()
+    applied = []
+    try:
+        for table, index, ddl in MIGRATIONS:
+            if _index_exists(cursor, table, index):
+                continue
+            print(f"🔧 Creando {index} en {table}...")
+            cursor.execute(ddl)
+            applied.append(index)
+        conn.commit()
+        return applied
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Índices de FreeScout usados por el chatbot")
+    parser.add_argument("--status", action="store_true", help="Solo mostrar las migraciones pendientes")
+    args = parser.parse_args()
+
+    if args.status:
+        pending = pending_migrations()
+        print("✅ Sin migraciones pendientes" if not pending else f"⏳ Pendientes: {', '.join(pending)}")
+        return
+
+    applied = apply_migrations()
+    print(f"✅ {len(applied)} migraciones aplicadas" if applied else "✅ La base de datos ya estaba al día")
+
+
+if __name__ == "__main__":
+    main()
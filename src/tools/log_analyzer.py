@@ -0,0 +1,328 @@
+"""
+⚠️ Análisis incremental de errores en logs del sistema (syslog)
+
+Releer /var/log/syslog entero en cada pregunta no escala con logs de gigabytes.
+LogAnalyzer solo lee los bytes añadidos desde la última vez:
+
+- Por cada fichero guarda (inode, offset) en un fichero de estado. Si el inode cambia
+  (rotación), primero termina de leer el fichero rotado (`<ruta>.1`) y después empieza
+  el nuevo desde el principio; si el fichero encoge (truncado), vuelve a empezar.
+- La parte nueva se lee con mmap, hasta la última línea completa.
+- Cada línea de error se reduce a una firma (números, IPs, ids y rutas sustituidos por
+  comodines) y se suma a un contador por ventana de tiempo (`bucket_seconds`).
+
+La lectura la hace un hilo de fondo cada `interval` segundos (`start()`); las consultas
+solo suman los contadores de las ventanas pedidas y no esperan a que termine una lectura
+en curso: no tocan los logs. Los contadores también se persisten, así que un reinicio no
+obliga a reescanear.
+"""
+import json
+import mmap
+import os
+import re
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from src.config import (
+    SYSTEM_LOG_FILES,
+    LOG_STATE_FILE,
+    LOG_BUCKET_SECONDS,
+    LOG_RETENTION_HOURS,
+    LOG_INITIAL_SCAN_BYTES,
+    LOG_UPDATE_INTERVAL,
+)
+
+# Palabras que marcan una línea como error
+ERROR_RE = re.compile(
+    r"\b(errors?|err|fail(ed|ure)?|fatal|crit(ical)?|panic|segfault|denied|timed? ?out|oom|out of memory|exception|traceback)\b",
+    re.IGNORECASE,
+)
+
+# "Jan  5 12:00:01 host proceso[123]: mensaje" (RFC 3164)
+BSD_LINE_RE = re.compile(r"^(?P<ts>[A-Z][a-z]{2} [ \d]\d \d\d:\d\d:\d\d) (?P<host>\S+) (?P<prog>[^:\[\s]+)(\[\d+\])?: (?P<msg>.*)$")
+# "2024-01-05T12:00:01.123456+01:00 host proceso[123]: mensaje" (RFC 5424 / rsyslog moderno)
+ISO_LINE_RE = re.compile(r"^(?P<ts>\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d(\.\d+)?([+-]\d\d:\d\d|Z)?) (?P<host>\S+) (?P<prog>[^:\[\s]+)(\[\d+\])?: (?P<msg>.*)$")
+
+# Partes variables de un mensaje que no deben separar dos errores iguales
+_SIGNATURE_SUBS = [
+    (re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}", re.IGNORECASE), "<uuid>"),
+    (re.compile(r"\b\d{1,3}(\.\d{1,3}){3}(:\d+)?\b"), "<ip>"),
+    (re.compile(r"\b0x[0-9a-f]+\b", re.IGNORECASE), "<hex>"),
+    (re.compile(r"\b[0-9a-f]{12,}\b", re.IGNORECASE), "<hex>"),
+    (re.compile(r"(/[\w.\-]+){2,}"), "<path>"),
+    (re.compile(r"\d+"), "<n>"),
+]
+
+# Bytes máximos procesados por fichero en cada actualización (acota cada pasada del hilo de fondo)
+MAX_READ_BYTES = 64 * 1024 * 1024
+MAX_SAMPLE_LENGTH = 300
+
+
+def error_signature(program: str, message: str) -> str:
+    for pattern, replacement in _SIGNATURE_SUBS:
+        message = pattern.sub(replacement, message)
+    return f"{program}: {' '.join(message.split())[:200]}"
+
+
+def parse_line(line: str, now: datetime) -> Optional[Dict]:
+    """Extrae fecha, programa y mensaje de una línea de syslog (None si no es un error)"""
+    if not ERROR_RE.search(line):
+        return None
+    match = ISO_LINE_RE.match(line)
+    if match:
+        timestamp = datetime.fromisoformat(match["ts"].replace("Z", "+00:00")).timestamp()
+    else:
+        match = BSD_LINE_RE.match(line)
+        if not match:
+            return {"ts": now.timestamp(), "program": "?", "message": line.strip()}
+        # El formato BSD no lleva año: el del momento actual, o el anterior si quedaría en el futuro
+        parsed = datetime.strptime(f"{now.year} {match['ts']}", "%Y %b %d %H:%M:%S")
+        if parsed.timestamp() > now.timestamp() + 86400:
+            parsed = parsed.replace(year=now.year - 1)
+        timestamp = parsed.timestamp()
+    return {"ts": timestamp, "program": match["prog"], "message": match["msg"].strip()}
+
+
+class LogAnalyzer:
+    """
+    Índice de firmas de error por ventana de tiempo, alimentado de forma incremental.
+
+    Args:
+        paths: Ficheros de log a seguir (los que no existan se ignoran)
+        state_file: JSON donde se guardan offsets y contadores entre ejecuciones
+        bucket_seconds: Tamaño de cada ventana de agregación
+        retention_hours: Horas de contadores que se conservan
+        initial_scan_bytes: Al ver un fichero por primera vez, solo se leen sus últimos N bytes
+        interval: Segundos entre lecturas del hilo de fondo
+    """
+
+    def __init__(self, paths: List[str], state_file: Optional[str] = None, bucket_seconds: int = 300,
+                 retention_hours: float = 24, initial_scan_bytes: int = 50 * 1024 * 1024,
+                 interval: float = 30.0):
+        self.paths = paths
+        self.state_file = Path(state_file) if state_file else None
+        self.bucket_seconds = bucket_seconds
+        self.retention_seconds = retention_hours * 3600
+        self.initial_scan_bytes = initial_scan_bytes
+        self.interval = interval
+        # _lock protege los contadores (lo toman las consultas); _update_lock serializa las
+        # lecturas, que pueden tardar, sin bloquear a las consultas mientras tanto
+        self._lock = threading.Lock()
+        self._update_lock = threading.Lock()
+        self._thread_pid = None
+        self._stopping = threading.Event()
+        self.last_update: Optional[float] = None
+        self.last_error: Optional[str] = None
+        # {ruta: {"inode": int, "offset": int}}
+        self.offsets: Dict[str, Dict] = {}
+        # {inicio de ventana: {firma: contador}}
+        self.buckets: Dict[int, Counter] = {}
+        # {firma: {"sample", "program", "last_seen"}}
+        self.signatures: Dict[str, Dict] = {}
+        self._load_state()
+
+    # ---------- lectura incremental ----------
+
+    def start(self):
+        """Arranca el hilo que lee los logs en segundo plano (una vez por proceso)"""
+        # Tras un fork el hilo del padre no existe en el hijo: se arranca uno nuevo
+        if self._thread_pid == os.getpid():
+            return
+        with self._update_lock:
+            if self._thread_pid == os.getpid():
+                return
+            self._thread_pid = os.getpid()
+            # Un evento por hilo: un start() tras stop() no reactiva el hilo anterior
+            self._stopping = threading.Event()
+            threading.Thread(target=self._run, args=(self._stopping,), name="log-analyzer", daemon=True).start()
+
+    def stop(self):
+        """Detiene el hilo de fondo (termina la lectura en curso, si la hay)"""
+        self._stopping.set()
+        with self._update_lock:
+            self._thread_pid = None
+
+    def _run(self, stopping: threading.Event):
+        while not stopping.is_set():
+            try:
+                self.update()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+            stopping.wait(self.interval)
+
+    def update(self) -> int:
+        """Procesa las líneas nuevas de todos los ficheros. Retorna el número de bytes leídos."""
+        with self._update_lock:
+            read = sum(self._update_file(path) for path in self.paths)
+            with self._lock:
+                self._prune()
+                if read:
+                    self._save_state()
+            self.last_update = time.time()
+            return read
+
+    def _update_file(self, path: str) -> int:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return 0
+        state = self.offsets.get(path)
+        read = 0
+        if state is None:
+            offset = max(0, stat.st_size - self.initial_scan_bytes)
+            skip_partial = offset > 0
+        elif state["inode"] != stat.st_ino:
+            # Rotado: antes de pasar al fichero nuevo se termina el antiguo (lo escrito
+            # entre la última lectura y la rotación), que logrotate deja como `<ruta>.1`
+            read = self._finish_rotated(path, state)
+            offset, skip_partial = 0, False
+        elif stat.st_size < state["offset"]:
+            # Truncado (copytruncate): lo que hubiera tras la última lectura ya no existe
+            offset, skip_partial = 0, False
+        else:
+            offset, skip_partial = state["offset"], False
+
+        if stat.st_size > offset:
+            chunk, offset = self._read_range(path, offset, stat.st_size, skip_partial=skip_partial)
+            read += chunk
+        self.offsets[path] = {"inode": stat.st_ino, "offset": offset}
+        return read
+
+    def _finish_rotated(self, path: str, state: Dict) -> int:
+        rotated = f"{path}.1"
+        try:
+            stat = os.stat(rotated)
+        except OSError:
+            return 0
+        if stat.st_ino != state["inode"]:
+            # Ya ha rotado más de una vez (o comprimido): lo que faltaba no se puede recuperar
+            return 0
+        offset, read = state["offset"], 0
+        while offset < stat.st_size:
+            chunk, offset = self._read_range(rotated, offset, stat.st_size, complete=True)
+            read += chunk
+        return read
+
+    def _read_range(self, path: str, offset: int, size: int, skip_partial: bool = False,
+                    complete: bool = False) -> tuple:
+        """
+        Procesa las líneas entre `offset` y `size` (como mucho MAX_READ_BYTES).
+        Con complete=True el fichero ya no crece: su última línea cuenta aunque no acabe en salto.
+        Retorna (bytes leídos, nuevo offset).
+        """
+        end = min(size, offset + MAX_READ_BYTES)
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if skip_partial:
+                # Empezar en la primera línea completa
+                newline = data.find(b"\n", offset, end)
+                offset = newline + 1 if newline != -1 else end
+            if complete and end == size:
+                stop = end
+            else:
+                # Solo hasta la última línea completa: el resto se leerá cuando termine de escribirse
+                last_newline = data.rfind(b"\n", offset, end)
+                stop = last_newline + 1 if last_newline != -1 else offset
+            if stop > offset:
+                self._ingest(data[offset:stop].decode("utf-8", errors="replace"))
+                return stop - offset, stop
+        # Línea más larga que MAX_READ_BYTES: se descarta para no quedarse atascado
+        read = end - offset if end - offset >= MAX_READ_BYTES else 0
+        return read, offset + read
+
+    def _ingest(self, text: str):
+        # El análisis de las líneas se hace fuera del lock; solo la suma a los contadores lo toma
+        now = datetime.now()
+        entries = []
+        for line in text.splitlines():
+            entry = parse_line(line, now)
+            if entry is not None:
+                entries.append((error_signature(entry["program"], entry["message"]), entry))
+        if not entries:
+            return
+        with self._lock:
+            for signature, entry in entries:
+                bucket = int(entry["ts"] // self.bucket_seconds * self.bucket_seconds)
+                self.buckets.setdefault(bucket, Counter())[signature] += 1
+                info = self.signatures.get(signature)
+                if info is None or entry["ts"] >= info["last_seen"]:
+                    self.signatures[signature] = {
+                        "sample": entry["message"][:MAX_SAMPLE_LENGTH],
+                        "program": entry["program"],
+                        "last_seen": entry["ts"],
+                    }
+
+    def _prune(self):
+        cutoff = time.time() - self.retention_seconds
+        for bucket in [b for b in self.buckets if b + self.bucket_seconds < cutoff]:
+            del self.buckets[bucket]
+        for signature in [s for s, info in self.signatures.items() if info["last_seen"] < cutoff]:
+            del self.signatures[signature]
+
+    # ---------- consultas ----------
+
+    def top_errors(self, window_seconds: float = 3600, limit: int = 10) -> List[Dict]:
+        """Firmas de error más frecuentes en la ventana indicada (sin leer los logs ni esperar a update)"""
+        since = time.time() - window_seconds
+        totals = Counter()
+        with self._lock:
+            for bucket, counts in self.buckets.items():
+                if bucket + self.bucket_seconds > since:
+                    totals.update(counts)
+            return [
+                {"signature": signature, "count": count, **self.signatures.get(signature, {})}
+                for signature, count in totals.most_common(limit)
+            ]
+
+    # ---------- estado persistido ----------
+
+    def _load_state(self):
+        if not self.state_file or not self.state_file.exists():
+            return
+        try:
+            state = json.loads(self.state_file.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        # Un cambio de tamaño de ventana invalida los contadores (no las posiciones)
+        self.offsets = state.get("offsets", {})
+        if state.get("bucket_seconds") == self.bucket_seconds:
+            self.buckets = {int(b): Counter(c) for b, c in state.get("buckets", {}).items()}
+            self.signatures = state.get("signatures", {})
+
+    def _save_state(self):
+        if not self.state_file:
+            return
+        state = {
+            "bucket_seconds": self.bucket_seconds,
+            "offsets": self.offsets,
+            "buckets": {str(b): dict(c) for b, c in self.buckets.items()},
+            "signatures": self.signatures,
+        }
+        self.state_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.state_file.with_suffix(".tmp")
+        tmp.write_text(json.dumps(state, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, self.state_file)
+
+
+_log_analyzer = None
+_analyzer_lock = threading.Lock()
+
+def get_log_analyzer() -> LogAnalyzer:
+    """Retorna el analizador compartido con los ficheros de SYSTEM_LOG_FILES"""
+    global _log_analyzer
+    if _log_analyzer is None:
+        with _analyzer_lock:
+            if _log_analyzer is None:
+                _log_analyzer = LogAnalyzer(
+                    SYSTEM_LOG_FILES,
+                    state_file=LOG_STATE_FILE,
+                    bucket_seconds=LOG_BUCKET_SECONDS,
+                    retention_hours=LOG_RETENTION_HOURS,
+                    initial_scan_bytes=LOG_INITIAL_SCAN_BYTES,
+                    interval=LOG_UPDATE_INTERVAL,
+                )
+    return _log_analyzer
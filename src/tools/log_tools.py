@@ -0,0 +1,43 @@
+"""
+⚠️ Log Tools - Errores recientes en los logs del sistema
+"""
+from datetime import datetime
+
+from langchain.tools import tool
+
+from src.tools.log_analyzer import get_log_analyzer
+
+
+@tool
+def get_recent_system_errors(hours: float = 1.0) -> str:
+    """
+    Muestra los errores más frecuentes de los logs del sistema en las últimas horas,
+    agrupados por tipo de error.
+    Útil cuando el usuario pregunta si hay errores recientes o por qué falla un servicio.
+
+    Args:
+        hours: Horas hacia atrás a revisar (por defecto 1)
+
+    Returns:
+        Lista de los errores más frecuentes con su número de apariciones y un ejemplo
+    """
+    try:
+        analyzer = get_log_analyzer()
+        # Los logs los lee un hilo de fondo: la consulta solo suma los contadores en memoria
+        analyzer.start()
+        top = analyzer.top_errors(window_seconds=hours * 3600, limit=10)
+
+        if not top and analyzer.last_update is None:
+            return "⏳ Se están leyendo los logs del sistema por primera vez; vuelve a preguntar en unos segundos."
+        if not top:
+            return f"✅ No se han encontrado errores en los logs del sistema en las últimas {hours:g} horas."
+
+        result = f"⚠️ **Errores del sistema (últimas {hours:g} horas)**\n\n"
+        for i, error in enumerate(top, 1):
+            last_seen = datetime.fromtimestamp(error["last_seen"]).strftime("%d/%m %H:%M") if "last_seen" in error else "?"
+            result += f"{i}. **{error.get('program', '?')}** — {error['count']} veces (última: {last_seen})\n"
+            result += f"   `{error.get('sample', error['signature'])}`\n"
+        return result
+
+    except Exception as e:
+        return f"❌ Error al analizar los logs del sistema: {str(e)}"
@@ -0,0 +1,325 @@
+"""
+🔎 Índice de embeddings de tickets abiertos (búsqueda de tickets similares)
+
+Antes de crear un ticket, el agente busca si ya hay uno abierto sobre el mismo
+problema. Comparar texto en MySQL no escala, así que se mantiene en memoria una
+matriz de embeddings de `asunto + primer mensaje` de los tickets no cerrados:
+
+- Construcción inicial: se recorre conversations por el índice (updated_at, id)
+  en páginas y se calculan los embeddings por lotes.
+- Actualización incremental: un hilo lee solo las filas modificadas desde la última
+  marca (la misma consulta que el feed de tickets). Si el texto no cambió, solo se
+  actualiza el estado; los tickets cerrados, el spam, los borradores y los borrados
+  salen del índice.
+- El índice se guarda en disco (vectores + metadatos + marca en un solo fichero que
+  se publica con os.replace), así que al reiniciar solo se procesan los cambios desde
+  entonces. Con varios workers comparten el fichero, pero solo escribe el que tiene
+  el lock `writer.lock`; los demás lo leen al arrancar y se actualizan en memoria.
+
+Las búsquedas no tocan MySQL: producto escalar contra la matriz en memoria.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from src.config import (
+    EMBEDDING_MODEL,
+    TICKET_INDEX_ENABLED,
+    TICKET_INDEX_PATH,
+    TICKET_INDEX_REFRESH_SECONDS,
+)
+from src.tools.freescout_integration import STATE_PUBLISHED, get_freescout_db
+from src.tools.ticket_spool import try_lock
+from src.tools.ticket_watcher import OVERLAP, PAGE_SIZE
+
+# Estados que no son tickets abiertos de verdad: no se proponen como similares
+EXCLUDED_STATUSES = {"Cerrado", "Spam"}
+MAX_DESCRIPTION_CHARS = 1000
+INDEX_FILE = "index.npz"
+
+
+def is_indexable(row: Dict) -> bool:
+    """Solo conversaciones publicadas (ni borradores ni borradas) que no estén cerradas ni sean spam"""
+    return row["status"] not in EXCLUDED_STATUSES and row.get("state", STATE_PUBLISHED) == STATE_PUBLISHED
+
+
+def ticket_text(subject: str, description: str) -> str:
+    """Texto que se convierte en embedding: asunto y comienzo del primer mensaje"""
+    return f"{subject or ''}\n{(description or '')[:MAX_DESCRIPTION_CHARS]}".strip()
+
+
+def _text_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class TicketIndex:
+    """
+    Embeddings de los tickets abiertos, actualizados de forma incremental.
+
+    Args:
+        db: FreeScoutDB (o un sustituto con get_ticket_changes)
+        embeddings: Modelo de embeddings de LangChain (embed_documents / embed_query)
+        path: Directorio donde se persiste el índice (None = solo en memoria)
+        refresh_interval: Segundos entre lecturas de cambios en el hilo de fondo
+    """
+
+    def __init__(self, db, embeddings, path: Optional[str] = None, refresh_interval: float = 5.0):
+        self.db = db
+        self.embeddings = embeddings
+        self.path = Path(path) if path else None
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._vectors: Optional[np.ndarray] = None
+        self._tickets: List[Dict] = []
+        self._positions: Dict[int, int] = {}
+        self._watermark = None
+        self._thread_pid = None
+        self._writer_lock = None
+        self._writer_pid = None
+        self.ready = False
+        self.last_error: Optional[str] = None
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self._tickets)
+
+    # ---------- actualización ----------
+
+    def start(self):
+        # Tras un fork el hilo del padre no existe en el hijo: se arranca uno nuevo
+        if self._thread_pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread_pid == os.getpid():
+                return
+            self._thread_pid = os.getpid()
+            threading.Thread(target=self._run, name="ticket-index", daemon=True).start()
+
+    def _run(self):
+        while True:
+            try:
+                self.refresh()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+            time.sleep(self.refresh_interval)
+
+    def refresh(self) -> int:
+        """Aplica los cambios desde la última marca (todo, la primera vez). Retorna las filas leídas."""
+        with self._refresh_lock:
+            first_build = self._watermark is None
+            started = time.perf_counter()
+            if first_build:
+                rows = self.db.get_ticket_changes("1970-01-01 00:00:00", 0, PAGE_SIZE)
+            else:
+                rows = self.db.get_ticket_changes(self._watermark[0] - OVERLAP, 0, PAGE_SIZE)
+            total = changed = 0
+            while rows:
+                total += len(rows)
+                changed += self._apply_page(rows)
+                last = rows[-1]
+                if self._watermark is None or (last["updated_at"], last["ticket_id"]) > self._watermark:
+                    self._watermark = (last["updated_at"], last["ticket_id"])
+                if len(rows) < PAGE_SIZE:
+                    break
+                rows = self.db.get_ticket_changes(last["updated_at"], last["ticket_id"], PAGE_SIZE)
+            if first_build:
+                print(f"🔎 Índice de tickets construido: {len(self)} abiertos en {time.perf_counter() - started:.1f}s")
+            if changed or first_build:
+                self._save()
+            self.ready = True
+            return total
+
+    def _apply_page(self, rows: List[Dict]) -> int:
+        """Aplica una página de cambios. Solo calcula embeddings de los textos nuevos o modificados."""
+        latest: Dict[int, Dict] = {}
+        for row in rows:
+            latest[row["number"]] = row
+        to_embed, texts = [], []
+        with self._lock:
+            for number, row in latest.items():
+                position = self._positions.get(number)
+                current = self._tickets[position] if position is not None else None
+                if current is not None and row["updated_at"] < current["updated_at"]:
+                    continue
+                if not is_indexable(row):
+                    continue
+                text = ticket_text(row["subject"], row.get("description"))
+                if current is None or current["text_hash"] != _text_hash(text):
+                    to_embed.append(row)
+                    texts.append(text)
+        vectors = _normalize(np.asarray(self.embeddings.embed_documents(texts), dtype=np.float32)) if texts else None
+
+        changed = 0
+        with self._lock:
+            embedded = {row["number"]: i for i, row in enumerate(to_embed)}
+            for number, row in latest.items():
+                position = self._positions.get(number)
+                current = self._tickets[position] if position is not None else None
+                if current is not None and row["updated_at"] < current["updated_at"]:
+                    continue
+                if not is_indexable(row):
+                    if position is not None:
+                        self._remove(position)
+                        changed += 1
+                    continue
+                meta = {
+                    "number": number,
+                    "ticket_id": row["ticket_id"],
+                    "subject": row["subject"],
+                    "status": row["status"],
+                    "updated_at": row["updated_at"],
+                    "text_hash": _text_hash(ticket_text(row["subject"], row.get("description"))),
+                }
+                if number in embedded:
+                    self._put(meta, vectors[embedded[number]])
+                    changed += 1
+                elif current is not None:
+                    changed += current["status"] != meta["status"]
+                    self._tickets[position] = meta
+        return changed
+
+    def _put(self, meta: Dict, vector: np.ndarray):
+        position = self._positions.get(meta["number"])
+        if position is None:
+            position = len(self._tickets)
+            if self._vectors is None:
+                self._vectors = np.zeros((64, len(vector)), dtype=np.float32)
+            elif position == len(self._vectors):
+                # La matriz crece al doble para que añadir tickets sea O(1) amortizado
+                grown = np.zeros((2 * len(self._vectors), self._vectors.shape[1]), dtype=np.float32)
+                grown[:position] = self._vectors[:position]
+                self._vectors = grown
+            self._tickets.append(meta)
+            self._positions[meta["number"]] = position
+        else:
+            self._tickets[position] = meta
+        self._vectors[position] = vector
+
+    def _remove(self, position: int):
+        # Se mueve la última fila al hueco para no desplazar la matriz
+        last = len(self._tickets) - 1
+        removed = self._tickets[position]
+        if position != last:
+            self._vectors[position] = self._vectors[last]
+            self._tickets[position] = self._tickets[last]
+            self._positions[self._tickets[position]["number"]] = position
+        self._tickets.pop()
+        del self._positions[removed["number"]]
+
+    # ---------- consultas ----------
+
+    def similar(self, query: str, k: int = 5, min_score: float = 0.0,
+                exclude: Optional[List[int]] = None) -> List[Dict]:
+        """Los k tickets abiertos más parecidos a `query` (con su score), de mayor a menor"""
+        self.start()
+        query_vector = _normalize(np.asarray(self.embeddings.embed_query(query), dtype=np.float32))
+        exclude = set(exclude or [])
+        with self._lock:
+            count = len(self._tickets)
+            if count == 0:
+                return []
+            scores = self._vectors[:count] @ query_vector
+            take = min(count, k + len(exclude))
+            candidates = np.argpartition(-scores, take - 1)[:take]
+            results = []
+            for i in candidates[np.argsort(-scores[candidates])]:
+                ticket = self._tickets[i]
+                if scores[i] < min_score or ticket["number"] in exclude:
+                    continue
+                results.append({**ticket, "score": float(scores[i])})
+                if len(results) == k:
+                    break
+            return results
+
+    # ---------- persistencia ----------
+
+    def _load(self):
+        if not self.path or not (self.path / INDEX_FILE).exists():
+            return
+        try:
+            with np.load(self.path / INDEX_FILE) as data:
+                meta = json.loads(str(data["meta"]))
+                vectors = data["vectors"]
+        except (OSError, ValueError, KeyError):
+            return
+        if meta.get("embedding_model") != EMBEDDING_MODEL or not meta.get("watermark"):
+            return
+        tickets = meta["tickets"]
+        for ticket in tickets:
+            ticket["updated_at"] = datetime.fromisoformat(ticket["updated_at"])
+        self._tickets = tickets
+        self._positions = {t["number"]: i for i, t in enumerate(tickets)}
+        self._vectors = vectors if len(vectors) else None
+        self._watermark = (datetime.fromisoformat(meta["watermark"][0]), meta["watermark"][1])
+        self.ready = True
+
+    def _is_writer(self) -> bool:
+        """Solo un proceso escribe el índice: el que consigue el lock (se libera solo si muere)"""
+        if self._writer_pid != os.getpid():
+            # Tras un fork el hijo hereda el fichero del lock del padre: no cuenta como suyo
+            self._writer_lock = None
+            self._writer_pid = os.getpid()
+        if self._writer_lock is None:
+            self.path.mkdir(parents=True, exist_ok=True)
+            self._writer_lock = try_lock(self.path / "writer.lock")
+        return self._writer_lock is not None
+
+    def _save(self):
+        if not self.path or not self._is_writer():
+            return
+        with self._lock:
+            count = len(self._tickets)
+            vectors = self._vectors[:count].copy() if self._vectors is not None else np.zeros((0, 0), np.float32)
+            tickets = [{**t, "updated_at": t["updated_at"].isoformat()} for t in self._tickets]
+        watermark = [self._watermark[0].isoformat(), self._watermark[1]] if self._watermark else None
+        meta = {"embedding_model": EMBEDDING_MODEL, "watermark": watermark, "tickets": tickets}
+        # Vectores y metadatos en un único fichero con nombre temporal propio: un solo os.replace
+        # los publica juntos, así que un lector nunca ve vectores de una versión y meta de otra
+        tmp = self.path / f"{INDEX_FILE}.tmp-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        try:
+            with open(tmp, "wb") as f:
+                np.savez(f, vectors=vectors, meta=np.array(json.dumps(meta, ensure_ascii=False)))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path / INDEX_FILE)
+        finally:
+            if tmp.exists():
+                tmp.unlink()
+
+
+_ticket_index = None
+_index_lock = threading.Lock()
+
+def get_ticket_index() -> Optional[TicketIndex]:
+    """Retorna el índice compartido (arranca su hilo), o None si TICKET_INDEX_ENABLED=false"""
+    global _ticket_index
+    if not TICKET_INDEX_ENABLED:
+        return None
+    if _ticket_index is None:
+        with _index_lock:
+            if _ticket_index is None:
+                from src.rag.rag_retriever import get_embeddings
+                _ticket_index = TicketIndex(
+                    get_freescout_db(),
+                    get_embeddings(),
+                    path=TICKET_INDEX_PATH,
+                    refresh_interval=TICKET_INDEX_REFRESH_SECONDS,
+                )
+    _ticket_index.start()
+    return _ticket_index
@@ -0,0 +1,373 @@
+"""
+📮 Creación de tickets en diferido (write-behind) con spool local duradero
+
+`create_support_ticket` bloqueaba el turno del agente con 7 sentencias MySQL y, si
+FreeScout no respondía, el usuario solo recibía un error. En modo write-behind:
+
+1. La herramienta guarda el ticket en un spool local (append-only, fsync) y confirma
+   al usuario al instante con una referencia (ej: REF-1A2B3C4D).
+2. Un hilo lo crea en FreeScout y, si la base de datos no está disponible, reintenta
+   con espera creciente. Al crearse, avisa a la sesión con el número definitivo.
+   Un error permanente (datos, esquema, sin buzones...) no bloquea la cola: el ticket
+   pasa a `dead-letter.jsonl` y se avisa a la sesión.
+3. Al reiniciar, los tickets pendientes del spool se vuelven a enviar.
+
+Idempotencia: cada ticket lleva una clave que se guarda en `threads.message_id`.
+Antes de insertar se busca esa clave, en la misma transacción y con la fila del buzón
+bloqueada (SELECT … FOR UPDATE), así que un reintento tras un corte (ticket creado
+pero sin confirmar en el spool) nunca crea un duplicado, ni aunque coincida con otro.
+
+Cada proceso escribe en su propio segmento `spool-<n>.jsonl`, protegido por un lock
+del sistema operativo que se libera solo si el proceso muere. Los segmentos cuyo
+lock está libre (proceso caído) los adopta otro proceso y envía sus pendientes.
+El segmento se reescribe solo con los pendientes cuando se vacía o cuando la mayoría
+de sus líneas ya están resueltas, así que no crece mientras el proceso sigue vivo.
+"""
+import json
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from src.config import (
+    TICKET_WRITE_BEHIND,
+    TICKET_SPOOL_DIR,
+    TICKET_SPOOL_RETRY_SECONDS,
+)
+from src.tools.freescout_integration import get_freescout_db, is_retryable_error
+
+MAX_SEGMENTS = 32
+# Líneas a partir de las cuales un segmento se compacta si más de la mitad ya están resueltas
+COMPACT_MIN_RECORDS = 1000
+MAX_RETRY_SECONDS = 60.0
+# Tickets que FreeScout rechaza por un error permanente (no se reintentan)
+DEAD_LETTER_FILE = "dead-letter.jsonl"
+
+
+def try_lock(path: Path):
+    """Lock exclusivo no bloqueante sobre `path`. Retorna el fichero abierto o None si está cogido."""
+    f = open(path, "a+b")
+    try:
+        if os.name == "nt":
+            import msvcrt
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return f
+    except OSError:
+        f.close()
+        return None
+
+
+class SpoolSegment:
+    """Un fichero del spool. Solo lo usa el proceso que tiene su lock."""
+
+    def __init__(self, path: Path, lock_file):
+        self.path = path
+        self._lock_file = lock_file
+        self.pending: "OrderedDict[str, Dict]" = OrderedDict()
+        self._replay()
+        self._compact()
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def _replay(self):
+        if not self.path.exists():
+            return
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Última línea a medias por un corte: ese ticket no llegó a confirmarse
+                    continue
+                if record["op"] == "reserve":
+                    self.pending[record["key"]] = record
+                elif record["op"] == "done":
+                    self.pending.pop(record["key"], None)
+
+    def _compact(self):
+        """Reescribe el segmento solo con los pendientes (lo ya creado no hace falta)"""
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            for record in self.pending.values():
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        self.records = len(self.pending)
+
+    def append(self, record: Dict):
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.records += 1
+        if record["op"] == "reserve":
+            self.pending[record["key"]] = record
+        elif record["op"] == "done":
+            self.pending.pop(record["key"], None)
+            if not self.pending or (self.records >= COMPACT_MIN_RECORDS and self.records > 2 * len(self.pending)):
+                self._rewrite()
+
+    def _rewrite(self):
+        # Un corte a mitad deja el segmento anterior o el compactado, nunca uno a medias
+        self._file.close()
+        self._compact()
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def close(self):
+        self._file.close()
+        self._lock_file.close()
+
+
+class TicketSpool:
+    """Conjunto de segmentos del directorio de spool: uno propio y los adoptados"""
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.own = None
+        for n in range(MAX_SEGMENTS):
+            segment = self._open_segment(n)
+            if segment is not None:
+                self.own = segment
+                break
+        if self.own is None:
+            raise RuntimeError(f"Todos los segmentos de {self.directory} están en uso")
+
+    def _open_segment(self, n: int) -> Optional[SpoolSegment]:
+        lock_file = try_lock(self.directory / f"spool-{n}.lock")
+        if lock_file is None:
+            return None
+        return SpoolSegment(self.directory / f"spool-{n}.jsonl", lock_file)
+
+    def dead_letter(self, record: Dict, error: str):
+        """Guarda un ticket rechazado. Varios procesos pueden escribir: cada línea va en un solo write con O_APPEND."""
+        line = json.dumps({**record, "op": "dead", "error": error,
+                           "failed_at": datetime.now().isoformat(timespec="seconds")}, ensure_ascii=False)
+        fd = os.open(self.directory / DEAD_LETTER_FILE, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        try:
+            os.write(fd, (line + "\n").encode("utf-8"))
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def adopt_orphans(self) -> List[SpoolSegment]:
+        """Segmentos con pendientes cuyo proceso ya no existe (su lock estaba libre)"""
+        adopted = []
+        for path in sorted(self.directory.glob("spool-*.jsonl")):
+            n = int(path.stem.split("-")[1])
+            if self.own.path == path:
+                continue
+            segment = self._open_segment(n)
+            if segment is None:
+                continue
+            if segment.pending:
+                adopted.append(segment)
+            else:
+                segment.close()
+        return adopted
+
+
+class TicketWriteBehind:
+    """
+    Recibe tickets, los guarda en el spool y los crea en FreeScout en segundo plano.
+
+    Args:
+        db: FreeScoutDB (create_ticket con idempotency_key)
+        spool: TicketSpool del proceso
+        retry_delay: Espera inicial entre reintentos si FreeScout falla (se duplica hasta 60 s)
+    """
+
+    def __init__(self, db, spool: TicketSpool, retry_delay: float = 5.0):
+        self.db = db
+        self.spool = spool
+        self.retry_delay = retry_delay
+        self._segments: List[SpoolSegment] = [spool.own]
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        # Un solo flush a la vez: dos en paralelo enviarían el mismo pendiente
+        self._flush_lock = threading.Lock()
+        self._thread_pid = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self.last_error: Optional[str] = None
+
+    def submit(self, subject: str, body: str, priority: int = 2,
+               customer_email: Optional[str] = None, session_id: Optional[str] = None) -> Dict:
+        """Guarda el ticket de forma duradera y retorna su registro (con la referencia para el usuario)"""
+        key = uuid.uuid4().hex
+        record = {
+            "op": "reserve",
+            "key": key,
+            "reference": f"REF-{key[:8].upper()}",
+            "subject": subject,
+            "body": body,
+            "priority": priority,
+            "customer_email": customer_email,
+            "session_id": session_id,
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+        }
+        with self._lock:
+            self.spool.own.append(record)
+            self._wakeup.notify()
+        self.start()
+        return record
+
+    @property
+    def pending_count(self) -> int:
+        with self._lock:
+            return sum(len(segment.pending) for segment in self._segments)
+
+    def start(self):
+        # Tras un fork el hilo del padre no existe en el hijo: se arranca uno nuevo
+        if self._thread_pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread_pid == os.getpid():
+                return
+            self._thread_pid = os.getpid()
+            # Un evento por hilo: un start() tras stop() no reactiva el hilo anterior
+            self._stopping = threading.Event()
+            self._thread = threading.Thread(target=self._run, args=(self._stopping,),
+                                            name="ticket-write-behind", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Detiene el hilo de fondo (termina el envío en curso); lo pendiente sigue en el spool"""
+        with self._lock:
+            self._stopping.set()
+            self._wakeup.notify_all()
+            thread, self._thread, self._thread_pid = self._thread, None, None
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+
+    def close(self):
+        """Detiene el hilo y cierra los segmentos (sus locks quedan libres para otro proceso)"""
+        self.stop()
+        with self._lock:
+            for segment in self._segments:
+                segment.close()
+            self._segments = []
+
+    def _next_pending(self):
+        with self._lock:
+            for segment in self._segments:
+                for record in segment.pending.values():
+                    return segment, record
+        return None
+
+    def flush(self) -> int:
+        """
+        Intenta crear todos los pendientes en orden. Retorna cuántos se procesaron.
+        Para (lanzando la excepción) al primer error de conexión; los errores permanentes
+        mandan el ticket a dead-letter y se sigue con el siguiente.
+        """
+        with self._flush_lock:
+            return self._flush()
+
+    def _flush(self) -> int:
+        processed = 0
+        while True:
+            item = self._next_pending()
+            if item is None:
+                return processed
+            segment, record = item
+            kwargs = {"customer_email": record["customer_email"]} if record.get("customer_email") else {}
+            try:
+                result = self.db.create_ticket(record["subject"], record["body"], priority=record["priority"],
+                                               idempotency_key=record["key"], **kwargs)
+            except Exception as e:
+                if isinstance(e, ConnectionError) or is_retryable_error(e):
+                    raise
+                result = {"success": False, "error": str(e), "retryable": False}
+            if not result["success"]:
+                if result.get("retryable"):
+                    raise ConnectionError(result.get("error", "Error desconocido"))
+                self._reject(segment, record, result.get("error", "Error desconocido"))
+            else:
+                with self._lock:
+                    segment.append({"op": "done", "key": record["key"],
+                                    "number": result["number"], "ticket_id": result["ticket_id"]})
+                self._notify_session(record, result)
+            processed += 1
+
+    def _reject(self, segment: SpoolSegment, record: Dict, error: str):
+        # Primero dead-letter y después "done": si se corta entre medias, se reintenta (no se pierde)
+        self.spool.dead_letter(record, error)
+        with self._lock:
+            segment.append({"op": "done", "key": record["key"], "error": error})
+        print(f"❌ Ticket {record['reference']} descartado (ver {DEAD_LETTER_FILE}): {error}")
+        from src.tools.ticket_watcher import get_ticket_watcher
+        watcher = get_ticket_watcher()
+        if watcher is not None and record.get("session_id"):
+            watcher.notify(record["session_id"],
+                           f"❌ No se pudo registrar tu ticket {record['reference']} ({record['subject']}) "
+                           f"en FreeScout: {error}. Por favor, contacta directamente con IT.")
+
+    def _notify_session(self, record: Dict, result: Dict):
+        from src.tools.ticket_watcher import get_ticket_watcher
+        watcher = get_ticket_watcher()
+        if watcher is None or not record.get("session_id"):
+            return
+        watcher.notify(record["session_id"],
+                       f"✅ Tu ticket {record['reference']} ({record['subject']}) ya está registrado "
+                       f"en FreeScout como **#{result['number']}**.")
+        watcher.follow(result["number"], record["session_id"])
+
+    def _adopt_orphans(self):
+        adopted = self.spool.adopt_orphans()
+        if adopted:
+            with self._lock:
+                self._segments.extend(adopted)
+
+    def _release_adopted(self):
+        with self._lock:
+            for segment in self._segments[1:]:
+                if not segment.pending:
+                    segment.close()
+            self._segments = [self._segments[0]] + [s for s in self._segments[1:] if s.pending]
+
+    def _run(self, stopping: threading.Event):
+        delay = self.retry_delay
+        while not stopping.is_set():
+            try:
+                self._adopt_orphans()
+                processed = self.flush()
+                self._release_adopted()
+                if processed:
+                    print(f"📮 {processed} tickets en diferido procesados")
+                self.last_error = None
+                delay = self.retry_delay
+                with self._lock:
+                    if not stopping.is_set() and not any(segment.pending for segment in self._segments):
+                        self._wakeup.wait(self.retry_delay)
+            except Exception as e:
+                if stopping.is_set():
+                    return
+                if self.last_error is None:
+                    print(f"⚠️ FreeScout no disponible, {self.pending_count} tickets en espera: {e}")
+                self.last_error = str(e)
+                stopping.wait(delay)
+                delay = min(delay * 2, MAX_RETRY_SECONDS)
+
+
+_ticket_writer = None
+_writer_lock = threading.Lock()
+
+def get_ticket_writer() -> Optional[TicketWriteBehind]:
+    """Retorna el writer compartido (y reenvía lo pendiente del spool), o None si TICKET_WRITE_BEHIND=false"""
+    global _ticket_writer
+    if not TICKET_WRITE_BEHIND:
+        return None
+    if _ticket_writer is None:
+        with _writer_lock:
+            if _ticket_writer is None:
+                _ticket_writer = TicketWriteBehind(get_freescout_db(), TicketSpool(TICKET_SPOOL_DIR),
+                                                   retry_delay=TICKET_SPOOL_RETRY_SECONDS)
+    _ticket_writer.start()
+    return _ticket_writer
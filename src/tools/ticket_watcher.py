@@ -0,0 +1,239 @@
+"""
+🔔 Feed de cambios de tickets de FreeScout
+
+Un hilo consulta cada pocos segundos las conversaciones modificadas desde la última
+marca (updated_at, id) con una sola consulta por índice, y mantiene en memoria el
+estado de los tickets recientes. Así:
+
+- `get_ticket_status` responde desde memoria mientras el feed esté al día
+  (antigüedad máxima TICKET_MAX_STALENESS); si no, consulta MySQL como antes.
+- Los cambios de estado o las respuestas nuevas en tickets que una sesión de chat
+  ha creado o consultado se encolan como avisos para esa sesión.
+"""
+import contextvars
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from datetime import timedelta
+from typing import Dict, List, Optional
+
+from src.config import (
+    TICKET_WATCHER_ENABLED,
+    TICKET_WATCH_INTERVAL,
+    TICKET_MAX_STALENESS,
+    TICKET_SNAPSHOT_SIZE,
+)
+from src.tools.freescout_integration import get_freescout_db
+
+# Sesión de chat que está ejecutando el turno actual (la fija la interfaz o la API)
+current_session: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("chat_session", default=None)
+
+# updated_at tiene resolución de segundos: una fila del mismo segundo que la marca pero
+# confirmada más tarde quedaría detrás de ella; se relee este margen en cada consulta
+OVERLAP = timedelta(seconds=2)
+PAGE_SIZE = 500
+MAX_SESSIONS = 1000
+MAX_NOTIFICATIONS_PER_SESSION = 20
+
+
+@contextmanager
+def session_scope(session_id: Optional[str]):
+    """Asocia el turno actual a una sesión de chat (para seguir sus tickets)"""
+    token = current_session.set(session_id)
+    try:
+        yield
+    finally:
+        current_session.reset(token)
+
+
+class TicketWatcher:
+    """
+    Snapshot en memoria de los tickets recientes, actualizado por un feed de cambios.
+
+    Args:
+        db: FreeScoutDB (o un sustituto con get_change_watermark / get_ticket_changes)
+        interval: Segundos entre consultas del feed
+        max_staleness: Antigüedad máxima del snapshot para responder desde memoria
+        max_tickets: Tickets que se conservan en memoria (los menos usados se descartan)
+    """
+
+    def __init__(self, db, interval: float = 5.0, max_staleness: float = 15.0, max_tickets: int = 10000):
+        self.db = db
+        self.interval = interval
+        self.max_staleness = max_staleness
+        self.max_tickets = max_tickets
+        self._lock = threading.Lock()
+        self._poll_lock = threading.Lock()
+        self._tickets: "OrderedDict[int, Dict]" = OrderedDict()
+        self._watermark = None
+        self._followers: Dict[int, set] = {}
+        self._notifications: "OrderedDict[str, deque]" = OrderedDict()
+        self._thread_pid = None
+        self.last_poll: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    # ---------- feed ----------
+
+    def start(self):
+        # Tras un fork el hilo del padre no existe en el hijo: se arranca uno nuevo
+        if self._thread_pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread_pid == os.getpid():
+                return
+            self._thread_pid = os.getpid()
+            threading.Thread(target=self._run, name="ticket-watcher", daemon=True).start()
+
+    def _run(self):
+        while True:
+            try:
+                self.poll()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+            time.sleep(self.interval)
+
+    def poll(self) -> int:
+        """Aplica los cambios desde la última marca. Retorna el número de filas leídas."""
+        # Dos consultas solapadas podrían aplicar una fila antigua después de una nueva
+        with self._poll_lock:
+            return self._poll()
+
+    def _poll(self) -> int:
+        started = time.time()
+        if self._watermark is None:
+            # Primer arranque: solo interesan los cambios a partir de ahora
+            self._watermark = self.db.get_change_watermark() or (None, 0)
+            self.last_poll = started
+            return 0
+        if self._watermark[0] is None:
+            # Tabla vacía al arrancar: cualquier fila es nueva
+            rows = self.db.get_ticket_changes("1970-01-01 00:00:00", 0, PAGE_SIZE)
+        else:
+            rows = self.db.get_ticket_changes(self._watermark[0] - OVERLAP, 0, PAGE_SIZE)
+        total = 0
+        while rows:
+            total += len(rows)
+            for row in rows:
+                self._apply(row)
+            last = rows[-1]
+            if self._watermark[0] is None or (last["updated_at"], last["ticket_id"]) > self._watermark:
+                self._watermark = (last["updated_at"], last["ticket_id"])
+            if len(rows) < PAGE_SIZE:
+                break
+            rows = self.db.get_ticket_changes(last["updated_at"], last["ticket_id"], PAGE_SIZE)
+        self.last_poll = started
+        return total
+
+    def _apply(self, row: Dict):
+        number = row["number"]
+        with self._lock:
+            previous = self._tickets.get(number)
+            if previous is not None and row["updated_at"] < previous["updated_at"]:
+                return
+            self._remember(row)
+            if previous is None or number not in self._followers:
+                return
+            changes = []
+            if row["status"] != previous["status"]:
+                changes.append(f"ha pasado a **{row['status']}**")
+            # Solo mensajes publicados: las notas internas y los cambios de estado no son respuestas
+            if "messages_count" in previous and row["messages_count"] > previous["messages_count"]:
+                changes.append("tiene una respuesta nueva")
+            if changes:
+                message = f"🔔 El ticket #{number} ({row['subject']}) {' y '.join(changes)}."
+                for session_id in self._followers[number]:
+                    self._push(session_id, message)
+
+    def _remember(self, ticket: Dict):
+        self._tickets[ticket["number"]] = ticket
+        self._tickets.move_to_end(ticket["number"])
+        if len(self._tickets) <= self.max_tickets:
+            return
+        # Se descartan primero los menos usados sin seguidores: un ticket seguido se queda
+        # en memoria para poder comparar y avisar a su sesión
+        for number in list(self._tickets):
+            if len(self._tickets) <= self.max_tickets:
+                return
+            if number not in self._followers:
+                del self._tickets[number]
+        # Todos seguidos (más seguidos que max_tickets): no queda otra que soltar los más antiguos
+        while len(self._tickets) > self.max_tickets:
+            evicted, _ = self._tickets.popitem(last=False)
+            self._followers.pop(evicted, None)
+
+    def _push(self, session_id: str, message: str):
+        queue = self._notifications.get(session_id)
+        if queue is None:
+            queue = self._notifications[session_id] = deque(maxlen=MAX_NOTIFICATIONS_PER_SESSION)
+            if len(self._notifications) > MAX_SESSIONS:
+                self._notifications.popitem(last=False)
+        queue.append(message)
+
+    # ---------- consultas ----------
+
+    @property
+    def is_fresh(self) -> bool:
+        return self.last_poll is not None and time.time() - self.last_poll <= self.max_staleness
+
+    def get_ticket(self, number: int) -> Optional[Dict]:
+        """Estado del ticket desde memoria si el feed está al día; si no, desde MySQL"""
+        self.start()
+        with self._lock:
+            ticket = self._tickets.get(number)
+            if ticket is not None and self.is_fresh:
+                self._tickets.move_to_end(number)
+                return dict(ticket)
+        # Solo se guarda si el feed ya tenía marca antes de leer: los cambios posteriores le llegarán
+        feed_ready = self._watermark is not None
+        ticket = self.db.get_ticket_by_number(number)
+        if ticket is not None and feed_ready:
+            with self._lock:
+                # Si el feed ya trajo el ticket mientras tanto, su versión manda
+                if number not in self._tickets:
+                    self._remember(ticket)
+        return ticket
+
+    def follow(self, number: int, session_id: Optional[str] = None):
+        """Avisar a la sesión (por defecto la del turno actual) de los cambios del ticket"""
+        session_id = session_id or current_session.get()
+        if session_id is None:
+            return
+        self.start()
+        with self._lock:
+            self._followers.setdefault(number, set()).add(session_id)
+
+    def notify(self, session_id: str, message: str):
+        """Encola un aviso para la sesión (lo usan otros componentes, ej: tickets en diferido)"""
+        with self._lock:
+            self._push(session_id, message)
+
+    def drain_notifications(self, session_id: Optional[str]) -> List[str]:
+        """Retorna y vacía los avisos pendientes de la sesión"""
+        if session_id is None:
+            return []
+        with self._lock:
+            queue = self._notifications.pop(session_id, None)
+        return list(queue) if queue else []
+
+
+_ticket_watcher = None
+_watcher_lock = threading.Lock()
+
+def get_ticket_watcher() -> Optional[TicketWatcher]:
+    """Retorna el watcher compartido, o None si TICKET_WATCHER_ENABLED=false"""
+    global _ticket_watcher
+    if not TICKET_WATCHER_ENABLED:
+        return None
+    if _ticket_watcher is None:
+        with _watcher_lock:
+            if _ticket_watcher is None:
+                _ticket_watcher = TicketWatcher(
+                    get_freescout_db(),
+                    interval=TICKET_WATCH_INTERVAL,
+                    max_staleness=TICKET_MAX_STALENESS,
+                    max_tickets=TICKET_SNAPSHOT_SIZE,
+                )
+    return _ticket_watcher
@@ -0,0 +1,66 @@
+"""
+🧪 Test del modo batch con los backends falsos (LLM con guion, FreeScout en memoria)
+
+Comprueba que en modo solo lectura no se crea ningún ticket y que la llamada queda registrada.
+
+Uso:
+    python test_batch.py
+    python -m pytest test_batch.py
+"""
+import json
+import tempfile
+from pathlib import Path
+
+from langchain_core.documents import Document
+
+from src.agent.batch import run_batch
+from src.perf.fakes import offline_backends
+from src.rag.rag_retriever import doc_chunk_id
+
+
+def _count_tickets(db) -> int:
+    return db._conn.execute("SELECT COUNT(*) FROM conversations").fetchone()[0]
+
+
+def _run(workdir: Path, dry_run: bool):
+    queries = workdir / "consultas.jsonl"
+    queries.write_text(
+        json.dumps({"id": "1", "query": "Crea un ticket: la impresora no imprime"}) + "\n"
+        + json.dumps({"id": "2", "query": "¿Cómo me conecto a la VPN?"}) + "\n",
+        encoding="utf-8",
+    )
+    output = workdir / f"respuestas-{dry_run}.jsonl"
+    with offline_backends() as backends:
+        before = _count_tickets(backends.db)
+        run_batch(str(queries), str(output), concurrency=2, dry_run=dry_run)
+        created = _count_tickets(backends.db) - before
+    records = {r["id"]: r for r in map(json.loads, output.read_text(encoding="utf-8").splitlines())}
+    return records, created
+
+
+def test_dry_run_records_side_effects_without_running_them():
+    workdir = Path(tempfile.mkdtemp(prefix="batch_test_"))
+    records, created = _run(workdir, dry_run=True)
+    assert created == 0
+    assert [c["name"] for c in records["1"]["skipped_tool_calls"]] == ["create_support_ticket"]
+    assert records["1"]["skipped_tool_calls"][0]["args"]["subject"]
+    # Fragmentos distintos del mismo documento no comparten id
+    chunk_ids = records["2"]["chunk_ids"]
+    assert chunk_ids and len(set(chunk_ids)) == len(chunk_ids)
+
+    records, created = _run(workdir, dry_run=False)
+    assert created == 1 and records["1"]["skipped_tool_calls"] == []
+    print("✅ test_dry_run_records_side_effects_without_running_them")
+
+
+def test_chunk_id_without_store_id():
+    first = Document(page_content="VPN", metadata={"source": "manual.pdf", "page": 3, "start_index": 0})
+    second = Document(page_content="Correo", metadata={"source": "manual.pdf", "page": 3, "start_index": 900})
+    assert doc_chunk_id(first) == "manual.pdf#p3@0"
+    assert doc_chunk_id(second) == "manual.pdf#p3@900"
+    print("✅ test_chunk_id_without_store_id")
+
+
+if __name__ == "__main__":
+    test_dry_run_records_side_effects_without_running_them()
+    test_chunk_id_without_store_id()
@@ -0,0 +1,102 @@
+"""
+🧪 Test del filtro de chunks casi duplicados (MinHash + LSH) y de los ids de chunk
+
+Comprueba que se descartan los chunks casi idénticos y se conservan los distintos, y
+que los ids que asigna build_index no cambian al reconstruir el índice.
+
+Uso:
+    python test_dedup.py
+    python -m pytest test_dedup.py
+"""
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from src.perf.fakes import FIXTURE_MANUAL
+from src.rag.build_index import assign_chunk_ids
+from src.rag.dedup import MinHasher, NearDuplicateFilter, remove_near_duplicates
+from src.rag.ingest import iter_chunks
+
+VPN_STEPS = (
+    "Para conectarte a la VPN corporativa abre el cliente GlobalProtect, introduce la dirección "
+    "vpn.empresa.com, inicia sesión con tu usuario de dominio y acepta la notificación de doble "
+    "factor en el móvil. Si la conexión se corta cada pocos minutos, revisa que la hora del equipo "
+    "esté sincronizada y que no haya otra VPN instalada."
+)
+PRINTER_STEPS = (
+    "Si la impresora de planta no imprime, comprueba en el panel que no tenga atascos ni avisos de "
+    "tóner, elimina los trabajos pendientes de la cola de impresión desde Configuración y vuelve a "
+    "añadirla con la dirección IP que aparece en la etiqueta del equipo."
+)
+
+
+def _doc(text: str, page: int = 0) -> Document:
+    return Document(page_content=text, metadata={"source": "manual.pdf", "page": page})
+
+
+def test_near_duplicates_are_removed():
+    docs = [
+        _doc(VPN_STEPS),
+        _doc(PRINTER_STEPS),
+        _doc(VPN_STEPS.replace("pocos", "muy pocos"), page=3),  # la misma guía repetida en otro capítulo
+        _doc(VPN_STEPS, page=7),
+        _doc(PRINTER_STEPS.upper(), page=9),                     # mismas palabras, otra capitalización
+    ]
+    kept, removed = remove_near_duplicates(docs, threshold=0.8)
+    assert [doc.metadata["page"] for doc in kept] == [0, 0]
+    assert [doc.page_content for doc in kept] == [VPN_STEPS, PRINTER_STEPS]
+    assert removed == 3
+    print("✅ test_near_duplicates_are_removed")
+
+
+def test_distinct_chunks_are_kept():
+    dedup = NearDuplicateFilter(threshold=0.9)
+    # Comparten la plantilla pero cambia la mitad del contenido
+    texts = [
+        VPN_STEPS,
+        PRINTER_STEPS,
+        VPN_STEPS[:len(VPN_STEPS) // 2] + PRINTER_STEPS[len(PRINTER_STEPS) // 2:],
+        "Reinicia el equipo.",
+        "Reinicia el router.",
+    ]
+    assert [dedup.is_duplicate(text) for text in texts] == [False] * len(texts)
+    assert dedup.kept == len(texts) and dedup.removed == 0
+
+    # La firma solo depende del texto: otro hasher con la misma semilla da la misma
+    hasher = MinHasher()
+    assert (hasher.signature(VPN_STEPS) == MinHasher().signature(VPN_STEPS)).all()
+    print("✅ test_distinct_chunks_are_kept")
+
+
+def _chunk_manual():
+    pages = [_doc(text, page=number)
+             for number, text in enumerate(FIXTURE_MANUAL.read_text(encoding="utf-8").split("\n## "))]
+    splitter = RecursiveCharacterTextSplitter(chunk_size=300, chunk_overlap=50, add_start_index=True)
+    return pages, splitter
+
+
+def test_chunk_ids_are_stable_across_rebuilds():
+    pages, splitter = _chunk_manual()
+    first = [c.metadata["chunk_id"] for c in assign_chunk_ids(iter_chunks(pages, splitter))]
+    second = [c.metadata["chunk_id"] for c in assign_chunk_ids(iter_chunks(pages, splitter))]
+    assert first == second
+    assert len(first) > 1 and len(set(first)) == len(first)
+
+    # Indexar antes otro documento no cambia los ids del manual (no dependen de la posición)
+    rebuilt = [Document(page_content="Novedades de esta versión.", metadata={"source": "novedades.pdf", "page": 0})] + pages
+    by_content = {c.page_content: c.metadata["chunk_id"]
+                  for c in assign_chunk_ids(iter_chunks(rebuilt, splitter))}
+    original = {c.page_content: c.metadata["chunk_id"] for c in assign_chunk_ids(iter_chunks(pages, splitter))}
+    assert all(by_content[text] == chunk_id for text, chunk_id in original.items())
+
+    # Texto idéntico en la misma página: ids distintos pero reproducibles
+    repeated = [_doc("Aviso legal."), _doc("Aviso legal.")]
+    ids = [c.metadata["chunk_id"] for c in assign_chunk_ids(repeated)]
+    assert ids[1] == f"{ids[0]}-1"
+    assert [c.metadata["chunk_id"] for c in assign_chunk_ids([_doc("Aviso legal."), _doc("Aviso legal.")])] == ids
+    print("✅ test_chunk_ids_are_stable_across_rebuilds")
+
+
+if __name__ == "__main__":
+    test_near_duplicates_are_removed()
+    test_distinct_chunks_are_kept()
+    test_chunk_ids_are_stable_across_rebuilds()
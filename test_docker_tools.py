@@ -0,0 +1,175 @@
+"""
+🧪 Test de la herramienta de contenedores Docker contra un daemon falso
+
+Levanta un servidor HTTP en un socket unix temporal que imita los endpoints de
+Docker Engine usados (/containers/json y /events), sin necesidad de Docker.
+
+Uso:
+    python test_docker_tools.py
+    python -m pytest test_docker_tools.py
+"""
+import json
+import os
+import queue
+import socketserver
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+from unittest import mock
+
+from src.tools import docker_engine, docker_tools
+from src.tools.docker_engine import ContainerStateCache, DockerEngineClient
+
+
+CONTAINERS = [
+    {"Id": "a" * 64, "Names": ["/freescout"], "Image": "tiredofit/freescout:latest",
+     "State": "running", "Status": "Up 3 hours (healthy)"},
+    {"Id": "b" * 64, "Names": ["/freescout_db"], "Image": "mariadb:10.6",
+     "State": "running", "Status": "Up 3 hours"},
+    {"Id": "c" * 64, "Names": ["/backup"], "Image": "alpine",
+     "State": "exited", "Status": "Exited (1) 2 minutes ago"},
+]
+
+
+class FakeDockerHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.startswith("/containers/json"):
+            body = json.dumps(CONTAINERS).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        elif self.path.startswith("/events"):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            self.server.subscribed.set()
+            while True:
+                event = self.server.events.get()
+                if event is None:
+                    self.wfile.write(b"0\r\n\r\n")
+                    return
+                line = json.dumps(event).encode() + b"\n"
+                self.wfile.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+                self.wfile.flush()
+        else:
+            self.send_error(404)
+
+
+class FakeDockerDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path):
+        super().__init__(path, FakeDockerHandler)
+        self.connections = 0
+        self.events = queue.Queue()
+        self.subscribed = threading.Event()
+
+
+def start_daemon():
+    path = os.path.join(tempfile.mkdtemp(), "docker.sock")
+    daemon = FakeDockerDaemon(path)
+    threading.Thread(target=daemon.serve_forever, daemon=True).start()
+    return daemon, f"unix://{path}"
+
+
+def container_event(action, container_id, **attributes):
+    return {"Type": "container", "Action": action, "time": int(time.time()),
+            "Actor": {"ID": container_id, "Attributes": attributes}}
+
+
+def wait_until(condition, timeout=3.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_client_reuses_connection():
+    daemon, host = start_daemon()
+    client = DockerEngineClient(host)
+    for _ in range(5):
+        assert len(client.list_containers()) == 3
+    assert daemon.connections == 1, f"se abrieron {daemon.connections} conexiones"
+    client.close()
+    daemon.shutdown()
+
+
+def test_cache_follows_events():
+    daemon, host = start_daemon()
+    cache = ContainerStateCache(DockerEngineClient(host), reconnect_delay=0.05)
+    cache.start()
+    assert cache.wait_ready(3)
+    assert daemon.subscribed.wait(3)
+
+    states = lambda: {c["name"]: c for c in cache.containers()}
+    assert states()["freescout"]["health"] == "healthy"
+    assert states()["backup"]["exit_code"] == 1
+
+    daemon.events.put(container_event("die", "b" * 64, name="freescout_db", exitCode="137"))
+    daemon.events.put(container_event("create", "d" * 64, name="worker", image="python:3.11"))
+    daemon.events.put(container_event("start", "d" * 64, name="worker", image="python:3.11"))
+    daemon.events.put(container_event("health_status: unhealthy", "a" * 64, name="freescout"))
+    daemon.events.put(container_event("destroy", "c" * 64, name="backup"))
+    assert wait_until(lambda: "backup" not in states())
+
+    current = states()
+    assert current["freescout_db"]["state"] == "exited"
+    assert current["freescout_db"]["exit_code"] == 137
+    assert current["worker"]["state"] == "running"
+    assert current["worker"]["image"] == "python:3.11"
+    assert current["freescout"]["health"] == "unhealthy"
+
+    # Si el stream se corta, la caché vuelve a cargar la lista y se resuscribe
+    daemon.subscribed.clear()
+    daemon.events.put(None)
+    assert daemon.subscribed.wait(3)
+    assert wait_until(lambda: "backup" in states() and cache.connected)
+    daemon.shutdown()
+
+
+def test_tool_reports_problems_first():
+    daemon, host = start_daemon()
+    cache = ContainerStateCache(DockerEngineClient(host))
+    with mock.patch.object(docker_engine, "_container_cache", cache):
+        result = docker_tools.get_docker_containers_status.invoke({})
+        assert "**Total**: 3" in result
+        assert "**Con problemas**: 1" in result
+        assert result.index("backup") < result.index("freescout")
+
+        filtered = docker_tools.get_docker_containers_status.invoke({"name_filter": "mariadb"})
+        assert "freescout_db" in filtered and "backup" not in filtered
+    daemon.shutdown()
+
+
+def test_tool_without_daemon():
+    cache = ContainerStateCache(DockerEngineClient("unix:///nonexistent/docker.sock"))
+    with mock.patch.object(docker_engine, "_container_cache", cache), \
+            mock.patch.object(docker_tools, "FIRST_LOAD_TIMEOUT", 0.5):
+        result = docker_tools.get_docker_containers_status.invoke({})
+    assert result.startswith("❌ Docker no está disponible")
+
+
+if __name__ == "__main__":
+    print("="*70)
+    print("🧪 PROBANDO HERRAMIENTA DE CONTENEDORES DOCKER (daemon falso)")
+    print("="*70)
+    for test in (test_client_reuses_connection, test_cache_follows_events,
+                 test_tool_reports_problems_first, test_tool_without_daemon):
+        test()
+        print(f"✅ {test.__name__}")
+    print("\n✅ Todas las pruebas de Docker pasaron")
@@ -0,0 +1,106 @@
+"""
+🧪 Test del micro-batching de embeddings (MicroBatchingEmbeddings)
+
+Comprueba que las consultas concurrentes se agrupan en una sola llamada a
+`embed_documents`, que cada hilo recibe su propio vector y que un error del modelo
+llega a todas las consultas que esperaban ese batch.
+
+Uso:
+    python test_embedding_batcher.py
+    python -m pytest test_embedding_batcher.py
+"""
+import threading
+from typing import List
+
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from src.rag.embedding_batcher import MicroBatchingEmbeddings
+
+
+class RecordingEmbeddings(Embeddings):
+    """Modelo base que anota cada llamada; el vector de "consulta N" es [N, 2N]"""
+
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.calls: List[List[str]] = []
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.calls.append(list(texts))
+        if self.fail:
+            raise RuntimeError("modelo sin memoria")
+        return [[float(text.split()[-1]), 2.0 * float(text.split()[-1])] for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        raise AssertionError("el batcher debe usar siempre embed_documents")
+
+
+def _concurrent_queries(embeddings: Embeddings, count: int) -> dict:
+    """Lanza `count` embed_query a la vez; retorna {n: vector o excepción}"""
+    barrier = threading.Barrier(count)
+    results = {}
+
+    def worker(n: int):
+        barrier.wait()
+        try:
+            results[n] = embeddings.embed_query(f"consulta {n}")
+        except Exception as e:
+            results[n] = e
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+    return results
+
+
+def test_concurrent_queries_share_one_batch():
+    base = RecordingEmbeddings()
+    # Espera larga: el batch se cierra al llegar a max_batch_size, no por tiempo
+    batcher = MicroBatchingEmbeddings(base, max_batch_size=8, max_wait_ms=2000)
+    results = _concurrent_queries(batcher, 8)
+
+    assert len(base.calls) == 1 and sorted(base.calls[0]) == sorted(f"consulta {n}" for n in range(8))
+    assert results == {n: [float(n), 2.0 * n] for n in range(8)}
+    assert batcher.batches == 1 and batcher.mean_batch_size == 8
+
+    # Una consulta sola también pasa por embed_documents
+    batcher.max_wait = 0.0
+    assert batcher.embed_query("consulta 42") == [42.0, 84.0]
+    assert base.calls[-1] == ["consulta 42"]
+    print("✅ test_concurrent_queries_share_one_batch")
+
+
+def test_max_batch_size_splits_batches():
+    base = RecordingEmbeddings()
+    batcher = MicroBatchingEmbeddings(base, max_batch_size=3, max_wait_ms=200)
+    results = _concurrent_queries(batcher, 7)
+    assert results == {n: [float(n), 2.0 * n] for n in range(7)}
+    assert all(len(call) <= 3 for call in base.calls)
+    assert sorted(text for call in base.calls for text in call) == sorted(f"consulta {n}" for n in range(7))
+    print("✅ test_max_batch_size_splits_batches")
+
+
+def test_model_error_reaches_every_caller():
+    base = RecordingEmbeddings(fail=True)
+    batcher = MicroBatchingEmbeddings(base, max_batch_size=4, max_wait_ms=2000)
+    results = _concurrent_queries(batcher, 4)
+    assert len(base.calls) == 1
+    assert len(results) == 4
+    assert all(isinstance(error, RuntimeError) and "sin memoria" in str(error) for error in results.values())
+
+    # El hilo del batcher sigue vivo tras el error
+    batcher.max_wait = 0.0
+    base.fail = False
+    assert batcher.embed_query("consulta 5") == [5.0, 10.0]
+    with pytest.raises(RuntimeError):
+        base.fail = True
+        batcher.embed_query("consulta 6")
+    print("✅ test_model_error_reaches_every_caller")
+
+
+if __name__ == "__main__":
+    test_concurrent_queries_share_one_batch()
+    test_max_batch_size_splits_batches()
+    test_model_error_reaches_every_caller()
@@ -0,0 +1,123 @@
+"""
+🧪 Test del índice vectorial plano (FlatIndex)
+
+Comprueba que el top-k coincide con un ranking coseno por fuerza bruta, que float16 da
+el mismo resultado que float32 ocupando la mitad, que una escritura fallida deja el
+índice anterior intacto y que MMR no elige fragmentos casi duplicados.
+
+Uso:
+    python test_flat_index.py
+    python -m pytest test_flat_index.py
+"""
+import os
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+
+from src.rag import flat_index
+from src.rag.flat_index import FlatIndex, FlatIndexWriter, mmr_select
+
+
+def _random_vectors(count: int, dim: int = 32, seed: int = 7) -> np.ndarray:
+    return np.random.default_rng(seed).normal(size=(count, dim)).astype(np.float32)
+
+
+def _write(path: Path, vectors: np.ndarray, dtype: str = "float32", prefix: str = "doc") -> FlatIndex:
+    docs = [Document(page_content=f"{prefix} {i}", metadata={"chunk_id": f"{prefix}-{i}"})
+            for i in range(len(vectors))]
+    with FlatIndexWriter(str(path), dtype=dtype) as writer:
+        # En dos bloques, como export_flat_index
+        writer.add(vectors[:len(vectors) // 2].tolist(), docs[:len(vectors) // 2])
+        writer.add(vectors[len(vectors) // 2:].tolist(), docs[len(vectors) // 2:])
+    return FlatIndex(str(path))
+
+
+def test_top_k_matches_brute_force(tmp_path):
+    vectors = _random_vectors(200)
+    index = _write(tmp_path / "index", vectors)
+    normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    for query in _random_vectors(5, seed=11):
+        expected = np.argsort(-(normalized @ (query / np.linalg.norm(query))))[:10]
+        result = index.top_k(query.tolist(), 10)
+        assert [i for i, _ in result] == expected.tolist()
+        assert all(a >= b for (_, a), (_, b) in zip(result, result[1:]))
+    assert index.get_document(int(expected[0])).id == f"doc-{expected[0]}"
+    assert index.top_k(vectors[0].tolist(), 500)[0][0] == 0  # k > count: devuelve todos
+    index.close()
+    print("✅ test_top_k_matches_brute_force")
+
+
+def test_float16_matches_float32(tmp_path):
+    vectors = _random_vectors(300)
+    full = _write(tmp_path / "f32", vectors)
+    half = _write(tmp_path / "f16", vectors, dtype="float16")
+    assert half.vectors.dtype == np.float16
+    assert (tmp_path / "f16" / "vectors.bin").stat().st_size * 2 == (tmp_path / "f32" / "vectors.bin").stat().st_size
+
+    # Búsqueda por bloques con float16
+    with mock.patch.object(flat_index, "SEARCH_BLOCK_ROWS", 64):
+        for position in (0, 123, 299):
+            query = vectors[position] + 0.05 * _random_vectors(1, seed=position)[0]
+            assert np.allclose(half.scores(query.tolist()), full.scores(query.tolist()), atol=2e-3)
+            assert half.top_k(query.tolist(), 1)[0][0] == full.top_k(query.tolist(), 1)[0][0] == position
+    full.close()
+    half.close()
+    print("✅ test_float16_matches_float32")
+
+
+def test_failed_write_keeps_previous_index(tmp_path):
+    path = tmp_path / "index"
+    _write(path, _random_vectors(10), prefix="old").close()
+
+    # Error mientras se escribe: no se publica nada y el temporal se borra
+    with pytest.raises(RuntimeError):
+        with FlatIndexWriter(str(path)) as writer:
+            writer.add(_random_vectors(5, seed=3).tolist(),
+                       [Document(page_content="new", metadata={}) for _ in range(5)])
+            raise RuntimeError("embeddings caídos")
+    assert not Path(f"{path}.tmp").exists()
+
+    # Error al publicar (el rename del temporal falla): se restaura el índice anterior
+    real_replace = os.replace
+
+    def failing_replace(src, dst):
+        if str(src).endswith(".tmp"):
+            raise OSError("disco lleno")
+        return real_replace(src, dst)
+
+    with mock.patch.object(flat_index.os, "replace", side_effect=failing_replace):
+        with pytest.raises(OSError):
+            _write(path, _random_vectors(5, seed=3), prefix="new")
+
+    index = FlatIndex(str(path))
+    assert len(index) == 10 and index.get_document(0).id == "old-0"
+    assert not any(".old-" in p.name for p in tmp_path.iterdir())
+    index.close()
+    print("✅ test_failed_write_keeps_previous_index")
+
+
+def test_mmr_skips_near_duplicates():
+    base = np.eye(4, dtype=np.float32)
+    copy = base[0] + np.array([0, 0.01, 0, 0], dtype=np.float32)
+    vectors = np.stack([base[0], copy / np.linalg.norm(copy), base[1], base[2]])
+    relevance = np.asarray([0.95, 0.94, 0.7, 0.5], dtype=np.float32)
+
+    assert mmr_select(vectors, relevance, 2) == [0, 2]
+    assert mmr_select(vectors, relevance, 3) == [0, 2, 3]
+    # Solo si no queda otra cosa se repite un casi duplicado
+    assert mmr_select(vectors, relevance, 4) == [0, 2, 3, 1]
+    # Con lambda_mult=1 solo cuenta la relevancia (salvo los duplicados)
+    assert mmr_select(vectors, relevance, 2, lambda_mult=1.0) == [0, 2]
+    print("✅ test_mmr_skips_near_duplicates")
+
+
+if __name__ == "__main__":
+    for test in (test_top_k_matches_brute_force, test_float16_matches_float32,
+                 test_failed_write_keeps_previous_index):
+        with tempfile.TemporaryDirectory() as tmp:
+            test(Path(tmp))
+    test_mmr_skips_near_duplicates()
@@ -0,0 +1,85 @@
+"""
+🧪 Test de las versiones del índice (GC de versiones y cierre de la versión sustituida
+cuando la suelta la última consulta que la usaba)
+
+Uso:
+    python test_index_versions.py
+    python -m pytest test_index_versions.py
+"""
+import tempfile
+from pathlib import Path
+
+from src.rag.index_versions import (
+    IndexManager,
+    gc_versions,
+    list_versions,
+    publish_version,
+    read_current,
+    write_version_manifest,
+)
+
+
+def _make_version(root, version_id):
+    path = Path(root) / "versions" / version_id
+    path.mkdir(parents=True)
+    write_version_manifest(path, backend="flat")
+
+
+def test_gc_keeps_previous_current(tmp_path):
+    root = str(tmp_path)
+    for version_id in ("v1", "v2", "v3"):
+        _make_version(root, version_id)
+    publish_version(root, "v1")
+
+    # Se publica v3 con v1 aún activa en los servidores: keep=1 se eleva a 2 y v1 se protege
+    previous = read_current(root)
+    publish_version(root, "v3")
+    removed = gc_versions(root, keep=1, protect=[previous])
+    assert removed == []
+    assert list_versions(root) == ["v1", "v2", "v3"]
+
+    assert gc_versions(root, keep=1) == ["v1"]
+    print("✅ test_gc_keeps_previous_current")
+
+
+class ClosableStore:
+    def __init__(self, version_id):
+        self.version_id = version_id
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def test_swapped_store_is_closed_when_unused(tmp_path):
+    root = str(tmp_path)
+    for version_id in ("v1", "v2", "v3"):
+        _make_version(root, version_id)
+    publish_version(root, "v1")
+    manager = IndexManager(root, lambda path: ClosableStore(path.name), poll_interval=0)
+
+    with manager.use_store() as v1:
+        with manager.use_store() as same:
+            assert same is v1
+        publish_version(root, "v2")
+        assert manager.check_for_update()
+        # Consulta en curso con v1: no se cierra por mucho que espere
+        assert manager.close_retired() == 0 and not v1.closed
+        with manager.use_store() as v2:
+            assert v2.version_id == "v2"
+        assert not v1.closed
+    # Al soltarla la última consulta, se cierra
+    assert v1.closed and not v2.closed
+    assert manager.close_retired() == 0
+
+    # Sin consultas en curso se cierra en cuanto se sustituye
+    publish_version(root, "v3")
+    assert manager.check_for_update()
+    assert v2.closed and not manager.current_store().closed
+    print("✅ test_swapped_store_is_closed_when_unused")
+
+
+if __name__ == "__main__":
+    for test in (test_gc_keeps_previous_current, test_swapped_store_is_closed_when_unused):
+        with tempfile.TemporaryDirectory() as tmp:
+            test(Path(tmp))
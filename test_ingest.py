@@ -0,0 +1,61 @@
+"""
+🧪 Test de la ingesta en streaming de PDF (iter_pdf_pages)
+
+Genera un PDF pequeño de varias páginas con texto y comprueba que cada página sale
+exactamente una vez y en orden, también al cambiar de lector en los límites de ventana.
+
+Uso:
+    python test_ingest.py
+    python -m pytest test_ingest.py
+"""
+import tempfile
+from pathlib import Path
+
+from src.rag.ingest import iter_pdf_pages
+
+PAGES = 7
+
+
+def _write_pdf(path: Path, pages: int = PAGES):
+    """PDF con una línea de texto por página ("Pagina N de M") y Helvetica como fuente"""
+    from pypdf import PdfWriter
+    from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+    writer = PdfWriter()
+    for number in range(pages):
+        page = writer.add_blank_page(width=300, height=200)
+        page[NameObject("/Resources")] = DictionaryObject({
+            NameObject("/Font"): DictionaryObject({NameObject("/F1"): DictionaryObject({
+                NameObject("/Type"): NameObject("/Font"),
+                NameObject("/Subtype"): NameObject("/Type1"),
+                NameObject("/BaseFont"): NameObject("/Helvetica"),
+            })}),
+        })
+        content = DecodedStreamObject()
+        content.set_data(f"BT /F1 12 Tf 20 100 Td (Pagina {number + 1} de {pages}) Tj ET".encode("ascii"))
+        page.replace_contents(content)
+    with open(path, "wb") as f:
+        writer.write(f)
+
+
+def _page_texts(path: Path, page_window: int):
+    return [(doc.metadata["page"], doc.page_content.strip()) for doc in iter_pdf_pages(str(path), page_window)]
+
+
+def test_every_page_once_in_order(tmp_path):
+    path = tmp_path / "manual.pdf"
+    _write_pdf(path)
+    expected = [(number, f"Pagina {number + 1} de {PAGES}") for number in range(PAGES)]
+
+    # Ventanas que dividen el documento de forma exacta, inexacta, de una en una y sin ventana
+    for page_window in (1, 2, 3, PAGES, PAGES + 5, 0):
+        assert _page_texts(path, page_window) == expected, page_window
+
+    doc = next(iter_pdf_pages(str(path), page_window=2))
+    assert doc.metadata == {"source": str(path), "page": 0, "page_label": "1", "total_pages": PAGES}
+    print("✅ test_every_page_once_in_order")
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        test_every_page_once_in_order(Path(tmp))
@@ -0,0 +1,134 @@
+"""
+🧪 Test de la lectura incremental de logs (LogAnalyzer)
+
+Comprueba que no se pierde ni se cuenta dos veces ninguna línea al añadir, al escribir
+una línea a medias, al rotar (logrotate: `syslog` → `syslog.1`), al truncar y al
+recargar el estado guardado, y que las consultas no esperan a la lectura de fondo.
+
+Uso:
+    python test_log_analyzer.py
+    python -m pytest test_log_analyzer.py
+"""
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+from src.tools.log_analyzer import LogAnalyzer
+
+
+def _line(program: str, message: str) -> str:
+    return f"{datetime.now().isoformat(timespec='seconds')} host {program}[42]: {message}\n"
+
+
+def _append(path: Path, text: str):
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(text)
+
+
+def _counts(analyzer: LogAnalyzer) -> dict:
+    """Errores por programa (sumando todas sus firmas)"""
+    counts = {}
+    for entry in analyzer.top_errors(window_seconds=3600):
+        counts[entry["program"]] = counts.get(entry["program"], 0) + entry["count"]
+    return counts
+
+
+def _setup(workdir: Path):
+    log = workdir / "syslog"
+    log.write_text("")
+    return log, workdir / "state.json"
+
+
+def test_append_and_partial_line(tmp_path):
+    log, state = _setup(tmp_path)
+    analyzer = LogAnalyzer([str(log)], state_file=str(state))
+    _append(log, _line("sshd", "Failed password for root") + _line("cron", "session opened"))
+    analyzer.update()
+    assert _counts(analyzer) == {"sshd": 1}
+
+    # Línea a medias: no se cuenta hasta que termina de escribirse
+    _append(log, _line("sshd", "Failed password for admin")[:30])
+    analyzer.update()
+    assert _counts(analyzer) == {"sshd": 1}
+    _append(log, _line("sshd", "Failed password for admin")[30:])
+    analyzer.update()
+    assert _counts(analyzer) == {"sshd": 2}
+    print("✅ test_append_and_partial_line")
+
+
+def test_rotation_reads_rest_of_old_file(tmp_path):
+    log, state = _setup(tmp_path)
+    analyzer = LogAnalyzer([str(log)], state_file=str(state))
+    _append(log, _line("kernel", "Out of memory: killed process 1234"))
+    analyzer.update()
+
+    # Escrito después de la última lectura y justo antes de rotar
+    _append(log, _line("kernel", "Out of memory: killed process 5678"))
+    os.rename(log, f"{log}.1")
+    log.write_text(_line("nginx", "connect() failed (111: Connection refused)"))
+    analyzer.update()
+    assert _counts(analyzer) == {"kernel": 2, "nginx": 1}
+
+    analyzer.update()  # sin cambios: nada se cuenta dos veces
+    assert _counts(analyzer) == {"kernel": 2, "nginx": 1}
+    print("✅ test_rotation_reads_rest_of_old_file")
+
+
+def test_truncate_starts_over(tmp_path):
+    log, state = _setup(tmp_path)
+    analyzer = LogAnalyzer([str(log)], state_file=str(state))
+    _append(log, _line("app", "fatal error in worker") * 3)
+    analyzer.update()
+    with open(log, "w", encoding="utf-8") as f:  # copytruncate
+        f.write(_line("app", "fatal error in worker"))
+    analyzer.update()
+    assert _counts(analyzer) == {"app": 4}
+    print("✅ test_truncate_starts_over")
+
+
+def test_state_reload_continues_from_offset(tmp_path):
+    log, state = _setup(tmp_path)
+    analyzer = LogAnalyzer([str(log)], state_file=str(state))
+    _append(log, _line("sshd", "Failed password for root"))
+    analyzer.update()
+
+    _append(log, _line("sshd", "Failed password for guest"))
+    reloaded = LogAnalyzer([str(log)], state_file=str(state))
+    assert _counts(reloaded) == {"sshd": 1}
+    assert reloaded.update() > 0
+    assert _counts(reloaded) == {"sshd": 2}
+    print("✅ test_state_reload_continues_from_offset")
+
+
+def test_background_reader_and_non_blocking_queries(tmp_path):
+    log, state = _setup(tmp_path)
+    analyzer = LogAnalyzer([str(log)], state_file=str(state), interval=0.05)
+    _append(log, _line("sshd", "Failed password for root"))
+    analyzer.start()
+    try:
+        deadline = time.time() + 5
+        while _counts(analyzer) != {"sshd": 1} and time.time() < deadline:
+            time.sleep(0.02)
+        assert _counts(analyzer) == {"sshd": 1} and analyzer.last_update is not None
+
+        # Con una lectura en curso (simulada reteniendo su lock) las consultas responden igual
+        with analyzer._update_lock:
+            result = []
+            reader = threading.Thread(target=lambda: result.append(_counts(analyzer)))
+            reader.start()
+            reader.join(timeout=1)
+            assert result == [{"sshd": 1}]
+    finally:
+        analyzer.stop()
+    print("✅ test_background_reader_and_non_blocking_queries")
+
+
+if __name__ == "__main__":
+    for test in (test_append_and_partial_line, test_rotation_reads_rest_of_old_file,
+                 test_truncate_starts_over, test_state_reload_continues_from_offset,
+                 test_background_reader_and_non_blocking_queries):
+        with tempfile.TemporaryDirectory() as tmp:
+            test(Path(tmp))
@@ -0,0 +1,68 @@
+"""
+🧪 Test del barrido de evaluación del RAG (métricas, frente de Pareto y ejecución con embeddings falsos)
+
+Uso:
+    python test_retrieval_eval.py
+    python -m pytest test_retrieval_eval.py
+"""
+from src.perf.fakes import FIXTURE_MANUAL
+from src.perf.retrieval_eval import FIXTURE_QUESTIONS, covers, evaluate, pareto_front, score_ranking
+
+
+def test_chunk_relevance_by_overlap():
+    passage = ("manual", None, 100, 200)
+    assert covers(("manual", None, 140, 400), passage)        # más de la mitad del pasaje
+    assert not covers(("manual", None, 180, 400), passage)    # solo el final del pasaje
+    assert covers(("manual", None, 120, 160), passage)        # fragmento dentro del pasaje
+    assert not covers(("manual", 2, 100, 200), passage)       # otra página
+    print("✅ test_chunk_relevance_by_overlap")
+
+
+def test_recall_and_reciprocal_rank():
+    passages = [("m", None, 0, 100), ("m", None, 500, 600)]
+    retrieved = [("m", None, 300, 400), ("m", None, 480, 620), ("m", None, 0, 90)]
+    assert score_ranking(retrieved, passages) == (1.0, 0.5)
+    assert score_ranking(retrieved[:1], passages) == (0.0, 0.0)
+    print("✅ test_recall_and_reciprocal_rank")
+
+
+def test_pareto_front():
+    base = {"context_chars": 1000, "build_seconds": 1, "latency_p50_ms": 1}
+    rows = [
+        {**base, "recall": 0.9, "mrr": 0.8, "index_bytes": 100},
+        {**base, "recall": 0.9, "mrr": 0.8, "index_bytes": 200},  # dominada
+        {**base, "recall": 0.5, "mrr": 0.5, "index_bytes": 50},
+    ]
+    assert pareto_front(rows) == [rows[0], rows[2]]
+    # Más k: más recall pero más contexto en el prompt; ninguna domina a la otra
+    small_k = {**rows[0], "recall": 0.8, "context_chars": 400}
+    assert pareto_front([rows[0], small_k]) == [rows[0], small_k]
+    # Igual calidad con menos contexto: el k grande sobra
+    same_quality = {**rows[0], "context_chars": 400}
+    assert pareto_front([rows[0], same_quality]) == [same_quality]
+    # Solo cambia el tiempo (ruido de medida): no domina
+    slower = {**rows[0], "build_seconds": 5, "latency_p50_ms": 9}
+    assert pareto_front([rows[0], slower]) == [rows[0], slower]
+    print("✅ test_pareto_front")
+
+
+def test_sweep_with_fake_embeddings():
+    # El fixture por defecto (.md) se lee como texto plano, sin unstructured
+    rows = evaluate(str(FIXTURE_MANUAL), str(FIXTURE_QUESTIONS), [300, 800], [0, 50], [1, 3],
+                    embeddings="fake", search_type="similarity", repeats=1)
+    assert len(rows) == 8
+    assert any(row.get("pareto") for row in rows)
+    # Con más k no puede bajar el recall (búsqueda por similitud, mismo índice)
+    by_config = {(r["chunk_size"], r["chunk_overlap"], r["k"]): r for r in rows}
+    for chunk_size in (300, 800):
+        for overlap in (0, 50):
+            assert by_config[(chunk_size, overlap, 3)]["recall"] >= by_config[(chunk_size, overlap, 1)]["recall"]
+            assert by_config[(chunk_size, overlap, 3)]["context_chars"] > by_config[(chunk_size, overlap, 1)]["context_chars"]
+    print("✅ test_sweep_with_fake_embeddings")
+
+
+if __name__ == "__main__":
+    test_chunk_relevance_by_overlap()
+    test_recall_and_reciprocal_rank()
+    test_pareto_front()
+    test_sweep_with_fake_embeddings()
@@ -0,0 +1,137 @@
+"""
+🧪 Test del índice de tickets similares contra el FreeScout en memoria
+
+Usa embeddings de bolsa de palabras (sin modelo) para que la similitud sea predecible.
+
+Uso:
+    python test_ticket_index.py
+    python -m pytest test_ticket_index.py
+"""
+import re
+import tempfile
+import time
+from pathlib import Path
+
+from src.perf.fakes import InMemoryFreeScoutDB
+from src.tools.ticket_index import INDEX_FILE, TicketIndex
+
+VOCABULARY = ["vpn", "impresora", "correo", "contraseña", "disco", "lento", "error", "imprime", "conecta"]
+
+
+class BagOfWordsEmbeddings:
+    def __init__(self):
+        self.embedded = 0
+        self.texts = []
+
+    def _vector(self, text):
+        words = re.findall(r"\w+", text.lower())
+        return [float(words.count(w)) for w in VOCABULARY]
+
+    def embed_documents(self, texts):
+        self.embedded += len(texts)
+        self.texts.extend(texts)
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text):
+        return self._vector(text)
+
+
+def _make_db():
+    db = InMemoryFreeScoutDB(seed_tickets=0)
+    db.create_ticket("La VPN no conecta", "Error al conectar la vpn desde casa")
+    db.create_ticket("Impresora", "La impresora de la planta 2 no imprime")
+    db.create_ticket("Correo", "No me llega el correo")
+    return db
+
+
+def test_similar_open_tickets():
+    index = TicketIndex(_make_db(), BagOfWordsEmbeddings())
+    index.refresh()
+    matches = index.similar("la impresora no imprime nada", k=2, min_score=0.5)
+    assert [m["subject"] for m in matches] == ["Impresora"]
+    print("✅ test_similar_open_tickets")
+
+
+def test_incremental_updates():
+    db = _make_db()
+    embeddings = BagOfWordsEmbeddings()
+    index = TicketIndex(db, embeddings)
+    index.refresh()
+    assert len(index) == 3 and embeddings.embedded == 3
+
+    time.sleep(1.1)  # updated_at tiene resolución de segundos
+    db.create_ticket("Disco lleno", "El disco C está lleno y va lento")
+    db.update_ticket(1, status=2)  # cambia el estado, no el texto: no se recalcula
+    db.update_ticket(2, status=3)  # cerrado: sale del índice
+    index.refresh()
+    assert len(index) == 3
+    assert embeddings.embedded == 4
+    assert [m["number"] for m in index.similar("disco lento", k=1)] == [4]
+    assert all(m["number"] != 2 for m in index.similar("impresora imprime", k=5))
+    assert next(m for m in index.similar("vpn", k=1))["status"] == "Pendiente"
+
+    time.sleep(1.1)
+    db.update_ticket(2, status=1)  # reabierto
+    index.refresh()
+    assert index.similar("impresora imprime", k=1)[0]["number"] == 2
+    print("✅ test_incremental_updates")
+
+
+def test_persisted_index_only_reads_changes():
+    db = _make_db()
+    path = tempfile.mkdtemp(prefix="ticket_index_")
+    TicketIndex(db, BagOfWordsEmbeddings(), path=path).refresh()
+
+    embeddings = BagOfWordsEmbeddings()
+    reloaded = TicketIndex(db, embeddings, path=path)
+    assert reloaded.ready and len(reloaded) == 3
+    reloaded.refresh()
+    assert embeddings.embedded == 0
+    assert reloaded.similar("vpn conecta", k=1)[0]["number"] == 1
+    print("✅ test_persisted_index_only_reads_changes")
+
+
+def test_spam_drafts_and_placeholders_are_not_indexed():
+    db = _make_db()
+    db.create_ticket("Sin cuerpo", "")
+    embeddings = BagOfWordsEmbeddings()
+    index = TicketIndex(db, embeddings)
+    index.refresh()
+    assert "Sin cuerpo" in embeddings.texts  # solo el asunto, sin texto de relleno
+    assert not any("Sin descripción" in text for text in embeddings.texts)
+
+    time.sleep(1.1)
+    db.update_ticket(1, status=4)  # spam
+    db.update_ticket(2, state=3)   # borrada
+    index.refresh()
+    assert sorted(t["number"] for t in index._tickets) == [3, 4]
+    print("✅ test_spam_drafts_and_placeholders_are_not_indexed")
+
+
+def test_single_writer():
+    db = _make_db()
+    path = tempfile.mkdtemp(prefix="ticket_index_")
+    writer = TicketIndex(db, BagOfWordsEmbeddings(), path=path)
+    writer.refresh()
+    saved = (Path(path) / INDEX_FILE).stat().st_mtime_ns
+
+    # Otro worker con el mismo directorio: lee el índice pero no lo reescribe
+    other = TicketIndex(db, BagOfWordsEmbeddings(), path=path)
+    time.sleep(1.1)
+    db.create_ticket("Disco lleno", "El disco va lento")
+    other.refresh()
+    assert len(other) == 4
+    assert (Path(path) / INDEX_FILE).stat().st_mtime_ns == saved
+    assert [p.name for p in Path(path).iterdir() if ".tmp" in p.name] == []
+
+    writer.refresh()
+    assert len(TicketIndex(db, BagOfWordsEmbeddings(), path=path)) == 4
+    print("✅ test_single_writer")
+
+
+if __name__ == "__main__":
+    test_similar_open_tickets()
+    test_incremental_updates()
+    test_persisted_index_only_reads_changes()
+    test_spam_drafts_and_placeholders_are_not_indexed()
+    test_single_writer()
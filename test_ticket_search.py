@@ -0,0 +1,85 @@
+"""
+🧪 Test de la búsqueda de tickets (search_tickets): SQL generado y FreeScout en memoria
+
+Uso:
+    python test_ticket_search.py
+    python -m pytest test_ticket_search.py
+"""
+import re
+from unittest import mock
+
+from src.perf.fakes import InMemoryFreeScoutDB
+from src.tools import agent_tools, freescout_integration
+
+
+def _make_db():
+    db = InMemoryFreeScoutDB(seed_tickets=0)
+    for i in range(12):
+        db.create_ticket(f"Impresora planta {i}", "No imprime")
+    db.create_ticket("VPN", "Tampoco va la impresora desde la vpn")
+    db.create_ticket("Correo", "No llega el correo")
+    return db
+
+
+def test_search_is_ranked_and_paginated():
+    with mock.patch.object(freescout_integration, "_freescout_db", _make_db()):
+        first = agent_tools.search_tickets.invoke({"query": "impresora"})
+        second = agent_tools.search_tickets.invoke({"query": "impresora", "page": 2})
+    assert first.count("• **#") == 10 and "page=2" in first
+    # El asunto puntúa más que el cuerpo: el ticket de la VPN va al final
+    assert second.count("• **#") == 3 and "page=3" not in second
+    assert "VPN" in second.splitlines()[-1]
+    print("✅ test_search_is_ranked_and_paginated")
+
+
+def test_search_only_open():
+    db = _make_db()
+    db.update_ticket(13, status=3)
+    with mock.patch.object(freescout_integration, "_freescout_db", db):
+        result = agent_tools.search_tickets.invoke({"query": "vpn", "only_open": True})
+    assert "No se encontraron" in result
+    print("✅ test_search_only_open")
+
+
+def _branch_where(sql, branch):
+    """Condiciones del WHERE de una rama de la UNION (0 = asuntos, 1 = mensajes)"""
+    subquery = sql.split("UNION ALL")[branch]
+    where = re.search(r"WHERE (.*?)\s+ORDER BY", subquery, re.S).group(1)
+    return {condition.strip() for condition in where.split(" AND ")}
+
+
+def test_search_query_filters_each_branch():
+    sql = freescout_integration.build_search_query(only_open=True)
+    subject, body = _branch_where(sql, 0), _branch_where(sql, 1)
+    for where in (subject, body):
+        assert {"c.state = 2", "c.status <> 4", "c.status <> 3"} <= where
+    assert {"t.type IN (1, 2)", "t.state = 2"} <= body
+    assert "JOIN conversations c ON c.id = t.conversation_id" in sql.split("UNION ALL")[1]
+    # Los filtros van dentro de las ramas, antes del LIMIT de candidatos, no en la consulta externa
+    assert "WHERE" not in sql.split(") m")[-1]
+    assert sql.count("%s") == 6
+
+    all_tickets = freescout_integration.build_search_query(only_open=False)
+    assert "c.status <> 3" not in all_tickets
+    assert "c.state = 2" in _branch_where(all_tickets, 1)
+    print("✅ test_search_query_filters_each_branch")
+
+
+def test_search_skips_notes_spam_and_drafts():
+    db = _make_db()
+    db.update_ticket(14, add_note=True)  # nota interna "Nota interna": no se busca
+    db.update_ticket(13, status=4)       # spam
+    db.update_ticket(1, state=1)         # borrador
+    with mock.patch.object(freescout_integration, "_freescout_db", db):
+        assert "No se encontraron" in agent_tools.search_tickets.invoke({"query": "nota interna"})
+        assert "No se encontraron" in agent_tools.search_tickets.invoke({"query": "vpn"})
+        result = agent_tools.search_tickets.invoke({"query": "impresora planta"})
+    assert "**#1**" not in result and "**#12**" in result
+    print("✅ test_search_skips_notes_spam_and_drafts")
+
+
+if __name__ == "__main__":
+    test_search_is_ranked_and_paginated()
+    test_search_only_open()
+    test_search_query_filters_each_branch()
+    test_search_skips_notes_spam_and_drafts()
@@ -0,0 +1,169 @@
+"""
+🧪 Test de la creación de tickets en diferido (spool local + FreeScout falso)
+
+Comprueba que los tickets no se pierden con FreeScout caído, que se reenvían al
+reiniciar, que un reintento nunca crea un ticket duplicado y que el segmento propio
+se compacta sin esperar a un reinicio.
+
+Uso:
+    python test_ticket_spool.py
+    python -m pytest test_ticket_spool.py
+"""
+import json
+import tempfile
+import time
+from pathlib import Path
+from unittest import mock
+
+from src.perf.fakes import InMemoryFreeScoutDB
+from src.tools import ticket_spool
+from src.tools.ticket_spool import DEAD_LETTER_FILE, TicketSpool, TicketWriteBehind
+
+
+class DownFreeScoutDB:
+    """FreeScout sin conexión"""
+
+    def create_ticket(self, *args, **kwargs):
+        raise ConnectionError("MySQL no disponible")
+
+
+class RejectingFreeScoutDB(InMemoryFreeScoutDB):
+    """FreeScout que rechaza siempre los tickets con asunto "Roto" (error permanente)"""
+
+    def create_ticket(self, subject, body, **kwargs):
+        if subject == "Roto":
+            return {"success": False, "error": "Incorrect string value", "retryable": False}
+        return super().create_ticket(subject, body, **kwargs)
+
+
+def _count_tickets(db) -> int:
+    return db._conn.execute("SELECT COUNT(*) FROM conversations").fetchone()[0]
+
+
+def test_tickets_survive_outage_and_restart(tmp_path):
+    writer = TicketWriteBehind(DownFreeScoutDB(), TicketSpool(tmp_path), retry_delay=0.05)
+    try:
+        record = writer.submit("VPN no conecta", "Error 809 al conectar")
+        assert record["reference"].startswith("REF-")
+        time.sleep(0.2)
+        assert writer.pending_count == 1
+    finally:
+        writer.close()  # el proceso "muere"
+
+    db = InMemoryFreeScoutDB(seed_tickets=0)
+    restarted = TicketWriteBehind(db, TicketSpool(tmp_path))
+    try:
+        assert restarted.pending_count == 1
+        assert restarted.flush() == 1
+        assert restarted.pending_count == 0
+        assert _count_tickets(db) == 1
+    finally:
+        restarted.close()
+    print("✅ test_tickets_survive_outage_and_restart")
+
+
+def test_retry_is_idempotent(tmp_path):
+    db = InMemoryFreeScoutDB(seed_tickets=0)
+    spool = TicketSpool(tmp_path)
+    spool.own.append({"op": "reserve", "key": "k1", "reference": "REF-K1", "subject": "Impresora",
+                      "body": "Atasco", "priority": 2, "customer_email": None, "session_id": None})
+    # El ticket llegó a FreeScout pero el proceso cayó antes de anotarlo en el spool
+    db.create_ticket("Impresora", "Atasco", idempotency_key="k1")
+    spool.own.close()
+
+    restarted = TicketWriteBehind(db, TicketSpool(tmp_path))
+    try:
+        assert restarted.flush() == 1
+        assert _count_tickets(db) == 1
+    finally:
+        restarted.close()
+    print("✅ test_retry_is_idempotent")
+
+
+def test_permanent_failure_does_not_block_queue(tmp_path):
+    db = RejectingFreeScoutDB(seed_tickets=0)
+    writer = TicketWriteBehind(db, TicketSpool(tmp_path))
+    try:
+        writer.submit("Roto", "Siempre falla")
+        writer.submit("Teclado", "No funciona la tecla Enter")
+        writer.flush()  # el hilo de fondo puede haber procesado ya alguno
+        assert writer.pending_count == 0
+        assert _count_tickets(db) == 1
+        with open(tmp_path / DEAD_LETTER_FILE, encoding="utf-8") as f:
+            dead = [json.loads(line) for line in f]
+        assert [d["subject"] for d in dead] == ["Roto"] and dead[0]["error"] == "Incorrect string value"
+    finally:
+        writer.close()
+
+    # Al reiniciar, el rechazado no vuelve a la cola
+    restarted = TicketWriteBehind(db, TicketSpool(tmp_path))
+    try:
+        assert restarted.pending_count == 0
+    finally:
+        restarted.close()
+    print("✅ test_permanent_failure_does_not_block_queue")
+
+
+def test_orphan_segment_is_adopted(tmp_path):
+    survivor = TicketSpool(tmp_path)
+    crashed = TicketWriteBehind(DownFreeScoutDB(), TicketSpool(tmp_path))
+    try:
+        crashed.submit("Disco lleno", "C: al 99%")
+        assert crashed.spool.own.path.name == "spool-1.jsonl"
+    finally:
+        crashed.close()
+
+    db = InMemoryFreeScoutDB(seed_tickets=0)
+    writer = TicketWriteBehind(db, survivor)
+    try:
+        writer._adopt_orphans()
+        assert writer.flush() == 1
+        assert _count_tickets(db) == 1
+    finally:
+        writer.close()
+    print("✅ test_orphan_segment_is_adopted")
+
+
+def _lines(path: Path) -> int:
+    with open(path, encoding="utf-8") as f:
+        return sum(1 for _ in f)
+
+
+def test_own_segment_is_compacted_while_running(tmp_path):
+    db = InMemoryFreeScoutDB(seed_tickets=0)
+    writer = TicketWriteBehind(db, TicketSpool(tmp_path))
+    segment = writer.spool.own
+    try:
+        # Sin hilo de fondo: el test decide cuándo se envía
+        with mock.patch.object(TicketWriteBehind, "start"):
+            for i in range(3):
+                writer.submit(f"Ticket {i}", "Pendiente de crear")
+            assert _lines(segment.path) == 3
+            # Todo enviado: el segmento se vacía sin esperar a reiniciar
+            assert writer.flush() == 3
+            assert _lines(segment.path) == 0
+
+        # Con un pendiente que no sale nunca, se compacta cuando la mayoría de líneas ya están resueltas
+        with mock.patch.object(ticket_spool, "COMPACT_MIN_RECORDS", 10):
+            segment.append({"op": "reserve", "key": "atascado", "subject": "Atascado"})
+            for i in range(50):
+                segment.append({"op": "reserve", "key": f"k{i}", "subject": f"Nuevo {i}"})
+                segment.append({"op": "done", "key": f"k{i}"})
+                assert _lines(segment.path) <= 10
+        assert list(segment.pending) == ["atascado"]
+    finally:
+        writer.close()
+
+    # Compactar no pierde nada: tras reiniciar sigue pendiente
+    restarted = TicketSpool(tmp_path)
+    assert list(restarted.own.pending) == ["atascado"]
+    restarted.own.close()
+    print("✅ test_own_segment_is_compacted_while_running")
+
+
+if __name__ == "__main__":
+    for test in (test_tickets_survive_outage_and_restart, test_retry_is_idempotent,
+                 test_permanent_failure_does_not_block_queue, test_orphan_segment_is_adopted,
+                 test_own_segment_is_compacted_while_running):
+        with tempfile.TemporaryDirectory() as tmp:
+            test(Path(tmp))
@@ -0,0 +1,106 @@
+"""
+🧪 Test del feed de cambios de tickets (TicketWatcher) contra el FreeScout en memoria
+
+Comprueba la paginación con la marca (updated_at, id), los avisos a las sesiones que
+siguen un ticket, la consulta a MySQL cuando el snapshot está desfasado y que un
+ticket seguido no se descarta del snapshot.
+
+Uso:
+    python test_ticket_watcher.py
+    python -m pytest test_ticket_watcher.py
+"""
+from contextlib import contextmanager
+from unittest import mock
+
+from src.perf.fakes import InMemoryFreeScoutDB
+from src.tools import ticket_watcher
+from src.tools.ticket_watcher import TicketWatcher
+
+
+@contextmanager
+def _watching(db, **kwargs):
+    """Watcher con la marca ya fijada y sin hilo de fondo: el test decide cuándo se consulta el feed"""
+    with mock.patch.object(TicketWatcher, "start"):
+        watcher = TicketWatcher(db, **kwargs)
+        watcher.poll()  # primera consulta: fija la marca
+        yield watcher
+
+
+def test_paging_reads_every_change():
+    db = InMemoryFreeScoutDB(seed_tickets=3)
+    with _watching(db) as watcher:
+        for i in range(5):
+            db.create_ticket(f"Nuevo {i}", "Mismo segundo que los demás")
+        # Páginas de 2 filas del mismo segundo: solo el id las desempata
+        with mock.patch.object(ticket_watcher, "PAGE_SIZE", 2):
+            watcher.poll()
+            assert all(number in watcher._tickets for number in range(4, 9))
+            assert watcher._watermark[1] == 8
+            # Sin cambios: se relee el margen de solapamiento, sin avisos ni cambios de marca
+            watcher.poll()
+        assert watcher._watermark[1] == 8
+    print("✅ test_paging_reads_every_change")
+
+
+def test_notifications_fan_out_to_followers():
+    db = InMemoryFreeScoutDB(seed_tickets=0)
+    with _watching(db) as watcher:
+        db.create_ticket("VPN", "No conecta")
+        watcher.poll()
+        watcher.follow(1, "sesion-a")
+        watcher.follow(1, "sesion-b")
+
+        db.update_ticket(1, status=2)
+        watcher.poll()
+        for session_id in ("sesion-a", "sesion-b"):
+            notices = watcher.drain_notifications(session_id)
+            assert len(notices) == 1 and "Pendiente" in notices[0]
+            assert "respuesta nueva" not in notices[0]  # la línea de historial del cambio no es una respuesta
+
+        db.update_ticket(1, add_note=True)  # nota interna: no se avisa
+        watcher.poll()
+        assert watcher.drain_notifications("sesion-a") == []
+
+        db.update_ticket(1, add_reply=True)
+        watcher.poll()
+        notices = watcher.drain_notifications("sesion-b")
+        assert len(notices) == 1 and "respuesta nueva" in notices[0]
+        assert watcher.drain_notifications("sesion-otra") == []
+    print("✅ test_notifications_fan_out_to_followers")
+
+
+def test_stale_snapshot_falls_back_to_db():
+    db = InMemoryFreeScoutDB(seed_tickets=0)
+    with _watching(db, max_staleness=60) as watcher:
+        db.create_ticket("Impresora", "No imprime")
+        watcher.poll()
+        db.update_ticket(1, status=3)  # el feed todavía no lo ha leído
+        assert watcher.get_ticket(1)["status"] == "Activo"   # snapshot al día: desde memoria
+        watcher.last_poll -= 120
+        assert watcher.get_ticket(1)["status"] == "Cerrado"  # snapshot desfasado: desde MySQL
+    print("✅ test_stale_snapshot_falls_back_to_db")
+
+
+def test_followed_tickets_are_not_evicted():
+    db = InMemoryFreeScoutDB(seed_tickets=0)
+    with _watching(db, max_tickets=2) as watcher:
+        db.create_ticket("Correo", "No llega")
+        watcher.poll()
+        watcher.follow(1, "sesion-a")
+        db.create_ticket("Disco", "Lleno")
+        db.create_ticket("Teclado", "No escribe")
+        watcher.poll()
+        assert list(watcher._tickets) == [1, 3]
+        assert watcher._followers[1] == {"sesion-a"}
+
+        db.update_ticket(1, status=3)
+        watcher.poll()
+        assert "Cerrado" in watcher.drain_notifications("sesion-a")[0]
+    print("✅ test_followed_tickets_are_not_evicted")
+
+
+if __name__ == "__main__":
+    test_paging_reads_every_change()
+    test_notifications_fan_out_to_followers()
+    test_stale_snapshot_falls_back_to_db()
+    test_followed_tickets_are_not_evicted()